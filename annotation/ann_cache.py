@@ -0,0 +1,166 @@
+import hashlib
+import os
+import sqlite3
+from pathlib import Path
+
+CACHE_VERSION = 1
+# INFO keys SnpEff adds; the cache stores a record's entries for these.
+SNPEFF_INFO_KEYS = (b"ANN", b"LOF", b"NMD")
+# Hits are marked as used by the current run in batches of this many.
+USED_FLUSH_ROWS = 10_000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS headers (fingerprint TEXT PRIMARY KEY, lines BLOB);
+CREATE TABLE IF NOT EXISTS ann (
+    fingerprint TEXT, chrom BLOB, pos INTEGER, ref BLOB, alt BLOB,
+    info BLOB, size INTEGER, last_used INTEGER,
+    PRIMARY KEY (fingerprint, chrom, pos, ref, alt)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ann_last_used ON ann (last_used);
+"""
+
+
+def snpeff_fingerprint(genome_key, config_path, data_dir, block_size=1 << 20):
+    """
+    Identify a SnpEff database build: the genome key, the config file and
+    the BLAKE2b digest of the built snpEffectPredictor.bin.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{CACHE_VERSION}\0{genome_key}\0".encode())
+    for path in (Path(config_path), Path(data_dir) / genome_key / "snpEffectPredictor.bin"):
+        digest.update(str(path.name).encode() + b"\0")
+        if path.exists():
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(block_size), b""):
+                    digest.update(block)
+    return digest.hexdigest()
+
+
+def snpeff_entries(info):
+    """The ANN/LOF/NMD entries of an INFO column (bytes), joined with ';'."""
+    return b";".join(
+        entry for entry in info.split(b";")
+        if entry.split(b"=", 1)[0] in SNPEFF_INFO_KEYS
+    )
+
+
+class AnnCache:
+    """
+    Persistent SnpEff annotations per site, in SQLite.
+
+    Entries are keyed by (chrom, pos, ref, alt) and the fingerprint of the
+    SnpEff database build (see `snpeff_fingerprint`), so a rebuilt DB
+    never serves stale annotations. Every run is numbered; entries record
+    the last run that used them (hits are marked every USED_FLUSH_ROWS
+    reads, so another process's eviction spares them), and `close` evicts
+    the least recently used runs' entries once the stored annotations
+    exceed `max_bytes`.
+    A cache written by another CACHE_VERSION is cleared on open.
+
+    Example:
+        with AnnCache(path, fingerprint) as cache:
+            info = cache.get(chrom, pos, ref, alt)
+    """
+
+    def __init__(self, path, fingerprint, max_bytes=2 << 30):
+        self.path = str(path)
+        self.fingerprint = fingerprint
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, timeout=300)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        with self._db:
+            version = self._meta("version")
+            if version is not None and int(version) != CACHE_VERSION:
+                self._db.execute("DELETE FROM ann")
+                self._db.execute("DELETE FROM headers")
+            self._set_meta("version", CACHE_VERSION)
+            self.run = int(self._meta("runs") or 0) + 1
+            self._set_meta("runs", self.run)
+        self._used = []
+
+    def _meta(self, key):
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self._db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, str(value)))
+
+    def get(self, chrom, pos, ref, alt):
+        """Cached SnpEff INFO entries of a site (bytes, maybe empty), or None."""
+        row = self._db.execute(
+            "SELECT info FROM ann WHERE fingerprint = ? AND chrom = ? AND pos = ? AND ref = ? AND alt = ?",
+            (self.fingerprint, chrom, int(pos), ref, alt),
+        ).fetchone()
+        if row is None:
+            return None
+        self._used.append((self.run, self.fingerprint, chrom, int(pos), ref, alt))
+        if len(self._used) >= USED_FLUSH_ROWS:
+            self._flush_used()
+        return row[0]
+
+    def _flush_used(self):
+        """Record this run as the last user of the entries read since the last flush."""
+        with self._db:
+            self._db.executemany(
+                "UPDATE ann SET last_used = ? WHERE fingerprint = ? AND chrom = ? AND pos = ? "
+                "AND ref = ? AND alt = ?",
+                self._used,
+            )
+        self._used.clear()
+
+    def put_many(self, entries):
+        """Store (chrom, pos, ref, alt, info) tuples."""
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO ann VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (self.fingerprint, chrom, int(pos), ref, alt, info,
+                     len(chrom) + len(ref) + len(alt) + len(info) + 8, self.run)
+                    for chrom, pos, ref, alt, info in entries
+                ),
+            )
+
+    def header(self):
+        """Header lines SnpEff added for this fingerprint (list of bytes), or None."""
+        row = self._db.execute(
+            "SELECT lines FROM headers WHERE fingerprint = ?", (self.fingerprint,)
+        ).fetchone()
+        return row[0].splitlines(keepends=True) if row else None
+
+    def set_header(self, lines):
+        with self._db:
+            self._db.execute("INSERT OR REPLACE INTO headers VALUES (?, ?)",
+                             (self.fingerprint, b"".join(lines)))
+
+    def evict(self):
+        """
+        Drop the entries of the least recently used runs until the stored
+        annotations fit in `max_bytes`. Returns the number of entries dropped.
+        """
+        rows = self._db.execute(
+            "SELECT last_used, SUM(size) FROM ann GROUP BY last_used ORDER BY last_used DESC"
+        ).fetchall()
+        kept = 0
+        for last_used, size in rows:
+            kept += size
+            if kept > self.max_bytes and last_used < self.run:
+                with self._db:
+                    return self._db.execute("DELETE FROM ann WHERE last_used <= ?", (last_used,)).rowcount
+        return 0
+
+    def close(self):
+        if self._db is None:
+            return
+        self._flush_used()
+        self.evict()
+        self._db.close()
+        self._db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,7 +1,10 @@
-import subprocess
+from profiling import run_command
 import os
 import shutil
 
+from annotation.ann_cache import SNPEFF_INFO_KEYS, AnnCache, snpeff_entries, snpeff_fingerprint
+from vcf_io import VcfReader, VcfWriter
+
 
 def build_snpeff_db(
     db_dir,
@@ -27,19 +30,19 @@ def build_snpeff_db(
     genome_path = os.path.join(db_dir, key)
     os.makedirs(genome_path, exist_ok=True)
     
-    # Copy reference genome into genome folder for build
-    shutil.copy(reference_file, os.path.join(genome_path, "sequences.fa"))
+    # Link reference genome into genome folder for build
+    _link_or_copy(reference_file, os.path.join(genome_path, "sequences.fa"))
 
-    # Copy GTF file with correct output name
+    # Link GTF file with correct output name
     gtf_dest = "genes.gtf.gz" if str(gtf_file).endswith(".gz") else "genes.gtf"
-    shutil.copy(gtf_file, os.path.join(genome_path, gtf_dest))
+    _link_or_copy(gtf_file, os.path.join(genome_path, gtf_dest))
 
     # Write genome config
     with open(config_path, "w") as config_file:
         config_file.write(f"{key}.genome : {genome_label}\n")
 
     # Run snpEff build
-    subprocess.run([
+    run_command([
         "snpEff", "build",
         "-v",
         "-dataDir", db_dir,
@@ -51,6 +54,22 @@ def build_snpeff_db(
 
 
 
+def _link_or_copy(source, dest):
+    """
+    Hard-link `source` to `dest` (copy across filesystems); nothing to do
+    if `dest` is already that file or an identical copy of it.
+    """
+    if os.path.exists(dest):
+        src, dst = os.stat(source), os.stat(dest)
+        if os.path.samestat(src, dst) or (src.st_size, src.st_mtime_ns) == (dst.st_size, dst.st_mtime_ns):
+            return
+        os.remove(dest)
+    try:
+        os.link(source, dest)
+    except OSError:
+        shutil.copy2(source, dest)
+
+
 def annotate_vcf_with_snpeff(
     input_vcf,
     output_vcf,
@@ -58,6 +77,8 @@ def annotate_vcf_with_snpeff(
     config_path="snpeff.config",
     data_dir="snpeff",
     verbose=True,
+    cache=None,
+    cache_max_bytes=2 << 30,
 ):
     """
     Annotate a VCF using a custom SnpEff genome database.
@@ -69,7 +90,91 @@ def annotate_vcf_with_snpeff(
         config_path (str): Path to snpEff.config file
         data_dir (str): Directory containing your custom genome
         verbose (bool): If True, run SnpEff with '-v' for progress info
+        cache (str): Optional SQLite ANN cache (see `annotation.ann_cache`).
+            Only sites missing from it for this DB build go through SnpEff;
+            the others get their cached ANN/LOF/NMD entries spliced in.
+        cache_max_bytes (int): Size bound of the cache's annotations.
     """
+    if cache is None:
+        _run_snpeff(input_vcf, output_vcf, genome_key, config_path, data_dir, verbose)
+        return
+
+    fingerprint = snpeff_fingerprint(genome_key, config_path, data_dir)
+    misses_vcf = f"{output_vcf}.misses.vcf"
+    misses_annotated = f"{output_vcf}.misses.ann.vcf"
+    with AnnCache(cache, fingerprint, max_bytes=cache_max_bytes) as ann_cache:
+        # Only the misses are kept in memory; hits are read again in the output pass.
+        missed = set()
+        hits = 0
+        with VcfReader(input_vcf) as reader, VcfWriter(misses_vcf) as writer:
+            writer.write_header(reader.header)
+            for record in reader:
+                site = record.site()
+                if site in missed:
+                    continue
+                if ann_cache.get(*site) is None:
+                    writer.write(record)
+                    missed.add(site)
+                else:
+                    hits += 1
+        print(f"[snpeff] {hits} records cached, {len(missed)} sites to annotate")
+
+        new = {}
+        if missed:
+            _run_snpeff(misses_vcf, misses_annotated, genome_key, config_path, data_dir, verbose)
+            with VcfReader(misses_annotated) as annotated:
+                present = set(reader.header)
+                ann_cache.set_header([
+                    line for line in annotated.header
+                    if line not in present and not line.startswith(b"#CHROM")
+                ])
+                new = {record.site(): snpeff_entries(record.info) for record in annotated}
+            ann_cache.put_many((*site, info) for site, info in new.items())
+            os.remove(misses_annotated)
+        os.remove(misses_vcf)
+
+        try:
+            with VcfReader(input_vcf) as reader, VcfWriter(output_vcf) as writer:
+                # SnpEff's ##INFO definitions replace the input's for the same ID.
+                added = ann_cache.header() or []
+                ids = {line.split(b",", 1)[0] for line in added if line.startswith(b"##INFO=")}
+                header = [
+                    line for line in reader.header
+                    if not (line.startswith(b"##INFO=") and line.split(b",", 1)[0] in ids)
+                ]
+                present = set(header)
+                writer.write_header(header, extra_lines=[line for line in added if line not in present])
+                for record in reader:
+                    site = record.site()
+                    entries = new[site] if site in new else ann_cache.get(*site)
+                    if entries is None:
+                        # Evicted by another process since the first pass.
+                        raise RuntimeError(f"ANN cache entry for {site} disappeared during the run; "
+                                           f"rerun to annotate it")
+                    writer.write_line(_with_snpeff_entries(record, entries))
+        except RuntimeError:
+            # No partly annotated output is left behind.
+            for path in (output_vcf, f"{output_vcf}.tbi", f"{output_vcf}.csi"):
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+
+
+def _with_snpeff_entries(record, entries):
+    """The record's line with its ANN/LOF/NMD entries replaced by `entries`."""
+    info = record.info
+    if any(key in info for key in SNPEFF_INFO_KEYS):
+        kept = [
+            entry for entry in info.split(b";")
+            if entry.split(b"=", 1)[0] not in SNPEFF_INFO_KEYS and entry not in (b".", b"")
+        ]
+        line = record.replace_info(b";".join(kept + ([entries] if entries else [])))
+    else:
+        line = record.with_info(entries) if entries else record.line
+    return line if line.endswith(b"\n") else line + b"\n"
+
+
+def _run_snpeff(input_vcf, output_vcf, genome_key, config_path, data_dir, verbose):
     cmd = [
         "snpEff", "ann",
         "-noDownload", 
@@ -82,4 +187,4 @@ def annotate_vcf_with_snpeff(
     cmd.append(input_vcf)
 
     with open(output_vcf, "w") as out_f:
-        subprocess.run(cmd, check=True, stdout=out_f)
+        run_command(cmd, check=True, stdout=out_f)
@@ -1,31 +1,62 @@
-import gzip
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from sidecar import SidecarWriter
+from vcf_batch import VcfBatchReader, write_batch
+from vcf_io import VcfWriter
+
+FREQ_HEADER = (
+    '##INFO=<ID=FREQ,Number=1,Type=String,'
+    'Description="SEEN if the variant is in the reference variation VCF, else NOVEL">\n'
+)
+
 
 def load_known_variants(vcf_path):
-    """Build a set of variant keys from reference VCF: chrom:pos:ref:alt"""
-    known = set()
-    with gzip.open(vcf_path, "rt") as f:
-        for line in f:
-            if line.startswith("#"):
-                continue
-            fields = line.strip().split("\t")
-            chrom, pos, ref, alt = fields[0], fields[1], fields[3], fields[4]
-            key = f"{chrom}:{pos}:{ref}:{alt}"
-            known.add(key)
-    return known
-
-
-def annotate_with_frequency(vcf_in_path, vcf_out_path, known_variants):
-    with gzip.open(vcf_in_path, "rt") as fin, gzip.open(vcf_out_path, "wt") as fout:
-        for line in fin:
-            if line.startswith("#"):
-                fout.write(line)
-                continue
-            fields = line.strip().split("\t")
-            chrom, pos, ref, alt = fields[0], fields[1], fields[3], fields[4]
-            key = f"{chrom}:{pos}:{ref}:{alt}"
-
-            info = fields[7]
-            tag = "FREQ=SEEN" if key in known_variants else "FREQ=NOVEL"
-            fields[7] = info + ";" + tag
-            fout.write("\t".join(fields) + "\n")
+    """Build the variant keys of a reference VCF: chrom:pos:ref:alt (binary Arrow array, unique)"""
+    with VcfBatchReader(vcf_path) as reader:
+        chunks = [batch.site_keys() for batch in reader]
+    if not chunks:
+        return pa.array([], pa.binary())
+    return pc.unique(pa.concat_arrays(chunks))
+
+
+def known_variant_index(known_variants):
+    """
+    Value set of chrom:pos:ref:alt keys for `pc.is_in`, built once and
+    reused across `annotate_with_frequency` calls. Accepts the array from
+    `load_known_variants` or any iterable of str/bytes keys.
+    """
+    if isinstance(known_variants, pa.Array):
+        return known_variants.cast(pa.binary())
+    return pa.array([key.encode() if isinstance(key, str) else key for key in known_variants], pa.binary())
+
+
+def frequency_values(batch, known):
+    """SEEN or NOVEL for every record of a batch (binary array)."""
+    seen = pc.is_in(batch.site_keys(), value_set=known)
+    return pc.if_else(seen, pa.scalar(b"SEEN"), pa.scalar(b"NOVEL"))
+
+
+def annotate_with_frequency(vcf_in_path, vcf_out_path, known_variants, batch_size=65536, sidecar=None):
+    """
+    Tag every record with FREQ=SEEN or FREQ=NOVEL, a batch of records at a
+    time: the site keys of a batch are looked up in one vectorised
+    `pc.is_in` call against `known_variants` (a set of keys, or the
+    binary array from `load_known_variants` / `known_variant_index`).
 
+    With `sidecar` (a directory), only the FREQ column is written, as a
+    `sidecar.SidecarWriter` file aligned to the records of `vcf_in_path`,
+    and `vcf_out_path` is ignored; see `sidecar.materialise`.
+    """
+    known = known_variant_index(known_variants)
+    with VcfBatchReader(vcf_in_path, batch_size=batch_size) as reader:
+        if sidecar is not None:
+            with SidecarWriter(sidecar, "FREQ", vcf_in_path, {"FREQ": pa.binary()}, [FREQ_HEADER]) as columns:
+                for batch in reader:
+                    columns.write({"FREQ": frequency_values(batch, known)})
+            return
+        with VcfWriter(vcf_out_path) as writer:
+            writer.write_header(reader.header, [FREQ_HEADER])
+            for batch in reader:
+                tags = pc.binary_join_element_wise(b"FREQ=", frequency_values(batch, known), b"")
+                write_batch(writer, batch, batch.with_info(tags))
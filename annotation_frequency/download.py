@@ -1,5 +1,5 @@
 
-import subprocess
+from profiling import run_command
 import os
 
 def download(url,output):
@@ -7,8 +7,8 @@ def download(url,output):
     if os.path.isfile(output):
         return
     os.makedirs(output.parent, exist_ok=True)
-    subprocess.run(["wget", url, "-O", str(output)], check=True)
+    run_command(["wget", url, "-O", str(output)], check=True)
 
     if output.suffix.lower() == "ycf":
-        subprocess.run(["tabix", "-p", "vcf", str(output)], check=True)
+        run_command(["tabix", "-p", "vcf", str(output)], check=True)
     
\ No newline at end of file
@@ -1,4 +1,16 @@
-import gzip
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from sidecar import SidecarWriter
+from vcf_batch import VcfBatchReader, write_batch
+from vcf_io import VcfWriter
+
+PHENO_HIT_HEADER = (
+    '##INFO=<ID=PHENO_HIT,Number=1,Type=String,'
+    'Description="YES if an ANN gene has a curated SGD phenotype, else NO">\n'
+)
+
 
 def load_phenotype_genes(path):
     """Load phenotype-associated genes as a set of STANDARD names."""
@@ -33,28 +45,49 @@ def load_gene_name_map(mapping_path):
     return name_map
 
 
-def annotate_with_phenotype_tags(vcf_in, vcf_out, known_genes, name_map):
-    """Tag variants with PHENO_HIT=YES if any ANN genes match known phenotype-associated genes."""
-    with gzip.open(vcf_in, "rt") as fin, gzip.open(vcf_out, "wt") as fout:
-        for line in fin:
-            if line.startswith("#"):
-                fout.write(line)
-                continue
+def phenotype_hit_genes(known_genes, name_map):
+    """Systematic names whose standard name is in `known_genes` (binary array)."""
+    return pa.array(
+        sorted(systematic.encode() for systematic, standard in name_map.items() if standard in known_genes),
+        pa.binary(),
+    )
+
+
+def phenotype_values(batch, hit_genes):
+    """YES or NO for every record of a batch (binary array)."""
+    entries = pc.split_pattern(batch.info_values("ANN"), pattern=b",")
+    rows = pc.list_parent_indices(entries)
+    parts = pc.split_pattern(pc.list_flatten(entries), pattern=b"|", max_splits=4)
+    complete = pc.greater_equal(pc.list_value_length(parts), 4)
+    genes = pc.list_element(parts.filter(complete), 3)
+    hit_rows = rows.filter(complete).filter(pc.is_in(genes, value_set=hit_genes))
+
+    hit = np.zeros(len(batch), dtype=bool)
+    hit[hit_rows.to_numpy()] = True
+    return pc.if_else(pa.array(hit), pa.scalar(b"YES"), pa.scalar(b"NO"))
+
+
+def annotate_with_phenotype_tags(vcf_in, vcf_out, known_genes, name_map, batch_size=65536, sidecar=None):
+    """
+    Tag variants with PHENO_HIT=YES if any ANN genes match known phenotype-associated genes.
+
+    Works a batch of records at a time: the ANN gene names of a batch are
+    tested in one vectorised membership test against the systematic names
+    whose standard name is in `known_genes`.
 
-            fields = line.strip().split("\t")
-            info = fields[7]
-            ann = next((x for x in info.split(";") if x.startswith("ANN=")), "")
-            tag = "PHENO_HIT=NO"
-
-            if ann:
-                entries = ann.replace("ANN=", "").split(",")
-                genes = {
-                    name_map.get(entry.split("|")[3], None)
-                    for entry in entries
-                }
-                genes = {g for g in genes if g is not None}
-                if known_genes & genes:
-                    tag = "PHENO_HIT=YES"
-
-            fields[7] = info + ";" + tag
-            fout.write("\t".join(fields) + "\n")
+    With `sidecar` (a directory), only the PHENO_HIT column is written and
+    `vcf_out` is ignored, as in `annotate_with_frequency`.
+    """
+    hit_genes = phenotype_hit_genes(known_genes, name_map)
+    with VcfBatchReader(vcf_in, batch_size=batch_size) as reader:
+        if sidecar is not None:
+            with SidecarWriter(sidecar, "PHENO_HIT", vcf_in, {"PHENO_HIT": pa.binary()},
+                               [PHENO_HIT_HEADER]) as columns:
+                for batch in reader:
+                    columns.write({"PHENO_HIT": phenotype_values(batch, hit_genes)})
+            return
+        with VcfWriter(vcf_out) as writer:
+            writer.write_header(reader.header, [PHENO_HIT_HEADER])
+            for batch in reader:
+                tags = pc.binary_join_element_wise(b"PHENO_HIT=", phenotype_values(batch, hit_genes), b"")
+                write_batch(writer, batch, batch.with_info(tags))
@@ -1,6 +1,4 @@
 from pathlib import Path
-import subprocess
-import gzip
 
 from annotation_frequency.download import download
 from annotation_frequency.annotate import load_known_variants
@@ -9,24 +7,17 @@ from annotation_frequency.annotate import annotate_with_frequency
 from annotation_frequency.phenotype_tag import load_phenotype_genes
 from annotation_frequency.phenotype_tag import annotate_with_phenotype_tags
 from annotation_frequency.phenotype_tag import load_gene_name_map
+from sidecar import materialise
 
-def run(ref_url, reference_vcf, query_vcf, phenotype_url=None):
+def run(ref_url, reference_vcf, query_vcf, phenotype_url=None, sidecar=None):
 
     download(ref_url, reference_vcf)
 
 
     known_variants = load_known_variants(reference_vcf)
 
-    freq_anno_file = Path(str(query_vcf).replace(".vcf", "_freq.vcf.gz"))
-    annotate_with_frequency(
-        vcf_in_path=query_vcf,
-        vcf_out_path=freq_anno_file,
-        known_variants=known_variants
-    )
-
-
     if phenotype_url is None:
-        return freq_anno_file
+        return tag_vcf(query_vcf, known_variants, sidecar=sidecar)
 
 
     pheno_out = Path(phenotype_url.split("/")[-1])
@@ -35,14 +26,40 @@ def run(ref_url, reference_vcf, query_vcf, phenotype_url=None):
     known_genes = load_phenotype_genes(pheno_out)
     gene_map = load_gene_name_map("gene_literature.tab")
 
-    pheno_anno_file = Path(str(freq_anno_file).replace("_freq.vcf.gz", "_freq_pheno.vcf"))
-    annotate_with_phenotype_tags(freq_anno_file, pheno_anno_file, known_genes,gene_map)
-
-    return pheno_anno_file
-
-
+    return tag_vcf(query_vcf, known_variants, known_genes, gene_map, sidecar=sidecar)
+
+def tag_vcf(query_vcf, known_variants, known_genes=None, gene_map=None,
+            freq_output=None, pheno_output=None, sidecar=None):
+    """
+    Add FREQ, then PHENO_HIT if `known_genes` is given, from resources that
+    are already loaded (a cohort loads them once per worker).
+
+    With `sidecar` (a directory), each tagger reads `query_vcf` and writes
+    only its column there, and the tagged VCF is written once, by
+    `sidecar.materialise`, instead of once per tag; `freq_output` is not
+    written.
+
+    Returns:
+        Path: The last VCF written.
+    """
+    freq_anno_file = freq_output or Path(str(query_vcf).replace(".vcf", "_freq.vcf.gz"))
+    pheno_anno_file = pheno_output or Path(str(freq_anno_file).replace("_freq.vcf.gz", "_freq_pheno.vcf"))
+    if sidecar is not None:
+        annotate_with_frequency(query_vcf, None, known_variants, sidecar=sidecar)
+        if known_genes is None:
+            return materialise(query_vcf, freq_anno_file, sidecar, names=["FREQ"])
+        annotate_with_phenotype_tags(query_vcf, None, known_genes, gene_map, sidecar=sidecar)
+        return materialise(query_vcf, pheno_anno_file, sidecar, names=["FREQ", "PHENO_HIT"])
 
+    annotate_with_frequency(
+        vcf_in_path=query_vcf,
+        vcf_out_path=freq_anno_file,
+        known_variants=known_variants
+    )
 
+    if known_genes is None:
+        return freq_anno_file
 
+    annotate_with_phenotype_tags(freq_anno_file, pheno_anno_file, known_genes, gene_map)
 
-    
\ No newline at end of file
+    return pheno_anno_file
@@ -0,0 +1,224 @@
+from collections import Counter
+
+from annotation_prioritisation import visual
+from annotation_prioritisation.analysis import amino_acid_position, protein_effect
+from annotation_prioritisation.interpreter import ANN_FIELDS, iter_ann_sites
+
+ANNOTATION = ANN_FIELDS.index("Annotation")
+IMPACT = ANN_FIELDS.index("Impact")
+GENE_NAME = ANN_FIELDS.index("Gene_Name")
+FEATURE_ID = ANN_FIELDS.index("Feature_ID")
+HGVS_P = ANN_FIELDS.index("HGVS.p")
+
+
+def _field(parts, index):
+    """Return ANN field `index` of a split entry (None when absent)."""
+    return parts[index] if index < len(parts) else None
+
+
+class Accumulator:
+    """
+    A metric updated once per ANN entry during `aggregate_annotations`.
+
+    Subclasses implement `update` (called with the site key and the entry
+    split on '|') and `result`.
+    """
+
+    name = None
+
+    def update(self, site, parts):
+        raise NotImplementedError
+
+    def result(self):
+        raise NotImplementedError
+
+
+class ConsequenceCounts(Accumulator):
+    """Equivalent of `analysis.summarize_variant_consequences`."""
+
+    name = "consequences"
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def update(self, site, parts):
+        self.counts[_field(parts, ANNOTATION)] += 1
+
+    def result(self):
+        return self.counts
+
+
+class ImpactPerGene(Accumulator):
+    """Equivalent of `analysis.count_variants_by_impact_per_gene`."""
+
+    def __init__(self, impact_level="HIGH"):
+        self.name = f"{impact_level.lower()}_impact_per_gene"
+        self.impact_level = impact_level
+        self.counts = Counter()
+
+    def update(self, site, parts):
+        if _field(parts, IMPACT) == self.impact_level:
+            self.counts[_field(parts, GENE_NAME)] += 1
+
+    def result(self):
+        return self.counts
+
+
+class MultiTranscriptVariants(Accumulator):
+    """
+    Equivalent of `analysis.count_multi_transcript_variants`.
+    Relies on the entries of a variant being contiguous in the VCF.
+    """
+
+    name = "multi_transcript_variants"
+
+    def __init__(self):
+        self.count = 0
+        self._site = None
+        self._features = set()
+
+    def update(self, site, parts):
+        if site != self._site:
+            self._close()
+            self._site = site
+        self._features.add(_field(parts, FEATURE_ID))
+
+    def _close(self):
+        if len(self._features) > 1:
+            self.count += 1
+        self._features = set()
+
+    def result(self):
+        self._close()
+        self._site = None
+        return self.count
+
+
+class ProteinEffects(Accumulator):
+    """Equivalent of `analysis.classify_protein_effects`."""
+
+    name = "protein_effects"
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def update(self, site, parts):
+        self.counts[protein_effect(_field(parts, HGVS_P))] += 1
+
+    def result(self):
+        return self.counts
+
+
+class AminoAcidRegions(Accumulator):
+    """
+    Equivalent of `analysis.histogram_amino_acid_regions` applied to
+    `analysis.extract_amino_acid_positions`.
+    """
+
+    name = "amino_acid_regions"
+
+    def __init__(self, bin_size=100):
+        self.bin_size = bin_size
+        self.counts = Counter()
+
+    def update(self, site, parts):
+        position = amino_acid_position(_field(parts, HGVS_P))
+        if position is not None:
+            self.counts[(position // self.bin_size) * self.bin_size] += 1
+
+    def result(self):
+        return dict(sorted(self.counts.items()))
+
+
+class ConsequenceGenePairs(Accumulator):
+    """Equivalent of `interpreter.extract_snpeff_annotations`."""
+
+    name = "consequence_gene_pairs"
+
+    def __init__(self):
+        self.pairs = []
+
+    def update(self, site, parts):
+        if len(parts) >= 4:
+            self.pairs.append((parts[ANNOTATION], parts[GENE_NAME]))
+
+    def result(self):
+        return self.pairs
+
+
+class PlotAggregates(Accumulator):
+    """
+    Counts behind the `visual` annotation plots; the result is the list of
+    plot specs accepted by `plotting.render_figures`.
+    """
+
+    name = "plots"
+
+    def __init__(self, n=10, bins=20):
+        self.n = n
+        self.bins = bins
+        self.consequences = Counter()
+        self.impacts = Counter()
+        self.genes = Counter()
+        self.positions = Counter()
+
+    def update(self, site, parts):
+        self.consequences[_field(parts, ANNOTATION)] += 1
+        self.impacts[_field(parts, IMPACT)] += 1
+        gene = _field(parts, GENE_NAME)
+        if gene:
+            self.genes[gene] += 1
+        position = amino_acid_position(_field(parts, HGVS_P), min_length=0)
+        if position is not None:
+            self.positions[position] += 1
+
+    def result(self):
+        specs = [
+            visual.consequence_distribution_spec(self.consequences),
+            visual.impact_distribution_spec(self.impacts),
+            visual.top_genes_spec(self.genes, n=self.n),
+            visual.amino_acid_position_spec(self.positions, bins=self.bins),
+        ]
+        return [spec for spec in specs if spec is not None]
+
+
+def standard_accumulators():
+    """
+    The metrics of the standard annotation report.
+    """
+    return [
+        ConsequenceCounts(),
+        ImpactPerGene("HIGH"),
+        MultiTranscriptVariants(),
+        ProteinEffects(),
+        AminoAcidRegions(),
+        PlotAggregates(),
+    ]
+
+
+def aggregate_annotations(vcf_path, accumulators=None):
+    """
+    Compute several annotation metrics in a single scan of an annotated VCF.
+
+    Each ANN entry is split once and handed to every accumulator, so the cost
+    is one pass over the file however many metrics are enabled.
+
+    Args:
+        vcf_path (str): Path to a .vcf or .vcf.gz file annotated by SnpEff.
+        accumulators (List[Accumulator]): Metrics to compute
+            (default: `standard_accumulators()`).
+
+    Returns:
+        dict: Accumulator name -> result.
+    """
+    if accumulators is None:
+        accumulators = standard_accumulators()
+
+    for chrom, pos, ref, alt, ann_entries in iter_ann_sites(vcf_path):
+        site = (chrom, pos, ref, alt)
+        for raw_ann in ann_entries:
+            parts = raw_ann.split("|")
+            for accumulator in accumulators:
+                accumulator.update(site, parts)
+
+    return {accumulator.name: accumulator.result() for accumulator in accumulators}
@@ -1,6 +1,8 @@
 from collections import Counter
 from collections import defaultdict
 
+IMPACT_RANK = {"HIGH": 3, "MODERATE": 2, "LOW": 1, "MODIFIER": 0}
+
 
 def variant_key(annotation):
     """
@@ -97,11 +99,6 @@ def collapse_to_most_severe_annotation_per_variant(annotations, coding_only=Fals
     Returns:
         List[dict]: One annotation per variant (most severe).
     """
-    impact_rank = {"HIGH": 3, "MODERATE": 2, "LOW": 1, "MODIFIER": 0}
-
-    def variant_key(a):
-        return (a["Chrom"], a["Pos"], a["Ref"], a["Alt"])
-
     # Optionally restrict to coding transcripts
     if coding_only:
         annotations = [
@@ -117,7 +114,7 @@ def collapse_to_most_severe_annotation_per_variant(annotations, coding_only=Fals
     # Keep the most severe annotation for each variant
     collapsed = []
     for ann_list in variant_to_annots.values():
-        best = max(ann_list, key=lambda a: impact_rank.get(a.get("Impact", ""), -1))
+        best = max(ann_list, key=lambda a: IMPACT_RANK.get(a.get("Impact", ""), -1))
         collapsed.append(best)
 
     return collapsed
@@ -129,25 +126,21 @@ def classify_protein_effects(annotations):
     Returns:
         Counter: Counts of 'missense', 'nonsense', 'synonymous', 'unknown', 'other'
     """
-    effect_types = []
-
-    for ann in annotations:
-        p = ann.get("HGVS.p", "")
-
-        if not p or p == "p.?":
-            effect = "unknown"
-        elif "Ter" in p or "*" in p:
-            effect = "nonsense"
-        elif "=" in p:
-            effect = "synonymous"
-        elif p.startswith("p.") and len(p) > 5:
-            effect = "missense"
-        else:
-            effect = "other"
-
-        effect_types.append(effect)
+    return Counter(protein_effect(ann.get("HGVS.p", "")) for ann in annotations)
 
-    return Counter(effect_types)
+def protein_effect(p):
+    """
+    Classify a single HGVS.p string as used by `classify_protein_effects`.
+    """
+    if not p or p == "p.?":
+        return "unknown"
+    elif "Ter" in p or "*" in p:
+        return "nonsense"
+    elif "=" in p:
+        return "synonymous"
+    elif p.startswith("p.") and len(p) > 5:
+        return "missense"
+    return "other"
 
 def extract_amino_acid_positions(annotations):
     """
@@ -159,15 +152,26 @@ def extract_amino_acid_positions(annotations):
     positions = []
 
     for ann in annotations:
-        p = ann.get("HGVS.p", "")
-
-        if p.startswith("p.") and len(p) > 5:
-            digits = "".join(c for c in p if c.isdigit())
-            if digits:
-                positions.append(int(digits))
+        position = amino_acid_position(ann.get("HGVS.p", ""))
+        if position is not None:
+            positions.append(position)
 
     return positions
 
+def amino_acid_position(p, min_length=6):
+    """
+    Parse the numeric amino acid position of a single HGVS.p string, or None.
+
+    Strings shorter than `min_length` are skipped, as the positional
+    analysis always has; the position plot counts any 'p.' string with a
+    digit (min_length=0).
+    """
+    if p and p.startswith("p.") and len(p) >= min_length:
+        digits = "".join(c for c in p if c.isdigit())
+        if digits:
+            return int(digits)
+    return None
+
 def histogram_amino_acid_regions(positions, bin_size=100):
     """
     Summarize positional distribution of variants across protein length bins.
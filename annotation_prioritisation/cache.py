@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from annotation_prioritisation.interpreter import parse_annotated_vcf_table
+from annotation_prioritisation.parallel import parse_annotated_vcf_table_parallel
+
+CACHE_VERSION = 2
+
+
+def cache_paths(vcf_path, cache_dir=None):
+    """
+    Return the (annotations, sites, key) cache file paths for a VCF.
+    By default the cache sits next to the VCF.
+    """
+    vcf_path = Path(vcf_path)
+    cache_dir = Path(cache_dir) if cache_dir else vcf_path.parent
+    stem = cache_dir / vcf_path.name
+    return (
+        stem.with_name(stem.name + ".ann.parquet"),
+        stem.with_name(stem.name + ".sites.parquet"),
+        stem.with_name(stem.name + ".ann.json"),
+    )
+
+
+def file_checksum(path, block_size=1 << 20):
+    """
+    Return the BLAKE2b hex digest of a file's contents.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _source_key(vcf_path, checksum=None):
+    stat = os.stat(vcf_path)
+    return {
+        "version": CACHE_VERSION,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "checksum": checksum or file_checksum(vcf_path),
+    }
+
+
+def _is_valid(vcf_path, key_path):
+    """
+    Check a cache key against the VCF. Size and mtime are compared first;
+    the checksum is only recomputed when the mtime changed (e.g. a copy).
+    """
+    if not key_path.exists():
+        return False
+    with open(key_path) as f:
+        cached = json.load(f)
+
+    stat = os.stat(vcf_path)
+    if cached.get("version") != CACHE_VERSION or cached["size"] != stat.st_size:
+        return False
+    if cached["mtime_ns"] == stat.st_mtime_ns:
+        return True
+    if file_checksum(vcf_path) != cached["checksum"]:
+        return False
+
+    # Same content, new mtime: refresh the key so the next check is cheap.
+    with open(key_path, "w") as f:
+        json.dump(_source_key(vcf_path, checksum=cached["checksum"]), f)
+    return True
+
+
+def write_annotation_cache(vcf_path, cache_dir=None, compression="zstd", n_workers=1):
+    """
+    Parse an annotated VCF and write its columnar tables to a Parquet cache.
+
+    Args:
+        vcf_path (str): Path to a SnpEff-annotated .vcf or .vcf.gz file.
+        cache_dir (str): Directory for the cache files (default: next to the VCF).
+        compression (str): Parquet compression codec.
+        n_workers (int): Parse a BGZF VCF on this many processes (see
+            `parallel.parse_annotated_vcf_table_parallel`); 1 parses serially.
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: The parsed (annotations, sites).
+    """
+    ann_path, sites_path, key_path = cache_paths(vcf_path, cache_dir)
+    ann_path.parent.mkdir(parents=True, exist_ok=True)
+    key = _source_key(vcf_path)
+
+    if n_workers > 1:
+        annotations, sites = parse_annotated_vcf_table_parallel(vcf_path, n_workers=n_workers)
+    else:
+        annotations, sites = parse_annotated_vcf_table(str(vcf_path))
+    annotations.to_parquet(ann_path, compression=compression, index=False)
+    sites.to_parquet(sites_path, compression=compression, index=False)
+
+    # Written last: a key file only exists for a complete cache.
+    with open(key_path, "w") as f:
+        json.dump(key, f)
+
+    return annotations, sites
+
+
+def load_annotation_table(vcf_path, columns=None, cache_dir=None, refresh=False, n_workers=1):
+    """
+    Load the columnar annotation tables for a VCF, parsing it only on a cache miss.
+
+    The cache is keyed by the VCF's size, mtime and checksum. Only the
+    requested annotation `columns` are read back from Parquet ('Variant_Index'
+    is always included).
+
+    Args:
+        vcf_path (str): Path to a SnpEff-annotated .vcf or .vcf.gz file.
+        columns (List[str]): ANN columns to load (default: all).
+        cache_dir (str): Directory for the cache files (default: next to the VCF).
+        refresh (bool): If True, rebuild the cache unconditionally.
+        n_workers (int): Worker processes for parsing on a cache miss.
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: (annotations, sites)
+    """
+    ann_path, sites_path, key_path = cache_paths(vcf_path, cache_dir)
+
+    if refresh or not _is_valid(vcf_path, key_path):
+        annotations, sites = write_annotation_cache(vcf_path, cache_dir, n_workers=n_workers)
+        if columns is not None:
+            annotations = annotations[_with_index(columns)]
+        return annotations, sites
+
+    read_columns = None if columns is None else _with_index(columns)
+    annotations = pd.read_parquet(ann_path, columns=read_columns)
+    sites = pd.read_parquet(sites_path)
+    return annotations, sites
+
+
+def _with_index(columns):
+    return list(columns) + [c for c in ("Variant_Index",) if c not in columns]
@@ -0,0 +1,233 @@
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from annotation_prioritisation.analysis import IMPACT_RANK
+from annotation_prioritisation.cache import load_annotation_table
+from annotation_prioritisation.interpreter import parse_annotated_vcf_table
+
+
+class ColumnarAnalysis:
+    """
+    Vectorised equivalents of the `analysis` helpers over a columnar table.
+
+    Works on the (annotations, sites) pair returned by
+    `interpreter.parse_annotated_vcf_table`. Gene and variant groupings are
+    computed once per instance and reused by every method that needs them.
+    Filtering methods return a new ColumnarAnalysis so calls can be chained.
+
+    Args:
+        annotations (pd.DataFrame): One row per ANN entry, with 'Variant_Index'.
+        sites (pd.DataFrame): Chrom/Pos/Ref/Alt indexed by 'Variant_Index'.
+    """
+
+    def __init__(self, annotations, sites):
+        self.annotations = annotations.reset_index(drop=True)
+        self.sites = sites
+        self._groupings = {}
+
+    @classmethod
+    def from_vcf(cls, vcf_path, chunk_size=100_000):
+        """
+        Parse a SnpEff-annotated VCF straight into a ColumnarAnalysis.
+        """
+        return cls(*parse_annotated_vcf_table(vcf_path, chunk_size=chunk_size))
+
+    @classmethod
+    def from_cache(cls, vcf_path, columns=None, cache_dir=None, n_workers=1):
+        """
+        Load a ColumnarAnalysis through the Parquet cache (see cache.py),
+        reading only the requested ANN `columns`; a cache miss is parsed on
+        `n_workers` processes.
+        """
+        return cls(*load_annotation_table(vcf_path, columns=columns, cache_dir=cache_dir, n_workers=n_workers))
+
+    def __len__(self):
+        return len(self.annotations)
+
+    # --- Cached groupings -------------------------------------------------
+
+    def _codes(self, field):
+        """Integer code per row for `field`; missing values get their own code."""
+        column = self.annotations[field]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            return column.cat.codes.to_numpy(dtype=np.int64)
+        return pd.factorize(column, use_na_sentinel=False)[0].astype(np.int64)
+
+    def _variant_codes(self):
+        """Integer code per row identifying its (Chrom, Pos, Ref, Alt) key."""
+        site_keys = (
+            self.sites.groupby(list(self.sites.columns), sort=False, observed=True, dropna=False)
+            .ngroup()
+            .to_numpy(dtype=np.int64)
+        )
+        return site_keys[self.annotations["Variant_Index"].to_numpy()]
+
+    def _grouping(self, name):
+        """
+        Group rows by gene ("gene") or variant key ("variant") and cache it.
+
+        Returns:
+            dict: 'codes' per row, and per group (in order of first appearance)
+                its 'first' row, row 'count' and sorted row 'rows'.
+        """
+        if name not in self._groupings:
+            codes = self._variant_codes() if name == "variant" else self._codes("Gene_Name")
+            uniq, first, inverse, counts = np.unique(
+                codes, return_index=True, return_inverse=True, return_counts=True
+            )
+            order = np.argsort(first, kind="stable")
+            rank = np.empty_like(order)
+            rank[order] = np.arange(len(order))
+            group_of_row = rank[inverse.reshape(-1)]
+            rows = np.argsort(group_of_row, kind="stable")
+            self._groupings[name] = {
+                "codes": codes,
+                "group_of_row": group_of_row,
+                "first": first[order],
+                "count": counts[order],
+                "rows": np.split(rows, np.cumsum(counts[order])[:-1]),
+            }
+        return self._groupings[name]
+
+    def _gene_labels(self, first_rows):
+        return [self._value("Gene_Name", row) for row in first_rows]
+
+    def _value(self, field, row):
+        value = self.annotations[field].iat[row]
+        return None if pd.isna(value) else value
+
+    def _subset(self, rows):
+        """New instance over the rows selected by a boolean mask or positions."""
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        return ColumnarAnalysis(self.annotations.iloc[rows], self.sites)
+
+    # --- analysis.py equivalents -----------------------------------------
+
+    def summarize_variant_consequences(self):
+        """
+        Count the number of times each consequence appears.
+        """
+        counts = self.annotations["Annotation"].value_counts(sort=False, dropna=False)
+        return Counter({
+            (None if pd.isna(k) else k): int(v) for k, v in counts.items() if v
+        })
+
+    def count_variants_by_impact_per_gene(self, impact_level="HIGH"):
+        """
+        Return a count of variants per gene with the given impact level.
+        """
+        mask = (self.annotations["Impact"] == impact_level).to_numpy()
+        genes = self._grouping("gene")
+        per_group = np.bincount(genes["group_of_row"][mask], minlength=len(genes["first"]))
+        labels = self._gene_labels(genes["first"])
+        return Counter({labels[i]: int(n) for i, n in enumerate(per_group) if n})
+
+    def filter_annotations(self, field, allowed_values):
+        """
+        Keep annotations where `field` is in allowed_values.
+        """
+        return self._subset(self.annotations[field].isin(list(allowed_values)).to_numpy())
+
+    def filter_by_impact(self, impact_levels={"HIGH", "MODERATE"}):
+        """
+        Return annotations with an impact level in the given set.
+        """
+        return self.filter_annotations("Impact", impact_levels)
+
+    def filter_by_consequence(self, consequences):
+        """
+        Return annotations with a consequence (effect) in the given set.
+        """
+        return self.filter_annotations("Annotation", consequences)
+
+    def group_annotations_by_gene(self):
+        """
+        Group annotations into a dict keyed by gene name (DataFrame per gene).
+        """
+        genes = self._grouping("gene")
+        labels = self._gene_labels(genes["first"])
+        return {
+            label: self.annotations.iloc[rows]
+            for label, rows in zip(labels, genes["rows"])
+        }
+
+    def top_genes_by_variant_count(self, n=10):
+        """
+        Return the top N (gene, annotations) pairs with the most annotations.
+
+        Uses partial selection (np.partition) rather than sorting every gene;
+        ties are broken by first appearance, as in the list-based version.
+        """
+        genes = self._grouping("gene")
+        counts = genes["count"]
+        if n <= 0 or len(counts) == 0:
+            return []
+
+        if n < len(counts):
+            threshold = np.partition(counts, len(counts) - n)[len(counts) - n]
+            above = np.flatnonzero(counts > threshold)
+            ties = np.flatnonzero(counts == threshold)[: n - len(above)]
+            selected = np.concatenate([above, ties])
+        else:
+            selected = np.arange(len(counts))
+
+        # Groups are numbered by first appearance, so this is a stable sort.
+        selected = selected[np.lexsort((selected, -counts[selected]))]
+        labels = self._gene_labels(genes["first"][selected])
+        return [
+            (label, self.annotations.iloc[genes["rows"][i]])
+            for label, i in zip(labels, selected)
+        ]
+
+    def count_multi_transcript_variants(self):
+        """
+        Count how many unique variant-allele pairs appear in multiple transcripts.
+        """
+        variants = self._grouping("variant")["group_of_row"]
+        features = self._codes("Feature_ID") + 1
+        pairs = np.unique(variants * (features.max(initial=0) + 1) + features)
+        per_variant = np.bincount(pairs // (features.max(initial=0) + 1))
+        return int(np.count_nonzero(per_variant > 1))
+
+    def collapse_to_most_severe_annotation_per_variant(self, coding_only=False):
+        """
+        Select the most severe annotation per variant.
+
+        Args:
+            coding_only (bool): If True, restrict to protein-coding transcripts.
+
+        Returns:
+            ColumnarAnalysis: One annotation per variant, in order of first
+                appearance; ties keep the first annotation listed.
+        """
+        table = self
+        if coding_only:
+            table = self.filter_annotations("Transcript_BioType", {"protein_coding"})
+
+        variants = table._grouping("variant")["group_of_row"]
+        rank = (
+            table.annotations["Impact"].astype(object).map(IMPACT_RANK)
+            .fillna(-1).to_numpy(dtype=np.int64)
+        )
+        rows = np.arange(len(variants))
+        order = np.lexsort((rows, -rank, variants))
+        first_of_group = np.ones(len(order), dtype=bool)
+        first_of_group[1:] = variants[order][1:] != variants[order][:-1]
+        # `variants` numbers groups by first appearance, so winners come out
+        # in the same order as the dict-based collapse.
+        return table._subset(order[first_of_group])
+
+    # --- Conversion -------------------------------------------------------
+
+    def to_records(self):
+        """
+        Return the annotations as dicts shaped like `parse_annotated_vcf` output.
+        """
+        joined = self.annotations.join(self.sites, on="Variant_Index")
+        joined = joined.drop(columns="Variant_Index").astype(object)
+        joined = joined.where(joined.notna(), None)
+        joined["Pos"] = joined["Pos"].astype(str)
+        return joined.to_dict("records")
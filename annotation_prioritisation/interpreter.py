@@ -1,13 +1,52 @@
-import gzip
+import io
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from vcf_io import VcfReader, VcfRecord, open_binary
+
+ANN_FIELDS = (
+    "Allele",
+    "Annotation",
+    "Impact",
+    "Gene_Name",
+    "Gene_ID",
+    "Feature_Type",
+    "Feature_ID",
+    "Transcript_BioType",
+    "Rank",
+    "HGVS.c",
+    "HGVS.p",
+    "cDNA.pos / cDNA.length",
+    "CDS.pos / CDS.length",
+    "AA.pos / AA.length",
+    "Distance",
+    "Errors/Warnings/Info",
+)
+
+# Low-cardinality ANN fields stored as pandas categoricals in columnar tables.
+CATEGORICAL_ANN_FIELDS = (
+    "Annotation",
+    "Impact",
+    "Gene_Name",
+    "Feature_ID",
+    "Transcript_BioType",
+)
+
+SITE_FIELDS = ("Chrom", "Pos", "Ref", "Alt")
+
+# Other text columns are Arrow-backed: one buffer per column, not one str per value.
+STRING_DTYPE = pd.StringDtype("pyarrow")
 
 
 def open_vcf(filepath):
     """
-    Open a VCF file that may be gzipped or plain text.
+    Open a VCF file that may be BGZF, gzipped or plain text, as text.
+    Compression is detected from the magic bytes, not the suffix; BGZF is
+    decompressed ahead of the reader (see `vcf_io.open_binary`).
     """
-    if filepath.endswith(".gz"):
-        return gzip.open(filepath, "rt")
-    return open(filepath, "r")
+    return io.TextIOWrapper(open_binary(filepath))
 
 
 def extract_snpeff_annotations(vcf_path):
@@ -22,28 +61,59 @@ def extract_snpeff_annotations(vcf_path):
     """
     annotations = []
 
-    with open_vcf(vcf_path) as f:
-        for line in f:
-            if line.startswith("#"):
-                continue  # Skip headers
-
-            fields = line.strip().split("\t")
-            info_field = fields[7]
-
-            for entry in info_field.split(";"):
-                if entry.startswith("ANN="):
-                    ann_values = entry[len("ANN=") :].split(",")
-                    for ann in ann_values:
-                        ann_fields = ann.split("|")
-                        if len(ann_fields) >= 4:
-                            consequence = ann_fields[1]
-                            gene_name = ann_fields[3]
-                            annotations.append((consequence, gene_name))
-                    break  # One ANN per INFO field
+    with VcfReader(vcf_path) as reader:
+        for record in reader:
+            ann_field = record.info_value(b"ANN")
+            if not ann_field:
+                continue
+            for ann in ann_field.decode().split(","):
+                ann_fields = ann.split("|")
+                if len(ann_fields) >= 4:
+                    consequence = ann_fields[1]
+                    gene_name = ann_fields[3]
+                    annotations.append((consequence, gene_name))
 
     return annotations
 
 
+def iter_ann_sites(vcf_path):
+    """
+    Yield (chrom, pos, ref, alt, ann_entries) for each record carrying an ANN field.
+
+    Args:
+        vcf_path (str): Path to a .vcf or .vcf.gz file.
+
+    Yields:
+        Tuple of the site coordinates (as strings) and the list of raw
+        transcript-level ANN entries.
+    """
+    with VcfReader(vcf_path) as reader:
+        for record in reader:
+            site = ann_site(record)
+            if site is not None:
+                yield site
+
+
+def ann_site(record):
+    """
+    Return (chrom, pos, ref, alt, ann_entries) for a `vcf_io.VcfRecord`, or
+    None if the record has no ANN field.
+    """
+    ann_entries = record.info_value(b"ANN")
+    if not ann_entries:
+        return None
+    chrom, pos, ref, alt = record.site()
+    return chrom.decode(), pos.decode(), ref.decode(), alt.decode(), ann_entries.decode().split(",")
+
+
+def ann_site_from_line(line):
+    """
+    Split one VCF body line (bytes) into (chrom, pos, ref, alt, ann_entries),
+    or return None if the record has no ANN field.
+    """
+    return ann_site(VcfRecord(line))
+
+
 def parse_annotated_vcf(vcf_path):
     """
     Parse a SnpEff-annotated VCF file (optionally gzipped) and extract ANN fields.
@@ -56,64 +126,134 @@ def parse_annotated_vcf(vcf_path):
             'Allele', 'Annotation', 'Impact', 'Gene_Name', 'Gene_ID', etc.,
             plus: 'Chrom', 'Pos', 'Ref', 'Alt'
     """
-    import gzip
-
-    ann_fields = [
-        "Allele",
-        "Annotation",
-        "Impact",
-        "Gene_Name",
-        "Gene_ID",
-        "Feature_Type",
-        "Feature_ID",
-        "Transcript_BioType",
-        "Rank",
-        "HGVS.c",
-        "HGVS.p",
-        "cDNA.pos / cDNA.length",
-        "CDS.pos / CDS.length",
-        "AA.pos / AA.length",
-        "Distance",
-        "Errors/Warnings/Info",
-    ]
-
     annotations = []
-    open_func = gzip.open if vcf_path.endswith(".gz") else open
 
-    with open_func(vcf_path, "rt") as f:
-        for line in f:
-            if line.startswith("#"):
-                continue
+    for chrom, pos, ref, alt, ann_entries in iter_ann_sites(vcf_path):
+        for raw_ann in ann_entries:
+            parts = raw_ann.split("|")
+            ann_record = {
+                key: parts[i] if i < len(parts) else None
+                for i, key in enumerate(ANN_FIELDS)
+            }
 
-            fields = line.strip().split("\t")
-            chrom = fields[0]
-            pos = fields[1]
-            ref = fields[3]
-            alt = fields[4]
-            info = fields[7]
+            # Add positional + allele data
+            ann_record.update({
+                "Chrom": chrom,
+                "Pos": pos,
+                "Ref": ref,
+                "Alt": alt,
+            })
 
-            ann_entries = next(
-                (entry[4:] for entry in info.split(";") if entry.startswith("ANN=")),
-                None,
-            )
+            annotations.append(ann_record)
+
+    return annotations
 
-            if ann_entries:
-                for raw_ann in ann_entries.split(","):
-                    parts = raw_ann.split("|")
-                    ann_record = {
-                        key: parts[i] if i < len(parts) else None
-                        for i, key in enumerate(ann_fields)
-                    }
 
-                    # Add positional + allele data
-                    ann_record.update({
-                        "Chrom": chrom,
-                        "Pos": pos,
-                        "Ref": ref,
-                        "Alt": alt,
-                    })
+def parse_annotated_vcf_table(vcf_path, chunk_size=100_000):
+    """
+    Parse a SnpEff-annotated VCF into columnar annotation and site tables.
 
-                    annotations.append(ann_record)
+    Each ANN entry becomes one row of `annotations`, with repetitive fields
+    (see CATEGORICAL_ANN_FIELDS) stored as pandas categoricals, the other
+    text fields as Arrow-backed strings (STRING_DTYPE), and a
+    'Variant_Index' column pointing at the row of `sites` holding its
+    Chrom/Pos/Ref/Alt. Rows are converted in chunks of `chunk_size` entries,
+    so Python objects only ever exist for one chunk at a time.
 
-    return annotations
+    Args:
+        vcf_path (str): Path to a .vcf or .vcf.gz file.
+        chunk_size (int): Number of ANN entries to convert per chunk.
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: (annotations, sites)
+    """
+    builder = AnnotationTableBuilder(chunk_size=chunk_size)
+    for chrom, pos, ref, alt, ann_entries in iter_ann_sites(vcf_path):
+        builder.add_site(chrom, pos, ref, alt, ann_entries)
+    return builder.build()
+
+
+class AnnotationTableBuilder:
+    """
+    Accumulate ANN entries into chunked columns for `parse_annotated_vcf_table`.
+    """
 
+    def __init__(self, chunk_size=100_000):
+        self.chunk_size = chunk_size
+        self._ann_chunks = []
+        self._site_chunks = []
+        self._n_sites = 0
+        self._reset_ann()
+        self._reset_sites()
+
+    def _reset_ann(self):
+        self._ann = {key: [] for key in ANN_FIELDS}
+        self._ann["Variant_Index"] = []
+
+    def _reset_sites(self):
+        self._sites = {key: [] for key in SITE_FIELDS}
+
+    def add_site(self, chrom, pos, ref, alt, ann_entries):
+        """Append one site and its raw ANN entries."""
+        site_index = self._n_sites
+        self._n_sites += 1
+        self._sites["Chrom"].append(chrom)
+        self._sites["Pos"].append(int(pos))
+        self._sites["Ref"].append(ref)
+        self._sites["Alt"].append(alt)
+
+        for raw_ann in ann_entries:
+            parts = raw_ann.split("|")
+            for i, key in enumerate(ANN_FIELDS):
+                self._ann[key].append(parts[i] if i < len(parts) else None)
+            self._ann["Variant_Index"].append(site_index)
+
+        if len(self._ann["Variant_Index"]) >= self.chunk_size:
+            self._flush()
+
+    def _flush(self):
+        if self._ann["Variant_Index"]:
+            self._ann_chunks.append(_columns_to_arrays(self._ann))
+            self._reset_ann()
+        if self._sites["Chrom"]:
+            self._site_chunks.append(_columns_to_arrays(self._sites))
+            self._reset_sites()
+
+    def build(self):
+        """Return the (annotations, sites) DataFrames."""
+        self._flush()
+        annotations = _concat_chunks(
+            self._ann_chunks, list(ANN_FIELDS) + ["Variant_Index"]
+        )
+        sites = _concat_chunks(self._site_chunks, list(SITE_FIELDS))
+        return annotations, sites
+
+
+def _columns_to_arrays(columns):
+    """Convert one chunk of Python lists to compact arrays."""
+    arrays = {}
+    for key, values in columns.items():
+        if key in CATEGORICAL_ANN_FIELDS or key == "Chrom":
+            arrays[key] = pd.Categorical(values)
+        elif key in ("Pos", "Variant_Index"):
+            arrays[key] = np.asarray(values, dtype=np.int64)
+        else:
+            arrays[key] = pd.array(values, dtype=STRING_DTYPE)
+    return arrays
+
+
+def _concat_chunks(chunks, columns):
+    """Concatenate chunk arrays column by column, unifying categories."""
+    data = {}
+    for key in columns:
+        parts = [chunk[key] for chunk in chunks]
+        if key in CATEGORICAL_ANN_FIELDS or key == "Chrom":
+            data[key] = union_categoricals(parts) if parts else pd.Categorical([])
+        elif key in ("Pos", "Variant_Index"):
+            data[key] = np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+        else:
+            data[key] = (
+                pd.concat([pd.Series(part, dtype=STRING_DTYPE) for part in parts], ignore_index=True)
+                if parts else pd.Series([], dtype=STRING_DTYPE)
+            )
+    return pd.DataFrame(data, columns=columns)
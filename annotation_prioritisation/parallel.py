@@ -0,0 +1,183 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import pyarrow as pa
+
+from bgzf import _read_block_size, decompress_block, is_bgzf, iter_block_offsets, read_blocks
+from annotation_prioritisation.interpreter import (
+    ANN_FIELDS,
+    SITE_FIELDS,
+    AnnotationTableBuilder,
+    _concat_chunks,
+    ann_site_from_line,
+    parse_annotated_vcf_table,
+)
+
+
+def plan_chunks(vcf_path, chunk_bytes=32 << 20):
+    """
+    Split a BGZF file into block-aligned work ranges.
+
+    Returns:
+        list[tuple]: (start, end, previous_block) per chunk, where
+            previous_block is the (offset, size) of the block just before
+            `start` (None for the first chunk).
+    """
+    chunks = []
+    start = None
+    previous = None
+    before_start = None
+    for offset, size in iter_block_offsets(vcf_path):
+        if start is None:
+            start, before_start = offset, previous
+        previous = (offset, size)
+        if offset + size - start >= chunk_bytes:
+            chunks.append((start, offset + size, before_start))
+            start = None
+    if start is not None:
+        chunks.append((start, previous[0] + previous[1], before_start))
+    return chunks
+
+
+def _read_owned_lines(f, start, end, previous_block):
+    """
+    Return the bytes of the lines that start inside [start, end).
+
+    A chunk skips its leading partial line (unless the previous block ends on
+    a newline) and reads into the following blocks to finish its last line,
+    so every line is parsed by exactly one chunk.
+    """
+    data = read_blocks(f, start, end)
+
+    if previous_block is not None:
+        f.seek(previous_block[0])
+        previous = decompress_block(f.read(previous_block[1]))
+        if previous and not previous.endswith(b"\n"):
+            newline = data.find(b"\n")
+            data = b"" if newline < 0 else data[newline + 1:]
+
+    offset = end
+    tail = []
+    while data and not data.endswith(b"\n"):
+        f.seek(offset)
+        size = _read_block_size(f)
+        if size is None:
+            break
+        f.seek(offset)
+        block = decompress_block(f.read(size))
+        offset += size
+        newline = block.find(b"\n")
+        if newline >= 0:
+            tail.append(block[:newline + 1])
+            break
+        tail.append(block)
+    return data + b"".join(tail)
+
+
+def _write_shared(tables):
+    """Serialise Arrow tables as one IPC stream into a new shared memory block."""
+    payload = []
+    for table in tables:
+        stream = pa.BufferOutputStream()
+        with pa.ipc.new_stream(stream, table.schema) as writer:
+            writer.write_table(table)
+        payload.append(stream.getvalue())
+
+    shm = shared_memory.SharedMemory(create=True, size=max(1, sum(p.size for p in payload)))
+    layout = []
+    offset = 0
+    for buf in payload:
+        shm.buf[offset:offset + buf.size] = memoryview(buf).cast("B")
+        layout.append((offset, buf.size))
+        offset += buf.size
+    name = shm.name
+    # The block stays registered with the resource tracker the workers share
+    # with the parent: the parent's unlink after reading unregisters it, and
+    # the tracker unlinks blocks never read (a failed map, a dead worker)
+    # when the parent exits.
+    shm.close()
+    return name, layout
+
+
+def _read_shared(name, layout):
+    """Load the tables written by `_write_shared` and free the shared memory."""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        tables = []
+        for offset, size in layout:
+            buf = pa.py_buffer(bytes(shm.buf[offset:offset + size]))
+            tables.append(pa.ipc.open_stream(buf).read_all())
+        return tables
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _parse_chunk(task):
+    """Worker: parse the ANN entries of one chunk into columnar batches."""
+    vcf_path, start, end, previous_block = task
+    with open(vcf_path, "rb") as f:
+        data = _read_owned_lines(f, start, end, previous_block)
+
+    builder = AnnotationTableBuilder(chunk_size=1 << 62)
+    for line in data.split(b"\n"):
+        if not line or line.startswith(b"#"):
+            continue
+        site = ann_site_from_line(line)
+        if site is not None:
+            builder.add_site(*site)
+
+    annotations, sites = builder.build()
+    tables = [
+        pa.Table.from_pandas(annotations, preserve_index=False),
+        pa.Table.from_pandas(sites, preserve_index=False),
+    ]
+    return _write_shared(tables) + (len(sites),)
+
+
+def parse_annotated_vcf_table_parallel(vcf_path, n_workers=None, chunk_bytes=32 << 20):
+    """
+    Parse a BGZF-compressed annotated VCF into columnar tables on a process pool.
+
+    The file is split at BGZF block boundaries into ranges of about
+    `chunk_bytes` compressed bytes; each worker decompresses its range and
+    parses the records that start in it. Workers hand back Arrow IPC batches
+    through shared memory rather than pickled objects, and chunks are
+    reassembled in file order. Inputs that are not BGZF fall back to the
+    serial `parse_annotated_vcf_table`.
+
+    Args:
+        vcf_path (str): Path to a bgzipped .vcf.gz file annotated by SnpEff.
+        n_workers (int): Number of worker processes (default: all cores).
+        chunk_bytes (int): Target compressed size of each work unit.
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: (annotations, sites), as returned
+            by `parse_annotated_vcf_table`.
+    """
+    vcf_path = str(vcf_path)
+    if not vcf_path.endswith(".gz") or not is_bgzf(vcf_path):
+        return parse_annotated_vcf_table(vcf_path)
+
+    tasks = [(vcf_path,) + chunk for chunk in plan_chunks(vcf_path, chunk_bytes)]
+
+    ann_chunks = []
+    site_chunks = []
+    n_sites = 0
+    # Started before the workers so they share it (see _write_shared).
+    resource_tracker.ensure_running()
+    with ProcessPoolExecutor(max_workers=n_workers or os.cpu_count()) as pool:
+        for name, layout, chunk_sites in pool.map(_parse_chunk, tasks):
+            annotations, sites = (t.to_pandas() for t in _read_shared(name, layout))
+            if not chunk_sites:
+                continue
+            annotations["Variant_Index"] += n_sites
+            n_sites += chunk_sites
+            ann_chunks.append({c: annotations[c] for c in annotations.columns})
+            site_chunks.append({c: sites[c] for c in sites.columns})
+
+    return (
+        _concat_chunks(ann_chunks, list(ANN_FIELDS) + ["Variant_Index"]),
+        _concat_chunks(site_chunks, list(SITE_FIELDS)),
+    )
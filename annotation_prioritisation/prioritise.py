@@ -0,0 +1,220 @@
+import csv
+import heapq
+import os
+import tempfile
+import time
+from collections import defaultdict
+
+from annotation_prioritisation.interpreter import ANN_FIELDS
+from annotation_prioritisation.stream import most_severe_entry
+from vcf_io import VcfReader
+
+GENE_NAME_INDEX = ANN_FIELDS.index("Gene_Name")
+ANNOTATION_INDEX = ANN_FIELDS.index("Annotation")
+IMPACT_INDEX = ANN_FIELDS.index("Impact")
+HGVS_P_INDEX = ANN_FIELDS.index("HGVS.p")
+
+# Score contributions of one variant; a gene's score is the sum over its variants.
+DEFAULT_WEIGHTS = {
+    "impact": {"HIGH": 4.0, "MODERATE": 2.0, "LOW": 0.5, "MODIFIER": 0.0},
+    "sift_damaging": 2.0,  # SIFT4G score below `sift_threshold`
+    "novel": 1.0,          # FREQ=NOVEL
+    "pheno_hit": 1.5,      # PHENO_HIT=YES
+}
+SIFT_THRESHOLD = 0.05
+
+GENE_COLUMNS = [
+    "Rank", "Gene_Name", "Score", "N_Variants", "N_High", "N_Moderate",
+    "N_Sift_Damaging", "N_Novel", "N_Pheno_Hit", "Best_Variant_Score",
+]
+VARIANT_COLUMNS = [
+    "Gene_Name", "Chrom", "Pos", "Ref", "Alt", "Score",
+    "Annotation", "Impact", "HGVS.p", "SIFT4G", "FREQ", "PHENO_HIT",
+]
+
+
+def _info_text(record, key):
+    """INFO `key` of a `vcf_io.VcfRecord` as text ("" for a flag), None if absent."""
+    value = record.info_value(key)
+    return None if value is None else value.decode()
+
+
+def score_variant(record, weights=DEFAULT_WEIGHTS, sift_threshold=SIFT_THRESHOLD, coding_only=False):
+    """
+    Score one tagged `vcf_io.VcfRecord`.
+
+    The most severe ANN entry decides the gene and the impact term; SIFT4G,
+    FREQ and PHENO_HIT add their weights when present and positive.
+
+    Args:
+        record (VcfRecord): The record; its INFO is searched per key.
+        weights (dict): Score contributions, shaped like `DEFAULT_WEIGHTS`.
+        sift_threshold (float): SIFT4G scores below this count as damaging.
+        coding_only (bool): If True, only protein-coding ANN entries are used.
+
+    Returns:
+        dict: Gene, score and the evidence behind it, or None if the record
+            has no usable ANN entry.
+    """
+    ann = _info_text(record, b"ANN")
+    best = most_severe_entry(ann.split(","), coding_only) if ann else None
+    if best is None:
+        return None
+
+    parts = best[1].split("|")
+    field = lambda i: parts[i] if i < len(parts) else ""
+    gene = field(GENE_NAME_INDEX)
+    if not gene:
+        return None
+
+    impact = field(IMPACT_INDEX)
+    score = weights["impact"].get(impact, 0.0)
+
+    sift = _info_text(record, b"SIFT4G")
+    try:
+        sift = float(sift) if sift else None
+    except ValueError:
+        sift = None
+    sift_damaging = sift is not None and sift < sift_threshold
+    freq = _info_text(record, b"FREQ") or ""
+    pheno = _info_text(record, b"PHENO_HIT") or ""
+    novel = freq == "NOVEL"
+    pheno_hit = pheno == "YES"
+
+    if sift_damaging:
+        score += weights["sift_damaging"]
+    if novel:
+        score += weights["novel"]
+    if pheno_hit:
+        score += weights["pheno_hit"]
+
+    return {
+        "Gene_Name": gene,
+        "Score": score,
+        "Annotation": field(ANNOTATION_INDEX),
+        "Impact": impact,
+        "HGVS.p": field(HGVS_P_INDEX),
+        "SIFT4G": "" if sift is None else sift,
+        "FREQ": freq,
+        "PHENO_HIT": pheno,
+        "sift_damaging": sift_damaging,
+        "novel": novel,
+        "pheno_hit": pheno_hit,
+    }
+
+
+def _empty_gene():
+    return {
+        "Score": 0.0,
+        "N_Variants": 0,
+        "N_High": 0,
+        "N_Moderate": 0,
+        "N_Sift_Damaging": 0,
+        "N_Novel": 0,
+        "N_Pheno_Hit": 0,
+        "Best_Variant_Score": 0.0,
+    }
+
+
+def _update_gene(gene, variant):
+    gene["Score"] += variant["Score"]
+    gene["N_Variants"] += 1
+    gene["N_High"] += variant["Impact"] == "HIGH"
+    gene["N_Moderate"] += variant["Impact"] == "MODERATE"
+    gene["N_Sift_Damaging"] += variant["sift_damaging"]
+    gene["N_Novel"] += variant["novel"]
+    gene["N_Pheno_Hit"] += variant["pheno_hit"]
+    gene["Best_Variant_Score"] = max(gene["Best_Variant_Score"], variant["Score"])
+
+
+def top_k_genes(gene_stats, k):
+    """
+    Return the `k` highest-scoring genes as (name, stats) pairs, best first.
+    Ties are broken by variant count, then gene name.
+    """
+    return heapq.nsmallest(
+        k,
+        gene_stats.items(),
+        key=lambda item: (-item[1]["Score"], -item[1]["N_Variants"], item[0]),
+    )
+
+
+def prioritise_genes(
+    tagged_vcf,
+    genes_output,
+    variants_output,
+    top_k=50,
+    weights=DEFAULT_WEIGHTS,
+    sift_threshold=SIFT_THRESHOLD,
+    min_variant_score=0.0,
+    coding_only=False,
+):
+    """
+    Score and rank genes from the final tagged VCF in one streaming pass.
+
+    Each record is scored from its most severe ANN entry plus the SIFT4G,
+    FREQ and PHENO_HIT tags. Only per-gene totals are kept in memory; scored
+    variants are spilled to a temporary TSV as they are read. The top `top_k`
+    genes are then selected with a bounded heap, and the ranked gene table
+    and the variants of the selected genes are written row by row.
+
+    Args:
+        tagged_vcf (str): VCF carrying ANN and (optionally) SIFT4G, FREQ and
+            PHENO_HIT tags; plain or gzipped.
+        genes_output (str): Path for the ranked gene TSV.
+        variants_output (str): Path for the TSV of variants in the top genes.
+        top_k (int): Number of genes to keep.
+        weights (dict): Score contributions, shaped like `DEFAULT_WEIGHTS`.
+        sift_threshold (float): SIFT4G scores below this count as damaging.
+        min_variant_score (float): Variants scoring at or below this are not
+            written to `variants_output` (they still count towards genes).
+        coding_only (bool): If True, only protein-coding ANN entries are used.
+
+    Returns:
+        dict: Phase name -> wall-clock seconds ('scan', 'rank', 'write').
+    """
+    timings = {}
+    gene_stats = defaultdict(_empty_gene)
+
+    start = time.perf_counter()
+    spill = tempfile.NamedTemporaryFile(
+        "w+", suffix=".tsv", dir=os.path.dirname(os.path.abspath(variants_output)), delete=False
+    )
+    try:
+        spill_writer = csv.writer(spill, delimiter="\t", lineterminator="\n")
+        with VcfReader(tagged_vcf) as reader:
+            for record in reader:
+                variant = score_variant(record, weights, sift_threshold, coding_only)
+                if variant is None:
+                    continue
+                _update_gene(gene_stats[variant["Gene_Name"]], variant)
+                if variant["Score"] > min_variant_score:
+                    chrom, pos, ref, alt = (value.decode() for value in record.site())
+                    variant.update({"Chrom": chrom, "Pos": pos, "Ref": ref, "Alt": alt})
+                    spill_writer.writerow(variant[c] for c in VARIANT_COLUMNS)
+        timings["scan"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ranked = top_k_genes(gene_stats, top_k)
+        selected = {name for name, _ in ranked}
+        timings["rank"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with open(genes_output, "w", newline="") as out:
+            writer = csv.writer(out, delimiter="\t", lineterminator="\n")
+            writer.writerow(GENE_COLUMNS)
+            for rank, (name, stats) in enumerate(ranked, start=1):
+                writer.writerow([rank, name] + [stats[c] for c in GENE_COLUMNS[2:]])
+
+        spill.seek(0)
+        with open(variants_output, "w", newline="") as out:
+            out.write("\t".join(VARIANT_COLUMNS) + "\n")
+            for row in spill:
+                if row.split("\t", 1)[0] in selected:
+                    out.write(row)
+        timings["write"] = time.perf_counter() - start
+    finally:
+        spill.close()
+        os.remove(spill.name)
+
+    return timings
@@ -0,0 +1,38 @@
+import json
+import os
+
+from annotation_prioritisation.prioritise import DEFAULT_WEIGHTS, prioritise_genes
+
+
+def run(tagged_vcf, output_dir="annotation_prioritisation_out", top_k=50,
+        weights=DEFAULT_WEIGHTS, coding_only=False):
+    """
+    Rank genes from the final tagged VCF (ANN, SIFT4G, FREQ, PHENO_HIT).
+
+    Writes into `output_dir`:
+    - ranked_genes.tsv: the top `top_k` genes by summed variant score
+    - selected_variants.tsv: the scored variants of those genes
+    - timings.json: wall-clock seconds per phase
+
+    Returns:
+        dict: Paths of the ranked gene and selected variant tables.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    genes_output = os.path.join(output_dir, "ranked_genes.tsv")
+    variants_output = os.path.join(output_dir, "selected_variants.tsv")
+
+    timings = prioritise_genes(
+        tagged_vcf,
+        genes_output,
+        variants_output,
+        top_k=top_k,
+        weights=weights,
+        coding_only=coding_only,
+    )
+
+    with open(os.path.join(output_dir, "timings.json"), "w") as f:
+        json.dump(timings, f, indent=2)
+    for phase, seconds in timings.items():
+        print(f"{phase}: {seconds:.2f}s")
+
+    return {"genes": genes_output, "variants": variants_output}
@@ -0,0 +1,108 @@
+from annotation_prioritisation.analysis import IMPACT_RANK
+from annotation_prioritisation.interpreter import ANN_FIELDS, iter_ann_sites
+from vcf_io import VcfReader, VcfWriter
+
+IMPACT_INDEX = ANN_FIELDS.index("Impact")
+BIOTYPE_INDEX = ANN_FIELDS.index("Transcript_BioType")
+
+WORST_ANN_HEADER = (
+    '##INFO=<ID=WORST_ANN,Number=1,Type=String,'
+    'Description="Most severe SnpEff ANN entry of the record (same layout as ANN)">\n'
+)
+
+
+def most_severe_entry(ann_entries, coding_only=False):
+    """
+    Pick the most severe raw ANN entry; ties keep the first one listed.
+
+    Args:
+        ann_entries (List[str]): Raw '|'-separated ANN entries of one site.
+        coding_only (bool): If True, only consider protein-coding transcripts.
+
+    Returns:
+        Tuple[int, str]: (impact rank, entry), or None if no entry qualifies.
+    """
+    best = None
+    for raw_ann in ann_entries:
+        parts = raw_ann.split("|")
+        if coding_only and (len(parts) <= BIOTYPE_INDEX or parts[BIOTYPE_INDEX] != "protein_coding"):
+            continue
+        impact = parts[IMPACT_INDEX] if len(parts) > IMPACT_INDEX else ""
+        rank = IMPACT_RANK.get(impact, -1)
+        if best is None or rank > best[0]:
+            best = (rank, raw_ann)
+    return best
+
+
+def _ann_record(raw_ann, chrom, pos, ref, alt):
+    parts = raw_ann.split("|")
+    record = {key: parts[i] if i < len(parts) else None for i, key in enumerate(ANN_FIELDS)}
+    record.update({"Chrom": chrom, "Pos": pos, "Ref": ref, "Alt": alt})
+    return record
+
+
+def iter_most_severe_annotations(vcf_path, coding_only=False):
+    """
+    Stream the most severe annotation per variant from an annotated VCF.
+
+    Streaming counterpart of
+    `analysis.collapse_to_most_severe_annotation_per_variant`: ANN entries of
+    a site are contiguous in the VCF, so consecutive records sharing a
+    (chrom, pos, ref, alt) key are collapsed as they are read and memory does
+    not grow with the file.
+
+    Args:
+        vcf_path (str): Path to a .vcf or .vcf.gz file annotated by SnpEff.
+        coding_only (bool): If True, restrict to protein-coding transcripts.
+
+    Yields:
+        dict: One annotation per variant, shaped like `parse_annotated_vcf` output.
+    """
+    current_key = None
+    current_best = None
+
+    for chrom, pos, ref, alt, ann_entries in iter_ann_sites(vcf_path):
+        key = (chrom, pos, ref, alt)
+        best = most_severe_entry(ann_entries, coding_only=coding_only)
+
+        if key != current_key:
+            if current_best is not None:
+                yield _ann_record(current_best[1], *current_key)
+            current_key, current_best = key, best
+        elif best is not None and (current_best is None or best[0] > current_best[0]):
+            current_best = best
+
+    if current_best is not None:
+        yield _ann_record(current_best[1], *current_key)
+
+
+def write_most_severe_tsv(vcf_path, output_path, coding_only=False):
+    """
+    Write the most severe annotation per variant to a TSV, one row at a time.
+    """
+    columns = ["Chrom", "Pos", "Ref", "Alt"] + list(ANN_FIELDS)
+    with open(output_path, "w") as out:
+        out.write("\t".join(columns) + "\n")
+        for record in iter_most_severe_annotations(vcf_path, coding_only=coding_only):
+            out.write("\t".join(record[c] or "" for c in columns) + "\n")
+    return output_path
+
+
+def write_worst_ann_vcf(vcf_in, vcf_out, coding_only=False):
+    """
+    Copy a VCF, adding INFO/WORST_ANN with each record's most severe ANN entry.
+    Records without a qualifying entry are copied unchanged.
+    """
+    vcf_out = str(vcf_out)
+
+    with VcfReader(vcf_in) as reader, VcfWriter(vcf_out) as writer:
+        writer.write_header(reader.header, [WORST_ANN_HEADER])
+        for record in reader:
+            ann = record.info_value(b"ANN")
+            best = most_severe_entry(ann.decode().split(","), coding_only) if ann else None
+            if best is None:
+                writer.write(record)
+            else:
+                writer.write_line(record.with_info(b"WORST_ANN=" + best[1].encode()))
+
+    return vcf_out
@@ -1,89 +1,139 @@
-from collections import Counter, defaultdict
-import matplotlib.pyplot as plt
-import os
+from collections import Counter
+import numpy as np
+
+from annotation_prioritisation.analysis import amino_acid_position
+from plotting import bar_spec, hist_spec, render_figure, render_figures, wait_for_figures
+
+
+def _unzip(pairs):
+    pairs = list(pairs)
+    return ([k for k, _ in pairs], [v for _, v in pairs])
+
+
+def consequence_distribution_spec(consequence_counts):
+    """
+    Build the consequence type bar chart aggregate from consequence counts.
+    """
+    labels, values = _unzip(Counter(consequence_counts).most_common())
+    return bar_spec(
+        "consequence_distribution.png", labels, values,
+        "Consequence Type Distribution", xlabel="Variant Count",
+        horizontal=True, figsize=(8, 5),
+    )
+
+
+def impact_distribution_spec(impact_counts):
+    """
+    Build the SnpEff impact category bar chart aggregate from impact counts.
+    """
+    labels, values = _unzip(impact_counts.items())
+    return bar_spec(
+        "impact_distribution.png", labels, values,
+        "Impact Level Distribution", ylabel="Variant Count",
+    )
+
+
+def top_genes_spec(gene_counts, n=10):
+    """
+    Build the top N genes bar chart aggregate from per-gene hit counts.
+    """
+    top_genes = sorted(gene_counts.items(), key=lambda x: x[1], reverse=True)[:n]
+    labels, values = _unzip(top_genes)
+    return bar_spec(
+        "top_genes_by_count.png", labels, values,
+        "Top Genes by Variant Hit Count", xlabel="Variant Count",
+        horizontal=True, figsize=(8, 5),
+    )
+
+
+def amino_acid_position_spec(position_counts, bins=20):
+    """
+    Build the amino acid position histogram aggregate from position counts.
+    Returns None when there are no positions to plot.
+    """
+    if not position_counts:
+        return None
+    positions = list(position_counts.keys())
+    counts, edges = np.histogram(
+        positions, bins=bins, weights=list(position_counts.values())
+    )
+    return hist_spec(
+        "amino_acid_position_histogram.png", edges.tolist(), counts,
+        "Distribution of Amino Acid Positions", "Amino Acid Position",
+        ylabel="Variant Count",
+    )
+
+
+def annotation_plot_specs(annotations, n=10, bins=20):
+    """
+    Build all annotation plot aggregates in a single pass over `annotations`.
+    """
+    consequences = Counter()
+    impacts = Counter()
+    genes = Counter()
+    positions = Counter()
+
+    for a in annotations:
+        consequences[a["Annotation"]] += 1
+        impacts[a["Impact"]] += 1
+        if a["Gene_Name"]:
+            genes[a["Gene_Name"]] += 1
+        position = amino_acid_position(a.get("HGVS.p", ""), min_length=0)
+        if position is not None:
+            positions[position] += 1
+
+    specs = [
+        consequence_distribution_spec(consequences),
+        impact_distribution_spec(impacts),
+        top_genes_spec(genes, n=n),
+        amino_acid_position_spec(positions, bins=bins),
+    ]
+    return [spec for spec in specs if spec is not None]
+
+
+def plot_annotation_report(annotations, output_dir="plots", mode="render", n_workers=None):
+    """
+    Render every annotation plot in a process pool (see plotting.render_figures
+    for the "render" / "deferred" / "none" modes).
+    """
+    futures = render_figures(
+        annotation_plot_specs(annotations), output_dir, mode=mode, n_workers=n_workers
+    )
+    return wait_for_figures(futures)
+
 
 def plot_consequence_distribution(annotations, output_dir="plots"):
     """
     Save a horizontal bar chart of variant consequence types.
     """
-    os.makedirs(output_dir, exist_ok=True)
     consequence_counts = Counter(a["Annotation"] for a in annotations)
-    labels, values = zip(*consequence_counts.most_common())
-
-    plt.figure(figsize=(8, 5))
-    plt.barh(labels, values)
-    plt.xlabel("Variant Count")
-    plt.title("Consequence Type Distribution")
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, "consequence_distribution.png"))
-    plt.close()
+    render_figure(consequence_distribution_spec(consequence_counts), output_dir)
 
 
 def plot_impact_distribution(annotations, output_dir="plots"):
     """
     Save a bar chart of SnpEff impact categories.
     """
-    os.makedirs(output_dir, exist_ok=True)
     impact_counts = Counter(a["Impact"] for a in annotations)
-    labels, values = zip(*impact_counts.items())
-
-    plt.figure(figsize=(6, 4))
-    plt.bar(labels, values)
-    plt.ylabel("Variant Count")
-    plt.title("Impact Level Distribution")
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, "impact_distribution.png"))
-    plt.close()
-
+    render_figure(impact_distribution_spec(impact_counts), output_dir)
 
 
 def plot_top_genes_by_variant_count(annotations, n=10, output_dir="plots"):
     """
     Save a bar chart of the top N genes with most variant annotations.
     """
-    os.makedirs(output_dir, exist_ok=True)
-    gene_hits = defaultdict(int)
-    for a in annotations:
-        gene = a["Gene_Name"]
-        if gene:
-            gene_hits[gene] += 1
-
-    top_genes = sorted(gene_hits.items(), key=lambda x: x[1], reverse=True)[:n]
-    labels, values = zip(*top_genes)
-
-    plt.figure(figsize=(8, 5))
-    plt.barh(labels, values)
-    plt.xlabel("Variant Count")
-    plt.title("Top Genes by Variant Hit Count")
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, "top_genes_by_count.png"))
-    plt.close()
-
+    gene_hits = Counter(a["Gene_Name"] for a in annotations if a["Gene_Name"])
+    render_figure(top_genes_spec(gene_hits, n=n), output_dir)
 
 
 def plot_amino_acid_position_distribution(annotations, bins=20, output_dir="plots"):
     """
     Save a histogram of amino acid positions from HGVS.p field.
     """
-    os.makedirs(output_dir, exist_ok=True)
-    positions = []
-
-    for a in annotations:
-        p = a.get("HGVS.p", "")
-        if p.startswith("p.") and any(c.isdigit() for c in p):
-            digits = "".join(c for c in p if c.isdigit())
-            if digits:
-                positions.append(int(digits))
-
-    if positions:
-        plt.figure(figsize=(8, 4))
-        plt.hist(positions, bins=bins)
-        plt.xlabel("Amino Acid Position")
-        plt.ylabel("Variant Count")
-        plt.title("Distribution of Amino Acid Positions")
-        plt.tight_layout()
-        plt.savefig(os.path.join(output_dir, "amino_acid_position_histogram.png"))
-        plt.close()
-
-
-
+    positions = Counter(
+        p for p in (amino_acid_position(a.get("HGVS.p", ""), min_length=0) for a in annotations)
+        if p is not None
+    )
+    spec = amino_acid_position_spec(positions, bins=bins)
+    if spec is not None:
+        render_figure(spec, output_dir)
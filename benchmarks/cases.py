@@ -0,0 +1,77 @@
+import os
+
+
+class Case:
+    """
+    A timed call into one Python stage.
+
+    `setup(vcf_gz, work_dir)` prepares the arguments outside the timed
+    region and `run(*args)` is the call being measured. Throughput is
+    reported against the number of records in the input VCF.
+    """
+
+    def __init__(self, name, setup, run):
+        self.name = name
+        self.setup = setup
+        self.run = run
+
+
+def _input_only(vcf_gz, work_dir):
+    return (vcf_gz,)
+
+
+def _setup_frequency(vcf_gz, work_dir):
+    import pyarrow.compute as pc
+
+    from annotation_frequency.annotate import load_known_variants
+
+    # Every third site is "known", as if it were in the Ensembl variation VCF.
+    keys = load_known_variants(vcf_gz)
+    known = keys.take(pc.sort_indices(keys)).filter([i % 3 == 0 for i in range(len(keys))])
+    return vcf_gz, os.path.join(work_dir, "freq.vcf.gz"), known
+
+
+def _run_frequency(vcf_gz, output, known):
+    from annotation_frequency.annotate import annotate_with_frequency
+
+    annotate_with_frequency(vcf_in_path=vcf_gz, vcf_out_path=output, known_variants=known)
+
+
+def _setup_snv_biallelic(vcf_gz, work_dir):
+    return vcf_gz, os.path.join(work_dir, "snv_biallelic.vcf.gz")
+
+
+def _run_snv_biallelic(vcf_gz, output):
+    from impact_scoring.filter import filter_SNV_biallelic
+
+    filter_SNV_biallelic(vcf_gz, output)
+
+
+def _run_sift(vcf_gz):
+    from impact_scoring.sift_4g import parse_sift_scores
+
+    parse_sift_scores(vcf_gz)
+
+
+def _run_reliability(vcf_gz):
+    from technical_reliability.variant_qc import filter_reliable_snvs, load_variants
+
+    filter_reliable_snvs(load_variants(vcf_gz), min_dp=10, min_ab=0.2)
+
+
+def _run_parse_annotated(vcf_gz):
+    from annotation_prioritisation.interpreter import parse_annotated_vcf
+
+    parse_annotated_vcf(vcf_gz)
+
+
+CASES = {
+    case.name: case
+    for case in (
+        Case("annotate_with_frequency", _setup_frequency, _run_frequency),
+        Case("filter_SNV_biallelic", _setup_snv_biallelic, _run_snv_biallelic),
+        Case("parse_sift_scores", _input_only, _run_sift),
+        Case("filter_reliable_snvs", _input_only, _run_reliability),
+        Case("parse_annotated_vcf", _input_only, _run_parse_annotated),
+    )
+}
@@ -0,0 +1,176 @@
+import random
+
+from vcf_io import VcfWriter
+
+# Saccharomyces cerevisiae R64-1-1 nuclear chromosomes and mitochondrion.
+R64_CONTIGS = (
+    ("I", 230218), ("II", 813184), ("III", 316620), ("IV", 1531933),
+    ("V", 576874), ("VI", 270161), ("VII", 1090940), ("VIII", 562643),
+    ("IX", 439888), ("X", 745751), ("XI", 666816), ("XII", 1078177),
+    ("XIII", 924431), ("XIV", 784333), ("XV", 1091291), ("XVI", 948066),
+    ("Mito", 85779),
+)
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1M": 1_000_000, "10M": 10_000_000}
+
+# (consequence, impact, weight) roughly in the proportions SnpEff reports for yeast.
+CONSEQUENCES = (
+    ("missense_variant", "MODERATE", 30),
+    ("synonymous_variant", "LOW", 25),
+    ("upstream_gene_variant", "MODIFIER", 20),
+    ("downstream_gene_variant", "MODIFIER", 15),
+    ("stop_gained", "HIGH", 3),
+    ("frameshift_variant", "HIGH", 3),
+    ("splice_region_variant", "LOW", 2),
+    ("start_lost", "HIGH", 1),
+    ("inframe_deletion", "MODERATE", 1),
+)
+AMINO_ACIDS = ("Ala", "Arg", "Asn", "Asp", "Cys", "Gln", "Glu", "Gly", "His", "Ile",
+               "Leu", "Lys", "Met", "Phe", "Pro", "Ser", "Thr", "Trp", "Tyr", "Val")
+BASES = "ACGT"
+GENE_SPACING = 2000  # one systematic gene name per 2 kb
+
+HEADER = """##fileformat=VCFv4.2
+##source=benchmarks.generate
+##reference=Saccharomyces_cerevisiae.R64-1-1.dna.toplevel.fa
+{contigs}
+##FILTER=<ID=PASS,Description="All filters passed">
+##FILTER=<ID=LowQual,Description="Low quality">
+##INFO=<ID=MQ,Number=1,Type=Float,Description="RMS mapping quality">
+##INFO=<ID=SAF,Number=A,Type=Integer,Description="Alt allele observations on the forward strand">
+##INFO=<ID=SAR,Number=A,Type=Integer,Description="Alt allele observations on the reverse strand">
+##INFO=<ID=ANN,Number=.,Type=String,Description="Functional annotations: 'Allele | Annotation | Annotation_Impact | Gene_Name | Gene_ID | Feature_Type | Feature_ID | Transcript_BioType | Rank | HGVS.c | HGVS.p | cDNA.pos / cDNA.length | CDS.pos / CDS.length | AA.pos / AA.length | Distance | ERRORS / WARNINGS / INFO'">
+##INFO=<ID=SIFT4G,Number=1,Type=Float,Description="SIFT4G score">
+##INFO=<ID=SIFT4G_pred,Number=1,Type=String,Description="SIFT4G prediction">
+##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">
+##FORMAT=<ID=DP,Number=1,Type=Integer,Description="Read depth">
+##FORMAT=<ID=AD,Number=R,Type=Integer,Description="Allelic depths">
+"""
+
+
+def gene_name(chrom_index, pos):
+    """Systematic-style gene name (e.g. YAL012W) for a position."""
+    if chrom_index >= 16:
+        return f"Q{pos // GENE_SPACING:04d}"
+    slot = pos // GENE_SPACING
+    arm = "L" if slot % 2 else "R"
+    strand = "W" if (slot // 2) % 2 else "C"
+    return f"Y{chr(ord('A') + chrom_index)}{arm}{slot % 1000:03d}{strand}"
+
+
+def _ann_entry(rng, allele, gene, consequence, impact):
+    biotype = "protein_coding" if rng.random() < 0.9 else "ncRNA"
+    aa_pos = rng.randint(1, 1500)
+    if consequence == "missense_variant":
+        hgvs_p = f"p.{rng.choice(AMINO_ACIDS)}{aa_pos}{rng.choice(AMINO_ACIDS)}"
+    elif consequence == "stop_gained":
+        hgvs_p = f"p.{rng.choice(AMINO_ACIDS)}{aa_pos}*"
+    elif consequence == "synonymous_variant":
+        aa = rng.choice(AMINO_ACIDS)
+        hgvs_p = f"p.{aa}{aa_pos}{aa}"
+    else:
+        hgvs_p = ""
+    cds_pos = aa_pos * 3
+    return (
+        f"{allele}|{consequence}|{impact}|{gene}|{gene}|transcript|{gene}_mRNA|"
+        f"{biotype}|1/1|c.{cds_pos}A>G|{hgvs_p}|{cds_pos}/4500|{cds_pos}/4500|"
+        f"{aa_pos}/1500||"
+    )
+
+
+def _record(rng, chrom, chrom_index, pos, n_samples, weights):
+    ref = rng.choice(BASES)
+    alts = [rng.choice([b for b in BASES if b != ref])]
+    kind = rng.random()
+    if kind < 0.05:
+        alts.append(rng.choice([b for b in BASES if b != ref and b != alts[0]]))
+    elif kind < 0.13:
+        alts[0] = ref + "".join(rng.choice(BASES) for _ in range(rng.randint(1, 4)))
+    alt = ",".join(alts)
+
+    info = []
+    if rng.random() < 0.95:
+        info.append(f"MQ={rng.randint(15, 60)}")
+    if rng.random() < 0.9:
+        info.append("SAF=" + ",".join(str(rng.randint(0, 20)) for _ in alts))
+        info.append("SAR=" + ",".join(str(rng.randint(0, 20)) for _ in alts))
+
+    gene = gene_name(chrom_index, pos)
+    entries = []
+    missense = False
+    for i in range(rng.choices((1, 2, 3, 4), (50, 30, 15, 5))[0]):
+        consequence, impact = rng.choices(CONSEQUENCES, weights)[0][:2]
+        missense |= consequence == "missense_variant"
+        entry_gene = gene if i == 0 else gene_name(chrom_index, pos + GENE_SPACING * i)
+        entries.append(_ann_entry(rng, alts[0], entry_gene, consequence, impact))
+    info.append("ANN=" + ",".join(entries))
+
+    if missense and len(alts) == 1 and len(alts[0]) == 1:
+        score = round(rng.betavariate(0.6, 1.2), 3)
+        info.append(f"SIFT4G={score}")
+        info.append("SIFT4G_pred=" + ("DELETERIOUS" if score < 0.05 else "TOLERATED"))
+
+    samples = []
+    for _ in range(n_samples):
+        dp = rng.randint(0, 150)
+        alt_reads = rng.randint(0, dp)
+        ad = [dp - alt_reads, alt_reads] + [rng.randint(0, 2) for _ in alts[1:]]
+        gt = rng.choice(("0/1", "0/1", "1/1", "0/0"))
+        samples.append(f"{gt}:{dp}:{','.join(map(str, ad))}")
+
+    filt = rng.choices(("PASS", ".", "LowQual"), (75, 15, 10))[0]
+    qual = round(rng.uniform(10, 500), 1)
+    return (
+        f"{chrom}\t{pos}\t.\t{ref}\t{alt}\t{qual}\t{filt}\t{';'.join(info)}\t"
+        f"GT:DP:AD\t" + "\t".join(samples) + "\n"
+    )
+
+
+def iter_vcf_lines(n_records, n_samples=1, seed=0):
+    """
+    Yield the lines of a deterministic synthetic VCF shaped like an
+    annotated R64-1-1 call set (same `seed` -> same file).
+
+    Records are spread over the R64-1-1 contigs in proportion to their
+    length, in sorted order, and carry ANN, SIFT4G (missense SNVs only),
+    MQ, SAF, SAR and per-sample GT:DP:AD.
+    """
+    rng = random.Random(seed)
+    weights = [w for _, _, w in CONSEQUENCES]
+    total_length = sum(length for _, length in R64_CONTIGS)
+
+    yield HEADER.format(contigs="\n".join(
+        f"##contig=<ID={name},length={length}>" for name, length in R64_CONTIGS
+    ))
+    sample_names = "\t".join(f"S{i + 1}" for i in range(n_samples))
+    yield f"#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\t{sample_names}\n"
+
+    remaining = n_records
+    for index, (chrom, length) in enumerate(R64_CONTIGS):
+        if index == len(R64_CONTIGS) - 1:
+            n_contig = remaining
+        else:
+            n_contig = min(remaining, round(n_records * length / total_length))
+        remaining -= n_contig
+
+        # Mean gap of length / n_contig, clamped so no record lies past the contig end.
+        max_gap = max(1, 2 * length // max(n_contig, 1) - 1)
+        pos = 0
+        for _ in range(n_contig):
+            pos = min(pos + rng.randint(1, max_gap), length)
+            yield _record(rng, chrom, index, pos, n_samples, weights)
+
+
+def write_vcf(path, n_records, n_samples=1, seed=0):
+    """
+    Write a synthetic VCF (see `iter_vcf_lines`); '.gz' paths are
+    BGZF-compressed and tabix-indexed.
+    """
+    path = str(path)
+    lines = iter_vcf_lines(n_records, n_samples, seed)
+    with VcfWriter(path) as writer:
+        header = next(lines) + next(lines)
+        writer.write_header(header.encode().splitlines(keepends=True))
+        for line in lines:
+            writer.write_line(line.encode())
+    return path
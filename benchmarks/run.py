@@ -0,0 +1,172 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from benchmarks.cases import CASES
+from benchmarks.generate import SCALES, write_vcf
+
+BENCH_DIR = Path(__file__).resolve().parent
+DATA_DIR = BENCH_DIR / "data"
+BASELINE_FILE = BENCH_DIR / "baseline.json"
+
+
+def fixture_path(scale, n_samples, seed=0, data_dir=DATA_DIR):
+    """
+    Return the synthetic VCF for a scale and sample count, generating it
+    (and its tabix index) on first use.
+    """
+    data_dir = Path(data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    path = data_dir / f"r64_{scale}_{n_samples}s_seed{seed}.vcf.gz"
+    if not path.exists():
+        print(f"Generating {path.name}")
+        tmp_path = path.with_name(path.name + ".tmp.gz")
+        write_vcf(tmp_path, SCALES[scale], n_samples=n_samples, seed=seed)
+        os.replace(f"{tmp_path}.tbi", f"{path}.tbi")
+        os.replace(tmp_path, path)
+    return path
+
+
+def _measure(case_name, vcf_gz, repeat):
+    """Run in a fresh process so peak RSS belongs to this case alone."""
+    case = CASES[case_name]
+    with tempfile.TemporaryDirectory() as work_dir:
+        args = case.setup(str(vcf_gz), work_dir)
+        setup_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        walls = []
+        cpus = []
+        for _ in range(repeat):
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            start = time.perf_counter()
+            case.run(*args)
+            walls.append(time.perf_counter() - start)
+            after = resource.getrusage(resource.RUSAGE_SELF)
+            cpus.append((after.ru_utime - usage.ru_utime) + (after.ru_stime - usage.ru_stime))
+
+    return {
+        "wall_seconds": min(walls),
+        "cpu_seconds": min(cpus),
+        # ru_maxrss is in KiB on Linux; includes the setup's own peak.
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "setup_peak_rss_kb": setup_rss,
+    }
+
+
+def run_benchmarks(cases, scales, samples, repeat=3, seed=0, data_dir=DATA_DIR):
+    """
+    Time each case on each (scale, sample count) fixture.
+
+    Every measurement runs in its own spawned process. Wall and CPU time are
+    the best of `repeat` runs; throughput is input records per second.
+
+    Returns:
+        dict: "<case>@<scale>x<samples>" -> measurements.
+    """
+    results = {}
+    spawn = multiprocessing.get_context("spawn")
+    for scale in scales:
+        for n_samples in samples:
+            vcf_gz = fixture_path(scale, n_samples, seed, data_dir)
+            for case_name in cases:
+                with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+                    result = pool.submit(_measure, case_name, vcf_gz, repeat).result()
+                result["records"] = SCALES[scale]
+                result["records_per_second"] = round(SCALES[scale] / result["wall_seconds"], 1)
+                key = f"{case_name}@{scale}x{n_samples}"
+                results[key] = result
+                print(
+                    f"{key:45s} {result['wall_seconds']:9.3f}s "
+                    f"{result['records_per_second']:12.0f} rec/s "
+                    f"{result['peak_rss_kb'] / 1024:9.1f} MiB"
+                )
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance=0.2):
+    """
+    Return the regressions: results slower, or with a higher peak RSS, than
+    the baseline by more than `tolerance` (a fraction).
+
+    Returns:
+        List[str]: One message per regression.
+    """
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        for metric in ("wall_seconds", "peak_rss_kb"):
+            limit = reference[metric] * (1 + tolerance)
+            if result[metric] > limit:
+                regressions.append(
+                    f"{key}: {metric} {result[metric]:.3f} > {reference[metric]:.3f} "
+                    f"(+{result[metric] / reference[metric] - 1:.0%})"
+                )
+    return regressions
+
+
+def load_baseline(path=BASELINE_FILE):
+    if not Path(path).exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def save_baseline(results, path=BASELINE_FILE):
+    """Merge `results` into the stored baseline."""
+    baseline = load_baseline(path)
+    baseline.update(results)
+    with open(path, "w") as f:
+        json.dump({"machine": _machine(), "results": baseline}, f, indent=2, sort_keys=True)
+    return path
+
+
+def _machine():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Python VCF stages.")
+    parser.add_argument("--cases", nargs="+", default=list(CASES), choices=list(CASES))
+    parser.add_argument("--scales", nargs="+", default=["10k"], choices=list(SCALES))
+    parser.add_argument("--samples", nargs="+", type=int, default=[1],
+                        help="Sample counts per fixture (e.g. 1 8)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=str(DATA_DIR))
+    parser.add_argument("--baseline", default=str(BASELINE_FILE))
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed slowdown / memory growth vs the baseline")
+    parser.add_argument("--output", default=None, help="Write the results as JSON")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.cases, args.scales, args.samples,
+                             repeat=args.repeat, seed=args.seed, data_dir=args.data_dir)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"machine": _machine(), "results": results}, f, indent=2)
+
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+    else:
+        regressions = compare_to_baseline(results, load_baseline(args.baseline), args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,609 @@
+import io
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Fixed part of a gzip member header: ID1 ID2 CM FLG MTIME XFL OS XLEN
+_HEADER = struct.Struct("<BBBBIBBH")
+_HEADER_SIZE = _HEADER.size
+_FOOTER_SIZE = 8  # CRC32 + ISIZE
+
+
+def is_bgzf(path):
+    """
+    Return True if `path` starts with a BGZF block (gzip member carrying the
+    'BC' extra subfield), False for plain gzip or uncompressed files.
+    """
+    with open(path, "rb") as f:
+        return _read_block_size(f) is not None
+
+
+def _read_block_size(f):
+    """
+    Read a block header at the current position and return the total block
+    size, or None if there is no BGZF block here.
+    """
+    header = f.read(_HEADER_SIZE)
+    if len(header) < _HEADER_SIZE:
+        return None
+    return block_size(header + f.read(_HEADER.unpack(header)[-1]))
+
+
+def block_size(buf, offset=0):
+    """
+    Return the total size of the BGZF block starting at `offset` in `buf`,
+    or None if no BGZF block header starts there.
+    """
+    if len(buf) - offset < _HEADER_SIZE:
+        return None
+    id1, id2, cm, flg, _, _, _, xlen = _HEADER.unpack_from(buf, offset)
+    if id1 != 31 or id2 != 139 or cm != 8 or not flg & 4:
+        return None
+
+    i = offset + _HEADER_SIZE
+    end = min(i + xlen, len(buf))
+    while i + 4 <= end:
+        si1, si2, slen = buf[i], buf[i + 1], struct.unpack_from("<H", buf, i + 2)[0]
+        if i + 4 + slen > len(buf):
+            return None
+        if si1 == 66 and si2 == 67 and slen == 2:
+            return struct.unpack_from("<H", buf, i + 4)[0] + 1
+        i += 4 + slen
+    return None
+
+
+def iter_block_offsets(path):
+    """
+    Yield (offset, size) for every BGZF block of a file, reading only headers.
+    """
+    with open(path, "rb") as f:
+        offset = 0
+        while True:
+            f.seek(offset)
+            size = _read_block_size(f)
+            if size is None:
+                return
+            yield offset, size
+            offset += size
+
+
+def decompress_block(block):
+    """
+    Decompress one complete BGZF block (header, deflate data and footer).
+    """
+    xlen = struct.unpack_from("<H", block, 10)[0]
+    data = zlib.decompress(block[12 + xlen:-_FOOTER_SIZE], wbits=-15)
+    if zlib.crc32(data) != struct.unpack_from("<I", block, len(block) - 8)[0]:
+        raise ValueError("BGZF block failed its CRC check")
+    return data
+
+
+def read_blocks(f, start, end):
+    """
+    Decompress all blocks in the byte range [start, end) of an open file.
+    """
+    f.seek(start)
+    raw = f.read(end - start)
+    out = []
+    offset = 0
+    while offset < len(raw):
+        size = block_size(raw, offset)
+        if size is None:
+            raise ValueError(f"No BGZF block at offset {start + offset}")
+        out.append(decompress_block(raw[offset:offset + size]))
+        offset += size
+    return b"".join(out)
+
+
+def _decompress_chunk(raw):
+    """Decompress a buffer holding whole BGZF blocks."""
+    out = []
+    offset = 0
+    while offset < len(raw):
+        size = block_size(raw, offset)
+        out.append(decompress_block(raw[offset:offset + size]))
+        offset += size
+    return b"".join(out)
+
+
+class BgzfReader(io.RawIOBase):
+    """
+    Read a BGZF file sequentially, decompressing upcoming blocks on a
+    thread pool (zlib releases the GIL) so decompression overlaps with
+    whatever the caller does with the data.
+
+    Compressed data is read in runs of whole blocks of about `chunk_bytes`;
+    at most `read_ahead` runs are decompressed ahead of the reader. Wrap in
+    `io.BufferedReader` for line iteration.
+
+    Args:
+        path (str): Path to a BGZF file.
+        threads (int): Decompression threads.
+        read_ahead (int): Runs decompressed ahead of the reader.
+        chunk_bytes (int): Compressed bytes per run.
+    """
+
+    def __init__(self, path, threads=2, read_ahead=8, chunk_bytes=1 << 20):
+        super().__init__()
+        self._file = open(path, "rb")
+        self._pool = ThreadPoolExecutor(max_workers=max(1, threads))
+        self._pending = deque()
+        self._read_ahead = max(1, read_ahead)
+        self._chunk_bytes = chunk_bytes
+        self._carry = b""
+        self._eof = False
+        self._data = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def _fill(self):
+        while not self._eof and len(self._pending) < self._read_ahead:
+            chunk = self._file.read(self._chunk_bytes)
+            raw = self._carry + chunk
+            end = 0
+            while True:
+                size = block_size(raw, end)
+                if size is None or end + size > len(raw):
+                    break
+                end += size
+            self._carry = raw[end:]
+            if end:
+                self._pending.append(self._pool.submit(_decompress_chunk, raw[:end]))
+            if not chunk:
+                self._eof = True
+                if self._carry:
+                    raise ValueError(f"Truncated or non-BGZF data at the end of {self._file.name}")
+
+    def readinto(self, b):
+        while not self._data:
+            self._fill()
+            if not self._pending:
+                return 0
+            self._data = memoryview(self._pending.popleft().result())
+        n = min(len(b), len(self._data))
+        b[:n] = self._data[:n]
+        self._data = self._data[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._pool.shutdown(cancel_futures=True)
+            self._file.close()
+        super().close()
+
+
+# Largest uncompressed payload per block; as in htslib, this leaves room for
+# incompressible data to fit the 64 KiB block limit.
+BLOCK_DATA_SIZE = 0xFF00
+EOF_BLOCK = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+
+def compress_block(data, level=6):
+    """
+    Compress `data` (at most BLOCK_DATA_SIZE bytes) into one BGZF block.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    cdata = compressor.compress(data) + compressor.flush()
+    bsize = _HEADER_SIZE + 6 + len(cdata) + _FOOTER_SIZE
+    return b"".join((
+        _HEADER.pack(31, 139, 8, 4, 0, 0, 255, 6),
+        b"BC", struct.pack("<HH", 2, bsize - 1),
+        cdata,
+        struct.pack("<II", zlib.crc32(data), len(data)),
+    ))
+
+
+class BgzfWriter:
+    """
+    Write a BGZF file, compressing blocks on a thread pool (zlib releases
+    the GIL) while keeping them in order on disk.
+
+    Positions handed out by `tell` are provisional (block number << 16 |
+    offset in block) because compressed block sizes are only known once
+    the blocks are written; `virtual_offset` converts them after `close`.
+
+    Args:
+        path (str): Output path.
+        threads (int): Compression threads.
+        level (int): zlib compression level.
+    """
+
+    def __init__(self, path, threads=4, level=6):
+        self._file = open(path, "wb")
+        self._level = level
+        self._pool = ThreadPoolExecutor(max_workers=max(1, threads))
+        self._pending = deque()
+        self._max_pending = 4 * max(1, threads)
+        self._buffer = bytearray()
+        self._n_blocks = 0
+        self._block_offsets = [0]  # compressed offset of every block, plus the end
+        self._short_blocks = {}  # block number -> data size, for blocks ended early
+
+    def write(self, data):
+        buffer = self._buffer
+        if len(buffer) + len(data) < BLOCK_DATA_SIZE:
+            buffer += data
+            return
+        view = memoryview(data)
+        while view:
+            space = BLOCK_DATA_SIZE - len(buffer)
+            buffer += view[:space]
+            view = view[space:]
+            if len(buffer) == BLOCK_DATA_SIZE:
+                self._submit()
+                buffer = self._buffer
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def tell(self):
+        """Provisional position of the next byte (see `virtual_offset`)."""
+        return self._n_blocks << 16 | len(self._buffer)
+
+    def tell_after(self, sizes):
+        """
+        Provisional positions `sizes` bytes (an int or NumPy array) past
+        `tell`, for data about to be written: blocks are always filled to
+        BLOCK_DATA_SIZE, so the block boundaries are known in advance.
+        """
+        total = len(self._buffer) + sizes
+        return (self._n_blocks + total // BLOCK_DATA_SIZE) << 16 | total % BLOCK_DATA_SIZE
+
+    def _submit(self):
+        self._pending.append(self._pool.submit(compress_block, bytes(self._buffer), self._level))
+        self._buffer = bytearray()
+        self._n_blocks += 1
+        while len(self._pending) > self._max_pending:
+            self._write_block(self._pending.popleft().result())
+
+    def _write_block(self, block):
+        self._file.write(block)
+        self._block_offsets.append(self._block_offsets[-1] + len(block))
+
+    def flush_block(self):
+        """End the current block early (e.g. after the header)."""
+        if self._buffer:
+            self._short_blocks[self._n_blocks] = len(self._buffer)
+            self._submit()
+
+    def virtual_offset(self, position):
+        """
+        Convert a `tell` position into a BGZF virtual offset (after `close`).
+        The end of a block is the start of the next one, as htslib reports it.
+        """
+        block, within = position >> 16, position & 0xFFFF
+        if within and within == self._short_blocks.get(block):
+            block, within = block + 1, 0
+        return self._block_offsets[block] << 16 | within
+
+    def close(self):
+        if self.closed:
+            return
+        self.flush_block()
+        while self._pending:
+            self._write_block(self._pending.popleft().result())
+        self._file.write(EOF_BLOCK)
+        self._pool.shutdown()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_blocks(path):
+    """
+    Yield (offset, decompressed data) for every BGZF block of a file.
+    """
+    with open(path, "rb") as f:
+        for offset, size in iter_block_offsets(path):
+            f.seek(offset)
+            yield offset, decompress_block(f.read(size))
+
+
+def reg2bin(beg, end, min_shift=14, depth=5):
+    """
+    Bin of the 0-based half-open interval [beg, end) in the hierarchical
+    binning scheme shared by tabix (.tbi) and CSI indexes.
+    """
+    end -= 1
+    shift = min_shift
+    offset = ((1 << (3 * depth)) - 1) // 7
+    for level in range(depth, 0, -1):
+        if beg >> shift == end >> shift:
+            return offset + (beg >> shift)
+        shift += 3
+        offset -= 1 << (3 * (level - 1))
+    return 0
+
+
+def _reg2bin_array(begs, ends, min_shift=14, depth=5):
+    """`reg2bin` over NumPy arrays of intervals."""
+    ends = ends - 1
+    bins = np.zeros(len(begs), dtype=np.int64)
+    pending = np.ones(len(begs), dtype=bool)
+    shift = min_shift
+    offset = ((1 << (3 * depth)) - 1) // 7
+    for level in range(depth, 0, -1):
+        hit = pending & (begs >> shift == ends >> shift)
+        bins[hit] = offset + (begs[hit] >> shift)
+        pending &= ~hit
+        shift += 3
+        offset -= 1 << (3 * (level - 1))
+    return bins
+
+
+def _bin_first_window(bin_number, depth):
+    level = 0
+    b = bin_number
+    while b:
+        level += 1
+        b = (b - 1) >> 3
+    first = ((1 << (3 * level)) - 1) // 7
+    return (bin_number - first) << (3 * (depth - level))
+
+
+class _Reference:
+    __slots__ = ("bins", "linear", "first", "last", "n_mapped")
+
+    def __init__(self):
+        self.bins = {}
+        self.linear = []
+        self.first = None
+        self.last = 0
+        self.n_mapped = 0
+
+
+class IndexBuilder:
+    """
+    Build a tabix (.tbi) or CSI index for a coordinate-sorted VCF as its
+    records are written.
+
+    Positions passed to `add` may be real virtual offsets or provisional
+    `BgzfWriter.tell` positions; `write` maps them through `resolve`.
+    Unsorted input disables the index instead of raising, since it can
+    still be read sequentially.
+
+    Args:
+        fmt (str): "tbi" or "csi".
+        min_shift (int): log2 of the smallest bin / linear window (CSI only;
+            tabix is fixed at 14).
+        depth (int): Number of binning levels (CSI only; tabix is fixed at 5).
+    """
+
+    def __init__(self, fmt="tbi", min_shift=14, depth=5):
+        if fmt not in ("tbi", "csi"):
+            raise ValueError(f"Unknown index format: {fmt}")
+        self.fmt = fmt
+        self.min_shift = 14 if fmt == "tbi" else min_shift
+        self.depth = 5 if fmt == "tbi" else depth
+        self.names = []
+        self.sorted = True
+        self._refs = {}
+        self._current = None
+        self._last_beg = -1
+
+    def add(self, chrom, beg, end, start, stop):
+        """
+        Record one VCF record covering the 0-based interval [beg, end) whose
+        bytes run from position `start` to `stop`.
+        """
+        if not self.sorted:
+            return
+        if chrom != self._current:
+            if chrom in self._refs:
+                self.sorted = False
+                return
+            self._refs[chrom] = _Reference()
+            self.names.append(chrom)
+            self._current = chrom
+            self._last_beg = -1
+        if beg < self._last_beg:
+            self.sorted = False
+            return
+        self._last_beg = beg
+        end = max(end, beg + 1)
+
+        ref = self._refs[chrom]
+        chunks = ref.bins.setdefault(reg2bin(beg, end, self.min_shift, self.depth), [])
+        if chunks and chunks[-1][1] == start:
+            chunks[-1][1] = stop
+        else:
+            chunks.append([start, stop])
+
+        linear = ref.linear
+        last_window = (end - 1) >> self.min_shift
+        if len(linear) <= last_window:
+            linear.extend([None] * (last_window + 1 - len(linear)))
+        for window in range(beg >> self.min_shift, last_window + 1):
+            if linear[window] is None:
+                linear[window] = start
+
+        if ref.first is None:
+            ref.first = start
+        ref.last = stop
+        ref.n_mapped += 1
+
+    def add_batch(self, chrom, begs, ends, starts, stops):
+        """
+        Vectorised `add` for a run of consecutive records on one contig,
+        given as NumPy int64 arrays.
+        """
+        if not self.sorted or not len(begs):
+            return
+        if chrom != self._current:
+            if chrom in self._refs:
+                self.sorted = False
+                return
+            self._refs[chrom] = _Reference()
+            self.names.append(chrom)
+            self._current = chrom
+            self._last_beg = -1
+        if begs[0] < self._last_beg or (np.diff(begs) < 0).any():
+            self.sorted = False
+            return
+        self._last_beg = int(begs[-1])
+        ends = np.maximum(ends, begs + 1)
+
+        ref = self._refs[chrom]
+        # Consecutive records in the same bin extend one chunk.
+        bins = _reg2bin_array(begs, ends, self.min_shift, self.depth)
+        run_starts = np.flatnonzero(np.diff(bins, prepend=-1))
+        run_ends = np.append(run_starts[1:], len(bins)) - 1
+        for bin_number, first, last in zip(
+            bins[run_starts].tolist(), starts[run_starts].tolist(), stops[run_ends].tolist()
+        ):
+            chunks = ref.bins.setdefault(bin_number, [])
+            if chunks and chunks[-1][1] == first:
+                chunks[-1][1] = last
+            else:
+                chunks.append([first, last])
+
+        # Linear index: each window takes the first record overlapping it.
+        first_windows = begs >> self.min_shift
+        counts = ((ends - 1) >> self.min_shift) - first_windows + 1
+        windows = np.repeat(first_windows - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        windows, first = np.unique(windows, return_index=True)
+        offsets = np.repeat(starts, counts)[first]
+        linear = ref.linear
+        if len(linear) <= windows[-1]:
+            linear.extend([None] * (int(windows[-1]) + 1 - len(linear)))
+        for window, offset in zip(windows.tolist(), offsets.tolist()):
+            if linear[window] is None:
+                linear[window] = offset
+
+        if ref.first is None:
+            ref.first = int(starts[0])
+        ref.last = int(stops[-1])
+        ref.n_mapped += len(begs)
+
+    def write(self, path, resolve=lambda position: position):
+        """Write the index, BGZF-compressed, to `path`."""
+        names = b"".join(name + b"\0" for name in self.names)
+        # format 2 = VCF; sequence, begin and end columns; '#' comments; no skip.
+        conf = struct.pack("<6i", 2, 1, 2, 0, ord("#"), 0) + struct.pack("<i", len(names)) + names
+
+        out = [b"TBI\1" + struct.pack("<i", len(self.names)) + conf] if self.fmt == "tbi" else [
+            b"CSI\1" + struct.pack("<3i", self.min_shift, self.depth, len(conf)) + conf
+            + struct.pack("<i", len(self.names))
+        ]
+        pseudo_bin = ((1 << (3 * self.depth + 3)) - 1) // 7 + 1
+
+        for name in self.names:
+            ref = self._refs[name]
+            linear = []
+            previous = 0
+            for offset in ref.linear:
+                previous = resolve(offset) if offset is not None else previous
+                linear.append(previous)
+
+            bins = sorted(ref.bins.items())
+            out.append(struct.pack("<i", len(bins) + 1))
+            for bin_number, chunks in bins:
+                out.append(struct.pack("<I", bin_number))
+                if self.fmt == "csi":
+                    window = _bin_first_window(bin_number, self.depth)
+                    out.append(struct.pack("<Q", linear[window] if window < len(linear) else 0))
+                out.append(struct.pack("<i", len(chunks)))
+                out.append(b"".join(
+                    struct.pack("<QQ", resolve(start), resolve(stop)) for start, stop in chunks
+                ))
+            # Pseudo-bin with the reference's offset range and record counts.
+            out.append(struct.pack("<I", pseudo_bin))
+            if self.fmt == "csi":
+                out.append(struct.pack("<Q", 0))
+            out.append(struct.pack("<i", 2))
+            out.append(struct.pack("<4Q", resolve(ref.first), resolve(ref.last), ref.n_mapped, 0))
+
+            if self.fmt == "tbi":
+                out.append(struct.pack("<i", len(linear)))
+                out.append(struct.pack(f"<{len(linear)}Q", *linear))
+
+        out.append(struct.pack("<Q", 0))  # records without coordinates
+
+        with BgzfWriter(path, threads=1) as writer:
+            writer.write(b"".join(out))
+        return path
+
+
+def read_index_names(path):
+    """
+    Sequence names of a tabix (.tbi) or CSI index, in the order the indexed
+    file holds them.
+    """
+    data = b"".join(block for _, block in iter_blocks(path))
+    if data[:4] == b"TBI\1":
+        conf = data[8:]
+    elif data[:4] == b"CSI\1":
+        conf = data[16:]
+    else:
+        raise ValueError(f"Not a tabix or CSI index: {path}")
+    (names_length,) = struct.unpack_from("<i", conf, 24)
+    return [name.decode() for name in conf[28:28 + names_length].split(b"\0") if name]
+
+
+def remap_index(path, output, remap):
+    """
+    Copy a tabix (.tbi) or CSI index to `output` with every virtual offset
+    passed through `remap` (e.g. after the blocks before them changed);
+    the pseudo-bins' record counts are left as they are.
+    """
+    data = bytearray(b"".join(block for _, block in iter_blocks(path)))
+    u64 = struct.Struct("<Q")
+
+    def patch(at):
+        u64.pack_into(data, at, remap(u64.unpack_from(data, at)[0]))
+
+    if data[:4] == b"TBI\1":
+        csi = False
+        depth = 5
+        (l_nm,) = struct.unpack_from("<i", data, 32)
+        pos = 36 + l_nm
+        n_ref = struct.unpack_from("<i", data, 4)[0]
+    elif data[:4] == b"CSI\1":
+        csi = True
+        _, depth, l_aux = struct.unpack_from("<3i", data, 4)
+        pos = 16 + l_aux
+        (n_ref,) = struct.unpack_from("<i", data, pos)
+        pos += 4
+    else:
+        raise ValueError(f"Not a tabix or CSI index: {path}")
+    pseudo_bin = ((1 << (3 * depth + 3)) - 1) // 7 + 1
+
+    for _ in range(n_ref):
+        (n_bin,) = struct.unpack_from("<i", data, pos)
+        pos += 4
+        for _ in range(n_bin):
+            (bin_number,) = struct.unpack_from("<I", data, pos)
+            pos += 4
+            if csi:
+                patch(pos)  # loffset
+                pos += 8
+            (n_chunk,) = struct.unpack_from("<i", data, pos)
+            pos += 4
+            for i in range(n_chunk):
+                if bin_number != pseudo_bin or i == 0:
+                    patch(pos)
+                    patch(pos + 8)
+                pos += 16
+        if not csi:
+            (n_intv,) = struct.unpack_from("<i", data, pos)
+            pos += 4
+            for i in range(n_intv):
+                patch(pos + 8 * i)
+            pos += 8 * n_intv
+
+    with BgzfWriter(output, threads=1) as writer:
+        writer.write(bytes(data))
+    return output
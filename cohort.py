@@ -0,0 +1,446 @@
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from pathlib import Path
+
+import main
+import profiling
+from pipeline import Stage, run_pipeline
+from variant_focus.converter import gtf_to_bed
+from variant_focus.run import focus_vcf_in_regions
+from annotation.annotate import annotate_vcf_with_snpeff
+from technical_reliability.run import run as tech_run, render_plots
+from impact_scoring.run import run as impact_run
+from annotation_frequency.annotate import load_known_variants
+from annotation_frequency.phenotype_tag import load_gene_name_map, load_phenotype_genes
+from annotation_frequency.run import tag_vcf
+from annotation_prioritisation.run import run as prioritisation_run
+from unique_sites import join_sites, write_unique_sites
+from vcf_io import compress_vcf, index_vcf
+
+COHORT_STATE_FILE = "cohort_state.json"
+SHARED_STAGES = ("download_gtf", "download_variation", "download_phenotypes", "build_snpeff_db",
+                 "index_reference")
+
+# Per-worker resources, loaded once by `_init_worker`.
+_resources = {}
+
+
+def load_manifest(path):
+    """
+    Read a cohort manifest: one `sample<TAB>vcf` line per sample. Blank
+    lines, '#' comments and a `sample` header line are skipped; relative
+    VCF paths are taken relative to the manifest.
+
+    Returns:
+        List[Tuple[str, Path]]: (sample, absolute VCF path) in manifest order.
+    """
+    path = Path(path)
+    samples = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) < 2:
+                raise ValueError(f"Manifest line needs a sample and a VCF: {line.strip()}")
+            sample, vcf = parts[0].strip(), parts[1].strip()
+            if sample == "sample" and not samples:
+                continue
+            samples.append((sample, (path.parent / vcf).resolve()))
+
+    names = [sample for sample, _ in samples]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate samples in manifest: {duplicates}")
+    return samples
+
+
+def shared_paths(gene_map="gene_literature.tab"):
+    """Absolute paths of the resources every sample uses (see main.py)."""
+    return {
+        "fasta_ref": main.fasta_ref.resolve(),
+        "bed": main.bed_output_path.resolve(),
+        "snpeff_dir": main.snpeff_dir.resolve(),
+        "snpeff_config": Path("snpeff.config").resolve(),
+        "snpeff_ann_cache": main.snpeff_ann_cache.resolve(),
+        "genome_key": main.key,
+        "impact_db": main.impact_db.resolve(),
+        "reference_vcf": main.reference_vcf.resolve(),
+        "phenotype_table": main.phenotype_table.resolve(),
+        "gene_map": Path(gene_map).resolve(),
+    }
+
+
+def shared_stages():
+    """
+    The sample-independent stages: downloads, the SnpEff DB build, the
+    reference index and the CDS intervals, run once for the whole cohort.
+    """
+    stages = [stage for stage in main.build_stages() if stage.name in SHARED_STAGES]
+    stages.append(Stage("cds_bed", partial(gtf_to_bed, main.gtf_path, bed_output=main.bed_output_path),
+                        inputs=[main.gtf_path], outputs=[main.bed_output_path]))
+    return stages
+
+
+def _init_worker(paths):
+    """Load the known-variant index and phenotype lookups once per worker."""
+    _resources["paths"] = paths
+    _resources["known_variants"] = load_known_variants(paths["reference_vcf"])
+    _resources["known_genes"] = load_phenotype_genes(paths["phenotype_table"])
+    _resources["gene_map"] = load_gene_name_map(paths["gene_map"])
+
+
+def _link_input(sample, vcf, sample_dir):
+    """
+    Link the sample VCF (and its index) into the sample directory, so the
+    focus stage writes its intermediates there; index it if it has none.
+    """
+    if not Path(vcf).exists():
+        raise FileNotFoundError(f"Sample VCF not found: {vcf}")
+    link = sample_dir / f"{sample}.vcf.gz"
+    if not link.is_symlink():
+        link.symlink_to(vcf)
+    indexed = False
+    for suffix in (".tbi", ".csi"):
+        index = Path(f"{vcf}{suffix}")
+        index_link = Path(f"{link}{suffix}")
+        if index.exists():
+            if not index_link.is_symlink():
+                index_link.symlink_to(index)
+            indexed = True
+    if not indexed and not Path(f"{link}.tbi").exists():
+        index_vcf(link)
+    return link
+
+
+def _score_impact(technical_filter_vcf, impact_vcf, impact_db, damaging_vcf, impact_fixed_vcf_gz):
+    impact_run(technical_filter_vcf, impact_vcf, impact_db,
+               write_tsv="sift_scores.tsv", write_vcf=str(damaging_vcf))
+    compress_vcf(impact_vcf.with_name(impact_vcf.stem + "_fixed.vcf"), impact_fixed_vcf_gz)
+
+
+def sample_stages(sample, vcf, sample_dir, sites_dir=None):
+    """
+    The per-sample stages of main.py, reading the shared resources of this
+    worker; every file they write lands in `sample_dir`.
+
+    With `sites_dir` (see `site_stages`), the annotate and frequency stages
+    copy the annotations of the cohort's unique sites onto the sample's
+    records instead of running SnpEff, SIFT4G and the taggers again.
+    """
+    paths = _resources["paths"]
+    vcf_input = _link_input(sample, vcf, sample_dir)
+    focused_vcf = sample_dir / "focused.vcf.gz"
+    annotated_vcf = sample_dir / "annotated.vcf"
+    technical_filter_vcf = sample_dir / "technical_filter.vcf.gz"
+    impact_vcf = sample_dir / "impact.vcf"
+    impact_fixed_vcf_gz = sample_dir / "impact_fixed.vcf.gz"
+    tag_sidecar = sample_dir / "tags.sidecar"
+    tagged_vcf = sample_dir / "tagged.vcf.gz"
+    prioritisation_dir = sample_dir / "prioritisation"
+    qc_dir = sample_dir / "annotation_prio_qc"
+
+    focus = Stage("focus",
+                  partial(focus_vcf_in_regions, vcf_input, paths["bed"], paths["fasta_ref"], focused_vcf),
+                  inputs=[vcf_input], outputs=[focused_vcf])
+    qc = Stage("qc", partial(tech_run, str(annotated_vcf), str(technical_filter_vcf), plots="deferred",
+                             qc_dir=str(qc_dir)),
+               inputs=[annotated_vcf], outputs=[technical_filter_vcf])
+    qc_plots = Stage("qc_plots", partial(render_plots, str(qc_dir)), after=["qc"])
+    prioritise = Stage("prioritise", partial(prioritisation_run, str(tagged_vcf), str(prioritisation_dir)),
+                       inputs=[tagged_vcf], outputs=[prioritisation_dir / "ranked_genes.tsv"])
+
+    if sites_dir is not None:
+        sites = site_outputs(sites_dir)
+        return [
+            focus,
+            Stage("annotate",
+                  partial(join_sites, focused_vcf, sites["annotated"], annotated_vcf, sites["sites"]),
+                  inputs=[focused_vcf, sites["annotated"]], outputs=[annotated_vcf]),
+            qc,
+            qc_plots,
+            Stage("frequency",
+                  partial(join_sites, technical_filter_vcf, sites["tagged"], tagged_vcf, sites["sites"],
+                          keep_unmatched=False),
+                  inputs=[technical_filter_vcf, sites["tagged"]], outputs=[tagged_vcf]),
+            prioritise,
+        ]
+
+    return [
+        focus,
+        Stage("annotate",
+              partial(annotate_vcf_with_snpeff, str(focused_vcf), str(annotated_vcf),
+                      genome_key=paths["genome_key"], config_path=str(paths["snpeff_config"]),
+                      data_dir=str(paths["snpeff_dir"]), cache=str(paths["snpeff_ann_cache"])),
+              inputs=[focused_vcf], outputs=[annotated_vcf]),
+        qc,
+        qc_plots,
+        Stage("impact",
+              partial(_score_impact, technical_filter_vcf, impact_vcf, paths["impact_db"],
+                      sample_dir / "damaging_only.vcf.gz", impact_fixed_vcf_gz),
+              inputs=[technical_filter_vcf], outputs=[impact_fixed_vcf_gz]),
+        Stage("frequency",
+              partial(tag_vcf, impact_fixed_vcf_gz, _resources["known_variants"],
+                      _resources["known_genes"], _resources["gene_map"],
+                      pheno_output=tagged_vcf, sidecar=tag_sidecar),
+              inputs=[impact_fixed_vcf_gz], outputs=[tagged_vcf]),
+        prioritise,
+    ]
+
+
+def site_outputs(sites_dir):
+    """Files of the unique-sites run (see `site_stages`)."""
+    sites_dir = Path(sites_dir)
+    return {
+        "sites": sites_dir / "sites.vcf.gz",
+        "annotated": sites_dir / "annotated.vcf.gz",
+        "impact_fixed": sites_dir / "impact_fixed.vcf.gz",
+        "tagged": sites_dir / "tagged.vcf.gz",
+    }
+
+
+def _annotate_sites(sites_vcf, annotated_vcf, paths):
+    plain = annotated_vcf.with_suffix("")
+    annotate_vcf_with_snpeff(str(sites_vcf), str(plain), genome_key=paths["genome_key"],
+                             config_path=str(paths["snpeff_config"]), data_dir=str(paths["snpeff_dir"]),
+                             cache=str(paths["snpeff_ann_cache"]))
+    compress_vcf(plain, annotated_vcf)
+    plain.unlink()
+
+
+def site_stages(focused_vcfs, sites_dir):
+    """
+    The site-level stages, run once over the union of the samples' sites:
+    SnpEff, SIFT4G and FREQ/PHENO_HIT tagging depend only on CHROM, POS,
+    REF and ALT, so their cost scales with the unique sites of the cohort.
+    Only the technical filter looks at sample data, and runs per sample.
+    """
+    paths = _resources["paths"]
+    sites_dir = Path(sites_dir)
+    outputs = site_outputs(sites_dir)
+    impact_vcf = sites_dir / "impact.vcf"
+
+    return [
+        Stage("unique_sites", partial(write_unique_sites, focused_vcfs, outputs["sites"]),
+              inputs=focused_vcfs, outputs=[outputs["sites"]]),
+        Stage("annotate", partial(_annotate_sites, outputs["sites"], outputs["annotated"], paths),
+              inputs=[outputs["sites"]], outputs=[outputs["annotated"]]),
+        Stage("impact",
+              partial(_score_impact, outputs["annotated"], impact_vcf, paths["impact_db"],
+                      sites_dir / "damaging_only.vcf.gz", outputs["impact_fixed"]),
+              inputs=[outputs["annotated"]], outputs=[outputs["impact_fixed"]]),
+        Stage("frequency",
+              partial(tag_vcf, outputs["impact_fixed"], _resources["known_variants"],
+                      _resources["known_genes"], _resources["gene_map"],
+                      pheno_output=outputs["tagged"], sidecar=sites_dir / "tags.sidecar"),
+              inputs=[outputs["impact_fixed"]], outputs=[outputs["tagged"]]),
+    ]
+
+
+def _run_stages(directory, stages, max_cpus, force, result):
+    """
+    Run `stages` (a function of the directory) with `directory` as the
+    working directory and record the outcome in `result`.
+    """
+    state_path = directory / "pipeline_state.json"
+    start = time.perf_counter()
+    cwd = os.getcwd()
+    profiling.reset()
+    try:
+        os.chdir(directory)
+        run_pipeline(stages(), state_path=str(state_path), max_cpus=max_cpus, force=force,
+                     report_path=str(directory / "run_report.json"))
+        result["status"] = "done"
+    except Exception as exc:
+        result["status"] = "failed"
+        result["error"] = repr(exc)
+        result["traceback"] = traceback.format_exc()
+    finally:
+        os.chdir(cwd)
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    if state_path.exists():
+        with open(state_path) as f:
+            result["stages"] = {name: record.get("status") for name, record in json.load(f).items()}
+    return result
+
+
+def run_sample(sample, vcf, output_dir, max_cpus=1, force=(), sites_dir=None, only=None):
+    """
+    Run one sample through the per-sample stages in its own directory.
+
+    The worker changes into the sample directory for the duration, so the
+    stages' relative scratch files (QC plots, SIFT4G intermediates) cannot
+    collide between samples. Stage progress is kept per sample, so a
+    rerun resumes each sample where it stopped.
+
+    Args:
+        sites_dir (str): Take site annotations from this unique-sites run
+            (see `sample_stages`).
+        only (List[str]): Run just these stages (e.g. ["focus"]).
+
+    Returns:
+        dict: {"sample", "status", "seconds", "stages", and "error" on failure}.
+    """
+    sample_dir = (Path(output_dir) / sample).resolve()
+    sample_dir.mkdir(parents=True, exist_ok=True)
+
+    def stages():
+        selected = sample_stages(sample, vcf, sample_dir, sites_dir)
+        return [stage for stage in selected if only is None or stage.name in only]
+
+    result = {"sample": sample, "vcf": str(vcf), "directory": str(sample_dir)}
+    return _run_stages(sample_dir, stages, max_cpus, force, result)
+
+
+def run_sites(focused_vcfs, sites_dir, max_cpus=1, force=()):
+    """Run `site_stages` in `sites_dir`, as `run_sample` runs a sample."""
+    sites_dir = Path(sites_dir).resolve()
+    sites_dir.mkdir(parents=True, exist_ok=True)
+    result = {"sample": "unique_sites", "directory": str(sites_dir)}
+    return _run_stages(sites_dir, partial(site_stages, focused_vcfs, sites_dir), max_cpus, force, result)
+
+
+def _run_samples(pool, samples, output_dir, cpus_per_sample, force, results, **kwargs):
+    futures = {
+        pool.submit(run_sample, sample, vcf, output_dir, cpus_per_sample, force, **kwargs): sample
+        for sample, vcf in samples
+    }
+    for future in as_completed(futures):
+        sample = futures[future]
+        try:
+            result = future.result()
+        except Exception as exc:  # the worker itself died
+            result = {"sample": sample, "status": "failed", "error": repr(exc)}
+        results[sample] = result
+        print(f"[cohort] {sample}: {result['status']}"
+              + (f" ({result['error']})" if result["status"] == "failed" else ""))
+
+
+def _site_force(focused_vcfs, sites_dir, force):
+    """
+    Site stages to rerun: those forced by name, and the union itself when
+    a sample was refocused or the set of samples changed since it was built.
+    """
+    site_force = [name for name in force if name in ("annotate", "impact", "frequency")]
+    sites = site_outputs(sites_dir)["sites"]
+    inputs_file = Path(sites_dir) / "inputs.txt"
+    listed = "".join(f"{vcf}\n" for vcf in focused_vcfs)
+    if ("focus" in force or not sites.exists() or not inputs_file.exists()
+            or inputs_file.read_text() != listed
+            or any(vcf.stat().st_mtime > sites.stat().st_mtime for vcf in focused_vcfs)):
+        site_force.append("unique_sites")
+    return site_force
+
+
+def run_cohort(manifest, output_dir="cohort_out", workers=None, cpus_per_sample=1,
+               gene_map="gene_literature.tab", force=(), max_memory_gb=None, dedupe=False):
+    """
+    Run every sample of a manifest through the pipeline.
+
+    The shared stages run once first (resumable through
+    `<output_dir>/cohort_state.json`). Samples then run on a process pool
+    whose workers each load the known-variant index and phenotype tables
+    once and reuse them for every sample they process. A failing sample
+    is recorded and does not stop the others.
+
+    With `dedupe`, the samples are first only focused; the union of their
+    sites is then annotated, scored and tagged once in
+    `<output_dir>/unique_sites` (see `site_stages`), and each sample takes
+    its annotations from there by a merge join before its technical filter
+    and prioritisation run.
+
+    Args:
+        manifest (str): Path to the manifest (see `load_manifest`).
+        output_dir (str): One subdirectory per sample, plus the cohort report.
+        workers (int): Samples processed at once (default: cores / cpus_per_sample).
+        cpus_per_sample (int): CPU budget of each sample's stage scheduler.
+        gene_map (str): SGD gene name table used for phenotype tagging.
+        force (List[str]): Per-sample stages to rerun.
+        max_memory_gb (float): Memory budget of the shared stages.
+        dedupe (bool): Annotate unique sites once for the whole cohort.
+
+    Returns:
+        dict: The cohort report, also written to `<output_dir>/cohort_report.json`.
+    """
+    samples = load_manifest(manifest)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    workers = workers or max(1, (os.cpu_count() or 1) // cpus_per_sample)
+
+    start = time.perf_counter()
+    run_pipeline(shared_stages(), state_path=str(output_dir / COHORT_STATE_FILE),
+                 max_memory_gb=max_memory_gb)
+    shared_seconds = time.perf_counter() - start
+
+    results = {}
+    sites_result = None
+    with ProcessPoolExecutor(max_workers=min(workers, len(samples)) or 1,
+                             initializer=_init_worker, initargs=(shared_paths(gene_map),)) as pool:
+        if not dedupe:
+            _run_samples(pool, samples, output_dir, cpus_per_sample, force, results)
+        else:
+            _run_samples(pool, samples, output_dir, cpus_per_sample, force, results, only=["focus"])
+            focused = [(sample, vcf) for sample, vcf in samples if results[sample]["status"] == "done"]
+            focused_vcfs = [(output_dir / sample / "focused.vcf.gz").resolve() for sample, _ in focused]
+            sites_dir = (output_dir / "unique_sites").resolve()
+            sites_dir.mkdir(exist_ok=True)
+
+            sites_start = time.time()
+            sites_result = pool.submit(run_sites, focused_vcfs, sites_dir, cpus_per_sample * workers,
+                                       _site_force(focused_vcfs, sites_dir, force)).result()
+            print(f"[cohort] unique sites: {sites_result['status']}"
+                  + (f" ({sites_result['error']})" if sites_result["status"] == "failed" else ""))
+            if sites_result["status"] == "done":
+                (sites_dir / "inputs.txt").write_text("".join(f"{vcf}\n" for vcf in focused_vcfs))
+                sample_force = [name for name in force if name != "focus"]
+                if any(path.stat().st_mtime >= sites_start for path in site_outputs(sites_dir).values()):
+                    sample_force.append("annotate")  # and everything downstream
+                _run_samples(pool, focused, output_dir, cpus_per_sample, sample_force, results,
+                             sites_dir=sites_dir)
+            else:
+                for sample, _ in focused:
+                    results[sample].update(status="failed", error="unique-sites run failed")
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "manifest": str(Path(manifest).resolve()),
+        "shared_seconds": round(shared_seconds, 3),
+        "seconds": round(time.perf_counter() - start, 3),
+        "samples": [results[sample] for sample, _ in samples],
+        "failed": [sample for sample, _ in samples if results[sample]["status"] != "done"],
+    }
+    if sites_result is not None:
+        report["unique_sites"] = sites_result
+    with open(output_dir / "cohort_report.json", "w") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the pipeline over a cohort of sample VCFs.")
+    parser.add_argument("manifest", help="TSV of sample name and VCF path, one sample per line")
+    parser.add_argument("--output-dir", default="cohort_out")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Samples processed at once (default: cores / --cpus-per-sample)")
+    parser.add_argument("--cpus-per-sample", type=int, default=1)
+    parser.add_argument("--gene-map", default="gene_literature.tab")
+    parser.add_argument("--max-memory-gb", type=float, default=None,
+                        help="Memory budget of the shared stages")
+    parser.add_argument("--force", nargs="*", default=[],
+                        help="Per-sample stages to rerun (with everything downstream)")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="Annotate, score and tag the unique sites of the cohort once")
+    args = parser.parse_args()
+
+    report = run_cohort(args.manifest, args.output_dir, workers=args.workers,
+                        cpus_per_sample=args.cpus_per_sample, gene_map=args.gene_map,
+                        force=args.force, max_memory_gb=args.max_memory_gb, dedupe=args.dedupe)
+    print(f"[cohort] {len(report['samples']) - len(report['failed'])}/{len(report['samples'])} "
+          f"samples done in {report['seconds']:.1f}s")
+    sys.exit(1 if report["failed"] else 0)
@@ -1,5 +1,5 @@
 import os
-import subprocess
+from vcf_io import compress_vcf, index_vcf
 from pathlib import Path
 from impact_scoring.filter import filter_SNV_biallelic
 from impact_scoring.filter import filter_for_missense
@@ -72,15 +72,14 @@ def _ensure_bgzipped_and_indexed(vcf_path):
     if vcf_path.suffix != ".gz":
         # Compress to .vcf.gz
         gz_path = vcf_path.with_suffix(".vcf.gz")
-        subprocess.run(["bgzip", "-c", str(vcf_path)], stdout=open(gz_path, "wb"), check=True)
-        subprocess.run(["tabix", "-p", "vcf", str(gz_path)], check=True)
+        compress_vcf(vcf_path, gz_path)
         vcf_path.unlink()  # Remove original uncompressed
         return gz_path
     else:
         # Ensure index file exists
         tbi_path = vcf_path.with_name(vcf_path.name + ".tbi")
         if not tbi_path.exists():
-            subprocess.run(["tabix", "-p", "vcf", str(vcf_path)], check=True)
+            index_vcf(vcf_path)
         return vcf_path
 
 
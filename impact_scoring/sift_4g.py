@@ -1,26 +1,27 @@
-import subprocess
+from profiling import run_command
 from pathlib import Path
-import gzip
 import shutil
 import tempfile
 import pysam
 import pandas as pd
 
+from vcf_io import VcfReader, open_binary, rewrite_vcf_header
+
 def run(vcf_gz_path, database, final_output_vcf):
     vcf_gz_path = Path(vcf_gz_path).resolve()
     database = Path(database).resolve()
     final_output_vcf = Path(final_output_vcf).resolve()
     output_dir = final_output_vcf.parent.resolve()
-    jar_path = Path("impact_scoring/SIFT4G_Annotator/SIFT4G_Annotator.jar").resolve()
+    jar_path = Path(__file__).resolve().parent / "SIFT4G_Annotator" / "SIFT4G_Annotator.jar"
 
     # Step 1: Uncompress to temp VCF
-    with tempfile.NamedTemporaryFile("wt", suffix=".vcf", delete=False) as tmp_vcf:
-        with gzip.open(vcf_gz_path, "rt") as f_in:
+    with tempfile.NamedTemporaryFile("wb", suffix=".vcf", delete=False) as tmp_vcf:
+        with open_binary(vcf_gz_path) as f_in:
             shutil.copyfileobj(f_in, tmp_vcf)
         tmp_vcf_path = Path(tmp_vcf.name)
 
     # Step 2: Run SIFT4G with proper -r output directory
-    subprocess.run([
+    run_command([
         "java", "-jar", str(jar_path),
         "-c",
         "-i", str(tmp_vcf_path),
@@ -43,35 +44,22 @@ def run(vcf_gz_path, database, final_output_vcf):
 
 
 def parse_sift_scores(vcf_path):
-    vcf_path = Path(vcf_path)
     results = []
 
-    # Decide how to open
-    open_func = gzip.open if vcf_path.suffix == ".gz" else open
-
-    with open_func(vcf_path, "rt") as f:
-        for line in f:
-            if line.startswith("#"):
-                continue
-            fields = line.strip().split("\t")
-            chrom, pos, ref, alt = fields[0], fields[1], fields[3], fields[4]
-            info = fields[7]
-
-            sift_score = None
-            sift_pred = None
-            for entry in info.split(";"):
-                if entry.startswith("SIFT4G="):
-                    sift_score = float(entry.split("=")[1])
-                elif entry.startswith("SIFT4G_pred="):
-                    sift_pred = entry.split("=")[1]
+    with VcfReader(vcf_path) as reader:
+        for record in reader:
+            chrom, pos, ref, alt = record.site()
+
+            sift_score = record.info_value(b"SIFT4G")
+            sift_pred = record.info_value(b"SIFT4G_pred")
 
             results.append({
-                "chrom": chrom,
+                "chrom": chrom.decode(),
                 "pos": int(pos),
-                "ref": ref,
-                "alt": alt,
-                "sift_score": sift_score,
-                "sift_prediction": sift_pred
+                "ref": ref.decode(),
+                "alt": alt.decode(),
+                "sift_score": float(sift_score) if sift_score is not None else None,
+                "sift_prediction": sift_pred.decode() if sift_pred is not None else None
             })
 
     return results
@@ -113,17 +101,20 @@ def write_filtered_vcf(input_vcf_gz, filtered_variants, output_vcf_gz):
 
 
 def fix_vcf_header(vcf_path):
+    """
+    Drop the invalid `##SIFT_Threshold:` header lines into a `_fixed` copy.
+    Only the header is rewritten: the body is streamed, or for BGZF input
+    copied block for block (see `vcf_io.rewrite_vcf_header`).
+    """
     vcf_path = Path(vcf_path)
-    fixed_lines = []
-
-    with vcf_path.open("r") as f:
-        for line in f:
-            if line.startswith("##SIFT_Threshold:"):
-                continue  # skip invalid header
-            fixed_lines.append(line)
-
-    fixed_path = vcf_path.with_name(vcf_path.stem + "_fixed.vcf")
-    with fixed_path.open("w") as out:
-        out.writelines(fixed_lines)
-
-    return fixed_path
\ No newline at end of file
+    if vcf_path.name.endswith(".vcf.gz"):
+        fixed_path = vcf_path.with_name(vcf_path.name[:-len(".vcf.gz")] + "_fixed.vcf.gz")
+    else:
+        fixed_path = vcf_path.with_name(vcf_path.stem + "_fixed.vcf")
+
+    rewrite_vcf_header(
+        vcf_path,
+        lambda header: [line for line in header if not line.startswith(b"##SIFT_Threshold:")],
+        output=fixed_path,
+    )
+    return fixed_path
@@ -1,13 +1,23 @@
+import argparse
 import os
+from functools import partial
 from pathlib import Path
 
 from downloader import download
 from utility import decompress_gzip
-from impact_scoring.run import run as impact_scoring_run
-from annotation.snpeff import run as annotate_run
-from technical_reliability.run import run as tech_run
+import profiling
+from vcf_io import compress_vcf
+from reference import build_fai, fai_path
+from sidecar import sidecar_dir
+from pipeline import Stage, run_pipeline, STATE_FILE
+from variant_focus.run import focus_vcf
+from annotation.annotate import build_snpeff_db, annotate_vcf_with_snpeff
+from technical_reliability.run import run as tech_run, render_plots
 from impact_scoring.run import run as impact_run
+from annotation_frequency.download import download as download_reference
 from annotation_frequency.run import run as frequency_run
+from annotation_prioritisation.run import run as prioritisation_run
+
 VCF_DIR = Path("vcf")
 REF_DIR = Path("ref")
 STORAGE_DIR = Path("storage")
@@ -15,39 +25,123 @@ STORAGE_DIR = Path("storage")
 vcf_input = STORAGE_DIR/VCF_DIR/"variants_raw.vcf.gz"
 
 fasta_ref = STORAGE_DIR/REF_DIR / "Saccharomyces_cerevisiae.R64-1-1.dna.toplevel.fa"
+fasta_fai = Path(fai_path(fasta_ref))
 gtf_url = "https://ftp.ensembl.org/pub/release-109/gtf/saccharomyces_cerevisiae/Saccharomyces_cerevisiae.R64-1-1.109.gtf.gz"
 gtf_gz_path = STORAGE_DIR / "Saccharomyces_cerevisiae.R64-1-1.109.gtf.gz"
+gtf_path = gtf_gz_path.with_suffix("")
 bed_output_path = STORAGE_DIR / "Saccharomyces_cerevisiae.CDS.bed"
 final_vcf_path = STORAGE_DIR / "yeast_final.vcf.gz"
 
+# SnpEff
+key = "SCEREVISIAE_YEAST"
+genome_label = "Saccharomyces_cerevisiae_R64-1-1"
+snpeff_dir = Path("snpeff")
+snpeff_db = snpeff_dir / key / "snpEffectPredictor.bin"
+snpeff_ann_cache = snpeff_dir / "ann_cache.sqlite"
+annotated_vcf = STORAGE_DIR/VCF_DIR/"annotated.vcf"
+
+# Technical reliability
+technical_filter_vcf = STORAGE_DIR/VCF_DIR/"technical_filter_vcf.vcf.gz"
+qc_dir = Path("annotation_prio_qc")
+
+# SIFT4G impact scoring
+impact_db = Path("impact_scoring/sift4g_db/R64-1-1.23")
+impact_vcf = STORAGE_DIR/VCF_DIR/"impact_prio_vcf.vcf"
+impact_fixed_vcf = STORAGE_DIR/VCF_DIR/"impact_prio_vcf_fixed.vcf"
+impact_fixed_vcf_gz = STORAGE_DIR/VCF_DIR/"impact_prio_vcf_fixed.vcf.gz"
+write_tsv = "sift_scores.tsv"
+write_filtered_vcf = "storage/vcf/damaging_only.vcf.gz"
+
+# Frequency and phenotype tagging
+reference_vcf = Path("storage/vcf/reference/saccharomyces_cerevisiae.vcf.gz")
+url = "https://ftp.ensembl.org/pub/release-109/variation/vcf/saccharomyces_cerevisiae/saccharomyces_cerevisiae.vcf.gz"
+phenotype_url = "http://sgd-archive.yeastgenome.org/curation/literature/phenotype_data.tab"
+phenotype_table = Path(phenotype_url.split("/")[-1])
+tagged_vcf = STORAGE_DIR/VCF_DIR/"impact_prio_vcf_fixed_freq_pheno.vcf.gz"
+# FREQ and PHENO_HIT columns, merged into tagged_vcf in one pass
+tag_sidecar = sidecar_dir(impact_fixed_vcf_gz)
+
+# Prioritisation
+prioritisation_dir = Path("annotation_prioritisation_out")
+
+
 def download_gtp(gtf_url, gtf_gz_path):
     if not os.path.isfile(gtf_gz_path):
         gtf_gz_path = download(gtf_url, gtf_gz_path)
     return decompress_gzip(gtf_gz_path)
 
 
-'''
+def score_impact():
+    impact_run(technical_filter_vcf, impact_vcf, impact_db,
+               write_tsv=write_tsv, write_vcf=write_filtered_vcf)
+    # The frequency stage reads gzipped input.
+    compress_vcf(impact_fixed_vcf, impact_fixed_vcf_gz)
 
-key = "SCEREVISIAE_YEAST"
-genome_label = "Saccharomyces_cerevisiae_R64-1-1"
-annotate_run(vcf_input,gtf_gz_path,fasta_ref,annotated_vcf,key,genome_label)
-'''
 
-'''
-impact_db = Path("impact_scoring/sift4g_db/R64-1-1.23")
-annotated_vcf = STORAGE_DIR/VCF_DIR/"technical_filter_vcf.vcf.gz"
-technical_filter_vcf = STORAGE_DIR/VCF_DIR/"impact_prio_vcf.vcf"
-write_tsv="sift_scores.tsv"
-write_filtered_vcf="storage/vcf/damaging_only.vcf.gz"
-impact_run(annotated_vcf,technical_filter_vcf,impact_db,
-           write_tsv=write_tsv,write_vcf=write_filtered_vcf)
-'''
-
-output_path = Path("storage/vcf/reference/saccharomyces_cerevisiae.vcf.gz")
-qry_vcf = Path("storage/vcf/technical_filter_vcf.vcf.gz")
-url = "https://ftp.ensembl.org/pub/release-109/variation/vcf/saccharomyces_cerevisiae/saccharomyces_cerevisiae.vcf.gz"
-phenotype_url = "http://sgd-archive.yeastgenome.org/curation/literature/phenotype_data.tab"
-frequency_run(url,output_path,qry_vcf,phenotype_url)
+def build_stages():
+    """
+    The pipeline as a DAG: focus -> annotate -> QC -> impact -> frequency
+    -> prioritise, with the downloads and the SnpEff DB build free to run
+    alongside the upstream stages.
+    """
+    return [
+        Stage("download_gtf", partial(download_gtp, gtf_url, gtf_gz_path),
+              outputs=[gtf_path]),
+        Stage("download_variation", partial(download_reference, url, reference_vcf),
+              outputs=[reference_vcf]),
+        Stage("download_phenotypes", partial(download_reference, phenotype_url, phenotype_table),
+              outputs=[phenotype_table]),
+        Stage("build_snpeff_db",
+              partial(build_snpeff_db, db_dir=str(snpeff_dir), key=key, gtf_file=gtf_path,
+                      reference_file=fasta_ref, genome_label=genome_label),
+              inputs=[gtf_path, fasta_ref], outputs=[snpeff_db], memory_gb=4),
+        Stage("index_reference", partial(build_fai, fasta_ref),
+              inputs=[fasta_ref], outputs=[fasta_fai]),
+        Stage("focus",
+              partial(focus_vcf, gtf_path, vcf_input, fasta_ref, final_vcf_path, bed_output_path),
+              inputs=[gtf_path, vcf_input, fasta_ref, fasta_fai], outputs=[final_vcf_path]),
+        Stage("annotate",
+              partial(annotate_vcf_with_snpeff, str(final_vcf_path), str(annotated_vcf),
+                      genome_key=key, data_dir=str(snpeff_dir), cache=str(snpeff_ann_cache)),
+              inputs=[final_vcf_path, snpeff_db], outputs=[annotated_vcf], memory_gb=4),
+        Stage("qc", partial(tech_run, str(annotated_vcf), str(technical_filter_vcf), plots="deferred",
+                            qc_dir=str(qc_dir)),
+              inputs=[annotated_vcf], outputs=[technical_filter_vcf], memory_gb=2),
+        # Nothing downstream waits for the figures.
+        Stage("qc_plots", partial(render_plots, str(qc_dir)), after=["qc"]),
+        Stage("impact", score_impact,
+              inputs=[technical_filter_vcf], outputs=[impact_fixed_vcf_gz], memory_gb=2),
+        Stage("frequency",
+              partial(frequency_run, url, reference_vcf, impact_fixed_vcf_gz, phenotype_url,
+                      sidecar=tag_sidecar),
+              inputs=[impact_fixed_vcf_gz, reference_vcf, phenotype_table],
+              outputs=[tagged_vcf]),
+        Stage("prioritise", partial(prioritisation_run, str(tagged_vcf), str(prioritisation_dir)),
+              inputs=[tagged_vcf], outputs=[prioritisation_dir / "ranked_genes.tsv"]),
+    ]
 
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the variant analysis pipeline.")
+    parser.add_argument("--max-cpus", type=int, default=None,
+                        help="CPU budget shared by concurrent stages (default: all cores)")
+    parser.add_argument("--max-memory-gb", type=float, default=None,
+                        help="Memory budget shared by concurrent stages (default: unlimited)")
+    parser.add_argument("--state", default=STATE_FILE,
+                        help="State file used to resume after a failure")
+    parser.add_argument("--force", nargs="*", default=[],
+                        help="Stages to rerun (with everything downstream)")
+    parser.add_argument("--report", default="run_report.json",
+                        help="JSON report of per-stage and per-command resource use")
+    parser.add_argument("--count-records", action="store_true",
+                        help="Count each stage's output records for the report (an extra read per stage)")
+    parser.add_argument("--cprofile-dir", default=None,
+                        help="Write a cProfile dump per stage into this directory")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Record each stage's peak Python heap with tracemalloc")
+    args = parser.parse_args()
 
+    profiling.configure(cprofile_dir=args.cprofile_dir, trace_memory=args.trace_memory)
+    run_pipeline(build_stages(), state_path=args.state, max_cpus=args.max_cpus,
+                 max_memory_gb=args.max_memory_gb, force=args.force,
+                 report_path=args.report, count_records=args.count_records)
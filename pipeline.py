@@ -0,0 +1,221 @@
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import profiling
+
+STATE_FILE = "pipeline_state.json"
+
+
+class Stage:
+    """
+    One step of the pipeline DAG.
+
+    Args:
+        name (str): Unique stage name.
+        func (callable): Called with no arguments to run the stage.
+        inputs (List[Path]): Files the stage reads.
+        outputs (List[Path]): Files the stage writes; a completed stage is
+            only skipped on resume if all of them still exist.
+        after (List[str]): Names of stages that must finish first. Stages
+            producing one of `inputs` are added automatically.
+        cpus (int): CPU cores the stage is expected to keep busy.
+        memory_gb (float): Peak memory the stage is expected to need.
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=(), after=(), cpus=1, memory_gb=1.0):
+        self.name = name
+        self.func = func
+        self.inputs = [Path(p) for p in inputs]
+        self.outputs = [Path(p) for p in outputs]
+        self.after = list(after)
+        self.cpus = cpus
+        self.memory_gb = memory_gb
+
+    def __repr__(self):
+        return f"Stage({self.name!r})"
+
+
+def resolve_dependencies(stages):
+    """
+    Return {stage name: set of upstream stage names}, linking each input to
+    the stage that outputs it. Raises ValueError on unknown names or cycles.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    if len(by_name) != len(stages):
+        raise ValueError("Stage names must be unique")
+
+    producers = {}
+    for stage in stages:
+        for output in stage.outputs:
+            producers[output] = stage.name
+
+    deps = {}
+    for stage in stages:
+        upstream = set(stage.after)
+        upstream.update(producers[p] for p in stage.inputs if p in producers)
+        upstream.discard(stage.name)
+        unknown = upstream - by_name.keys()
+        if unknown:
+            raise ValueError(f"{stage.name} depends on unknown stages: {sorted(unknown)}")
+        deps[stage.name] = upstream
+
+    # Kahn's algorithm, only to reject cycles up front.
+    remaining = {name: set(upstream) for name, upstream in deps.items()}
+    while remaining:
+        ready = [name for name, upstream in remaining.items() if not upstream]
+        if not ready:
+            raise ValueError(f"Dependency cycle between stages: {sorted(remaining)}")
+        for name in ready:
+            del remaining[name]
+        for upstream in remaining.values():
+            upstream.difference_update(ready)
+
+    return deps
+
+
+def load_state(state_path):
+    if not os.path.isfile(state_path):
+        return {}
+    with open(state_path) as f:
+        return json.load(f)
+
+
+def _save_state(state, state_path):
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, state_path)
+
+
+def _is_complete(stage, state):
+    record = state.get(stage.name, {})
+    return record.get("status") == "done" and all(p.exists() for p in stage.outputs)
+
+
+def run_pipeline(stages, state_path=STATE_FILE, max_cpus=None, max_memory_gb=None, force=(),
+                 report_path=None, count_records=False):
+    """
+    Run a stage DAG, overlapping independent stages within a resource budget.
+
+    A stage starts once all its upstream stages have finished and its `cpus`
+    and `memory_gb` fit in what is left of the budget (a stage larger than
+    the whole budget runs on its own). Progress is recorded in `state_path`
+    after every stage, so a rerun skips stages that completed and whose
+    outputs still exist, and resumes from the first one that did not. After
+    a failure no new stages are started; running ones are allowed to finish
+    and the first error is re-raised.
+
+    Args:
+        stages (List[Stage]): The pipeline stages.
+        state_path (str): JSON file recording completed stages.
+        max_cpus (int): CPU budget (default: all cores).
+        max_memory_gb (float): Memory budget (default: unlimited).
+        force (List[str]): Stages to rerun even if recorded as complete.
+            Everything downstream of a stage that reruns reruns too.
+        report_path (str): If set, write the `profiling` run report here
+            (also after a failure). Stages that call `profiling.add_records`
+            get a throughput.
+        count_records (bool): Also count the records of the first VCF output
+            of every other stage for the report. This reads each output once
+            more before downstream stages can start.
+
+    Returns:
+        dict: Stage name -> state record ({"status", "seconds", ...}).
+    """
+    max_cpus = max_cpus or os.cpu_count()
+    max_memory_gb = float("inf") if max_memory_gb is None else max_memory_gb
+
+    deps = resolve_dependencies(stages)
+    by_name = {stage.name: stage for stage in stages}
+    state = load_state(state_path)
+
+    # A stage reruns if forced, incomplete, or downstream of a stage that reruns.
+    stale = set(force) | {
+        name for name, stage in by_name.items() if not _is_complete(stage, state)
+    }
+    changed = True
+    while changed:
+        changed = False
+        for name, upstream in deps.items():
+            if name not in stale and upstream & stale:
+                stale.add(name)
+                changed = True
+
+    done = set(by_name) - stale
+    for name in sorted(done):
+        print(f"[pipeline] {name}: complete, skipping")
+
+    pending = [stage.name for stage in stages if stage.name not in done]
+    running = {}
+    used_cpus = 0
+    used_memory = 0.0
+    error = None
+
+    def fits(stage):
+        if not running:
+            return True
+        return (used_cpus + stage.cpus <= max_cpus
+                and used_memory + stage.memory_gb <= max_memory_gb)
+
+    with ThreadPoolExecutor(max_workers=max(1, len(pending))) as pool:
+        while pending or running:
+            if error is None:
+                for name in list(pending):
+                    stage = by_name[name]
+                    if deps[name] <= done and fits(stage):
+                        pending.remove(name)
+                        print(f"[pipeline] {name}: started")
+                        running[pool.submit(_timed, stage, count_records)] = stage
+                        used_cpus += stage.cpus
+                        used_memory += stage.memory_gb
+
+            if not running:
+                if error is None and pending:
+                    raise RuntimeError(f"Stages can never start: {pending}")
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage = running.pop(future)
+                used_cpus -= stage.cpus
+                used_memory -= stage.memory_gb
+                try:
+                    seconds = future.result()
+                except Exception as exc:
+                    state[stage.name] = {"status": "failed", "error": repr(exc)}
+                    print(f"[pipeline] {stage.name}: failed ({exc!r})")
+                    error = error or exc
+                else:
+                    state[stage.name] = {
+                        "status": "done",
+                        "seconds": round(seconds, 3),
+                        "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                        "outputs": [str(p) for p in stage.outputs],
+                    }
+                    done.add(stage.name)
+                    print(f"[pipeline] {stage.name}: done in {seconds:.1f}s")
+                _save_state(state, state_path)
+
+    if report_path is not None:
+        profiling.write_report(report_path)
+    if error is not None:
+        raise error
+    return {name: state.get(name) for name in by_name}
+
+
+def _timed(stage, count_records=False):
+    start = time.perf_counter()
+    with profiling.stage(stage.name) as record:
+        stage.func()
+    seconds = time.perf_counter() - start
+    # Counted after the measured block, so the extra read is not charged
+    # to the stage; stages that report their own count are not re-read.
+    if count_records and "records" not in record:
+        for output in stage.outputs:
+            if output.name.endswith((".vcf", ".vcf.gz")):
+                record.add_records(profiling.count_vcf_records(output))
+                break
+    return seconds
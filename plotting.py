@@ -0,0 +1,131 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import matplotlib
+
+matplotlib.use("Agg")  # Headless: figures are only ever saved to disk
+import matplotlib.pyplot as plt
+
+AGGREGATES_FILE = "plot_aggregates.json"
+PLOT_MODES = ("render", "deferred", "none")
+
+
+def hist_spec(filename, edges, counts, title, xlabel, ylabel="Count", figsize=(8, 4), **style):
+    """Describe a histogram from pre-binned counts."""
+    return {
+        "kind": "hist", "filename": filename, "title": title, "xlabel": xlabel,
+        "ylabel": ylabel, "figsize": list(figsize), "style": style,
+        "edges": list(edges), "counts": [int(c) for c in counts],
+    }
+
+
+def bar_spec(filename, labels, values, title, xlabel=None, ylabel=None,
+             horizontal=False, figsize=(6, 4)):
+    """Describe a (horizontal) bar chart from label/value pairs."""
+    return {
+        "kind": "barh" if horizontal else "bar", "filename": filename,
+        "title": title, "xlabel": xlabel, "ylabel": ylabel,
+        "figsize": list(figsize), "labels": list(labels),
+        "values": [int(v) for v in values],
+    }
+
+
+def box_spec(filename, stats, title, ylabel, figsize=(6, 4)):
+    """Describe a boxplot from pre-computed `Axes.bxp` statistics."""
+    return {
+        "kind": "box", "filename": filename, "title": title, "xlabel": None,
+        "ylabel": ylabel, "figsize": list(figsize), "stats": list(stats),
+    }
+
+
+def render_figure(spec, out_dir):
+    """
+    Draw one figure from its aggregate spec and save it under `out_dir`.
+    Returns the path of the written image.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    fig, ax = plt.subplots(figsize=spec["figsize"])
+
+    if spec["kind"] == "hist":
+        edges = spec["edges"]
+        ax.hist(edges[:-1], bins=edges, weights=spec["counts"], **spec["style"])
+    elif spec["kind"] == "bar":
+        ax.bar(spec["labels"], spec["values"])
+    elif spec["kind"] == "barh":
+        ax.barh(spec["labels"], spec["values"])
+    elif spec["kind"] == "box":
+        ax.bxp(spec["stats"], patch_artist=True, showfliers=False)
+    else:
+        raise ValueError(f"Unknown plot kind: {spec['kind']}")
+
+    ax.set_title(spec["title"])
+    if spec["xlabel"]:
+        ax.set_xlabel(spec["xlabel"])
+    if spec["ylabel"]:
+        ax.set_ylabel(spec["ylabel"])
+    fig.tight_layout()
+
+    path = os.path.join(out_dir, spec["filename"])
+    fig.savefig(path)
+    plt.close(fig)
+    return path
+
+
+def save_aggregates(specs, out_dir):
+    """Write plot aggregates to `out_dir` so figures can be rendered later."""
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, AGGREGATES_FILE)
+    with open(path, "w") as f:
+        json.dump(specs, f)
+    return path
+
+
+def load_aggregates(out_dir):
+    """Read plot aggregates previously saved with `save_aggregates`."""
+    with open(os.path.join(out_dir, AGGREGATES_FILE)) as f:
+        return json.load(f)
+
+
+def render_figures(specs, out_dir, mode="render", n_workers=None, background=False):
+    """
+    Save plot aggregates and render them according to `mode`.
+
+    Args:
+        specs (list[dict]): Figure specs built with the *_spec helpers.
+        out_dir (str): Directory for the aggregates file and images.
+        mode (str): "render" saves and renders, "deferred" only saves the
+            aggregates (see `render_saved`), "none" does neither.
+        n_workers (int): Size of the rendering process pool.
+        background (bool): If True, return without waiting for the figures;
+            pass the returned futures to `wait_for_figures`.
+
+    Returns:
+        list[Future]: One future per figure (empty unless rendering).
+    """
+    if mode not in PLOT_MODES:
+        raise ValueError(f"mode must be one of {PLOT_MODES}, got: {mode}")
+    if mode == "none" or not specs:
+        return []
+
+    save_aggregates(specs, out_dir)
+    if mode == "deferred":
+        return []
+
+    pool = ProcessPoolExecutor(max_workers=n_workers)
+    futures = [pool.submit(render_figure, spec, out_dir) for spec in specs]
+    pool.shutdown(wait=not background)
+    return futures
+
+
+def wait_for_figures(futures):
+    """Block until background renders finish; re-raise the first failure."""
+    wait(futures)
+    return [future.result() for future in futures]
+
+
+def render_saved(out_dir, n_workers=None):
+    """Render figures from aggregates saved by a "deferred" run."""
+    return wait_for_figures(
+        render_figures(load_aggregates(out_dir), out_dir, n_workers=n_workers)
+    )
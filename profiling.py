@@ -0,0 +1,319 @@
+import cProfile
+import json
+import os
+import resource
+import subprocess
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+from vcf_io import open_binary
+
+# Everything recorded since import (or the last `reset`), in completion order.
+_records = {"stages": [], "commands": []}
+_lock = threading.Lock()
+_local = threading.local()
+_options = {"cprofile_dir": None, "tracemalloc": False}
+
+
+def configure(cprofile_dir=None, trace_memory=False):
+    """
+    Enable the optional captures for Python stages.
+
+    Args:
+        cprofile_dir (str): If set, each stage writes `<stage>.prof` here
+            (readable with pstats / snakeviz). Only the calling thread is
+            profiled.
+        trace_memory (bool): If True, record the peak Python heap of each
+            stage with tracemalloc. The peak is process-wide, so it is only
+            meaningful for stages that do not overlap.
+    """
+    _options["cprofile_dir"] = cprofile_dir
+    _options["tracemalloc"] = trace_memory
+    if cprofile_dir:
+        os.makedirs(cprofile_dir, exist_ok=True)
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def reset():
+    """Discard everything recorded so far."""
+    with _lock:
+        _records["stages"].clear()
+        _records["commands"].clear()
+
+
+def _proc_io(pid="self"):
+    """Return (read_bytes, write_bytes) from /proc/<pid>/io, or None if unavailable."""
+    try:
+        with open(f"/proc/{pid}/io") as f:
+            counters = dict(line.split(": ") for line in f.read().splitlines())
+        return int(counters["rchar"]), int(counters["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _current_stage():
+    return getattr(_local, "stage", None)
+
+
+class StageRecord(dict):
+    """
+    Measurements of one stage; `records` can be set (or `add_records`
+    called) by the stage so the report includes a throughput.
+    """
+
+    def add_records(self, n):
+        self["records"] = self.get("records", 0) + n
+        if self.get("wall_seconds"):
+            # Counted after the stage finished (see pipeline._timed).
+            self["records_per_second"] = round(self["records"] / self["wall_seconds"], 1)
+
+
+@contextmanager
+def stage(name):
+    """
+    Measure a block of work as a named stage.
+
+    Records wall time, CPU user/sys time of this process, the process peak
+    RSS, bytes read and written (/proc/self/io) and, when configured, a
+    cProfile dump and the tracemalloc peak. Commands run through
+    `run_command` inside the block are attached to the stage.
+
+    Apart from the wall time and the commands, these are process-wide: when
+    stages overlap (the pipeline runs independent stages on threads), the
+    CPU time and I/O of a stage include the others', and the peak RSS is
+    the process's. They are only per-stage for stages that ran alone.
+
+    Yields:
+        StageRecord: Update with `add_records(n)` to get records per second.
+    """
+    record = StageRecord(name=name, status="running")
+    parent = _current_stage()
+    _local.stage = record
+
+    profiler = None
+    if _options["cprofile_dir"]:
+        profiler = cProfile.Profile()
+    if _options["tracemalloc"] and tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+
+    io_before = _proc_io()
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield record
+        record["status"] = "done"
+    except BaseException as exc:
+        record["status"] = "failed"
+        record["error"] = repr(exc)
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        wall = time.perf_counter() - start
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        io_after = _proc_io()
+
+        record.update({
+            "wall_seconds": round(wall, 4),
+            "user_seconds": round(usage.ru_utime - usage_before.ru_utime, 4),
+            "sys_seconds": round(usage.ru_stime - usage_before.ru_stime, 4),
+            # ru_maxrss is the process lifetime peak (KiB on Linux).
+            "process_peak_rss_kb": usage.ru_maxrss,
+        })
+        if io_before and io_after:
+            record["read_bytes"] = io_after[0] - io_before[0]
+            record["write_bytes"] = io_after[1] - io_before[1]
+        if record.get("records") and wall > 0:
+            record["records_per_second"] = round(record["records"] / wall, 1)
+        if _options["tracemalloc"] and tracemalloc.is_tracing():
+            record["python_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        if profiler is not None:
+            profile_path = Path(_options["cprofile_dir"]) / f"{name}.prof"
+            profiler.dump_stats(profile_path)
+            record["cprofile"] = str(profile_path)
+
+        _local.stage = parent
+        with _lock:
+            _records["stages"].append(record)
+
+
+def add_records(n):
+    """Add `n` processed records to the current stage, if any."""
+    record = _current_stage()
+    if record is not None:
+        record.add_records(n)
+
+
+def _drain(proc, input):
+    """Feed stdin and collect stdout/stderr without reaping the child."""
+    output = {}
+
+    def read(name, stream):
+        output[name] = stream.read()
+
+    threads = [
+        threading.Thread(target=read, args=(name, stream), daemon=True)
+        for name, stream in (("stdout", proc.stdout), ("stderr", proc.stderr))
+        if stream is not None
+    ]
+    for thread in threads:
+        thread.start()
+    if proc.stdin is not None:
+        if input:
+            proc.stdin.write(input)
+        proc.stdin.close()
+    for thread in threads:
+        thread.join()
+    for stream in (proc.stdout, proc.stderr):
+        if stream is not None:
+            stream.close()
+    return output.get("stdout"), output.get("stderr")
+
+
+def wait_process(proc, args=None):
+    """
+    Wait for a started Popen and record its resource usage.
+
+    Use instead of `proc.wait()`. The child is reaped with os.wait4 so its
+    own CPU time and peak RSS are available, and its /proc I/O counters
+    are read just before it is reaped. Linux folds the RSS the child had
+    before exec (i.e. the forking Python process) into its peak, so for
+    small tools the peak is an upper bound.
+
+    Returns:
+        int: The exit code.
+    """
+    args = proc.args if args is None else args
+    start = getattr(proc, "_profiling_start", None)
+
+    io = None
+    try:
+        # Wait for exit without reaping, so /proc/<pid>/io is still readable.
+        os.waitid(os.P_PID, proc.pid, os.WEXITED | os.WNOWAIT)
+        io = _proc_io(proc.pid)
+    except (AttributeError, ChildProcessError, OSError):
+        pass
+
+    try:
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+    except ChildProcessError:
+        # Already reaped elsewhere (e.g. by Popen.poll); no usage available.
+        usage = None
+        proc.wait()
+
+    record = {
+        "args": [str(a) for a in args] if isinstance(args, (list, tuple)) else str(args),
+        "returncode": proc.returncode,
+    }
+    if start is not None:
+        record["wall_seconds"] = round(time.perf_counter() - start, 4)
+    if usage is not None:
+        record.update({
+            "user_seconds": round(usage.ru_utime, 4),
+            "sys_seconds": round(usage.ru_stime, 4),
+            "peak_rss_kb": usage.ru_maxrss,
+        })
+    if io is not None:
+        record["read_bytes"], record["write_bytes"] = io
+    elif usage is not None:
+        # Block I/O counts are in 512-byte units.
+        record["read_bytes"] = usage.ru_inblock * 512
+        record["write_bytes"] = usage.ru_oublock * 512
+
+    current = _current_stage()
+    record["stage"] = current["name"] if current is not None else None
+    with _lock:
+        _records["commands"].append(record)
+    return proc.returncode
+
+
+def popen(args, **kwargs):
+    """
+    `subprocess.Popen` that remembers its start time for `wait_process`.
+    """
+    proc = subprocess.Popen(args, **kwargs)
+    proc._profiling_start = time.perf_counter()
+    return proc
+
+
+def run_command(args, input=None, capture_output=False, check=False, **kwargs):
+    """
+    Drop-in for `subprocess.run` that records the child's wall time, CPU
+    user/sys time, peak RSS and bytes read and written.
+
+    Supports the `subprocess.run` arguments used in this repo (stdin/stdout/
+    stderr redirection, `input`, `capture_output`, `text`, `check`); the
+    measurements are attached to the enclosing `stage`, if any.
+
+    Returns:
+        subprocess.CompletedProcess
+    """
+    if capture_output:
+        kwargs["stdout"] = kwargs["stderr"] = subprocess.PIPE
+    if input is not None:
+        kwargs["stdin"] = subprocess.PIPE
+
+    proc = popen(args, **kwargs)
+    try:
+        stdout, stderr = _drain(proc, input)
+    except BaseException:
+        proc.kill()
+        wait_process(proc, args)
+        raise
+    returncode = wait_process(proc, args)
+
+    if check and returncode != 0:
+        raise subprocess.CalledProcessError(returncode, args, output=stdout, stderr=stderr)
+    return subprocess.CompletedProcess(args, returncode, stdout, stderr)
+
+
+def report():
+    """
+    Return the run report: per-stage and per-command measurements, with
+    each stage's child-process totals rolled up.
+    """
+    with _lock:
+        stages = [dict(s) for s in _records["stages"]]
+        commands = [dict(c) for c in _records["commands"]]
+
+    for record in stages:
+        children = [c for c in commands if c["stage"] == record["name"]]
+        record["children"] = {
+            "count": len(children),
+            "user_seconds": round(sum(c.get("user_seconds", 0) for c in children), 4),
+            "sys_seconds": round(sum(c.get("sys_seconds", 0) for c in children), 4),
+            "peak_rss_kb": max((c.get("peak_rss_kb", 0) for c in children), default=0),
+            "read_bytes": sum(c.get("read_bytes", 0) for c in children),
+            "write_bytes": sum(c.get("write_bytes", 0) for c in children),
+        }
+
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "pid": os.getpid(),
+        "cpu_count": os.cpu_count(),
+        "stages": stages,
+        "commands": commands,
+    }
+
+
+def write_report(path):
+    """Write `report()` as JSON to `path` and return the path."""
+    with open(path, "w") as f:
+        json.dump(report(), f, indent=2)
+    return path
+
+
+def count_vcf_records(path, threads=2):
+    """
+    Count the data lines of a plain or gzipped VCF (BGZF decompressed
+    ahead on `threads` threads).
+    """
+    with open_binary(path, threads=threads) as f:
+        return sum(1 for line in f if not line.startswith(b"#"))
@@ -0,0 +1,175 @@
+import mmap
+import os
+from collections import namedtuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from vcf_io import REF
+
+FaiEntry = namedtuple("FaiEntry", "length offset linebases linewidth")
+
+
+def fai_path(fasta):
+    """Path of the samtools-style .fai index next to `fasta`."""
+    return f"{fasta}.fai"
+
+
+def build_fai(fasta):
+    """
+    Write a samtools-compatible .fai index for an uncompressed FASTA, in
+    place of `samtools faidx`. Every sequence line but the last of a
+    record must have the same length.
+
+    Returns:
+        str: Path of the index.
+    """
+    entries = []
+    name = None
+    offset = length = linebases = linewidth = 0
+    short_line = False
+    with open(fasta, "rb") as f:
+        position = 0
+        for line in f:
+            position += len(line)
+            if line.startswith(b">"):
+                if name is not None:
+                    entries.append((name, length, offset, linebases, linewidth))
+                name = line[1:].split(None, 1)[0].decode()
+                offset, length, linebases, linewidth = position, 0, 0, 0
+                short_line = False
+                continue
+            bases = len(line.rstrip(b"\r\n"))
+            if short_line and bases:
+                raise ValueError(f"{fasta}: lines of {name} are not all the same length")
+            if not linebases:
+                linebases, linewidth = bases, len(line)
+            elif bases > linebases or (bases == linebases and len(line) != linewidth):
+                raise ValueError(f"{fasta}: lines of {name} are not all the same length")
+            # Only the last line of a sequence may be shorter (or blank).
+            short_line = bases < linebases or not bases
+            length += bases
+    if name is not None:
+        entries.append((name, length, offset, linebases, linewidth))
+
+    path = fai_path(fasta)
+    with open(path, "w") as out:
+        for entry in entries:
+            out.write("\t".join(map(str, entry)) + "\n")
+    return path
+
+
+def load_fai(fasta):
+    """
+    Read the .fai index of `fasta`, building it first if it is missing or
+    older than the FASTA.
+
+    Returns:
+        dict: Sequence name -> FaiEntry.
+    """
+    path = fai_path(fasta)
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(fasta):
+        build_fai(fasta)
+    index = {}
+    with open(path) as f:
+        for line in f:
+            name, *values = line.rstrip("\n").split("\t")
+            index[name] = FaiEntry(*map(int, values[:4]))
+    return index
+
+
+class ReferenceStore:
+    """
+    An uncompressed reference FASTA, memory-mapped and addressed through
+    its .fai index (see `load_fai`), for slicing sequence without reading
+    the file and for checking REF alleles in batches.
+
+    Example:
+        with ReferenceStore(fasta) as reference:
+            ok = reference.check_batch(batch)
+    """
+
+    def __init__(self, fasta):
+        self.path = str(fasta)
+        self.index = load_fai(self.path)
+        self._file = open(self.path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._bytes = np.frombuffer(self._map, dtype=np.uint8)
+
+    def _offsets(self, entry, begs):
+        return entry.offset + begs // entry.linebases * entry.linewidth + begs % entry.linebases
+
+    def fetch(self, chrom, start, end):
+        """Sequence of `chrom` in [start, end) (0-based), as bytes."""
+        entry = self.index[chrom]
+        start, end = max(0, start), min(end, entry.length)
+        if start >= end:
+            return b""
+        first, last = self._offsets(entry, np.array([start, end - 1]))
+        data = self._map[first:last + 1]
+        if last - first + 1 == end - start:
+            return data
+        return data.replace(b"\n", b"").replace(b"\r", b"")
+
+    def _check(self, chrom, begs, lengths, first, ref_at):
+        ok = np.zeros(len(begs), dtype=bool)
+        entry = self.index.get(chrom)
+        if entry is None:
+            return ok
+        inside = (begs >= 0) & (lengths > 0) & (begs + lengths <= entry.length)
+        single = inside & (lengths == 1)
+        # Letters compare case-insensitively once bit 0x20 is set.
+        ok[single] = (self._bytes[self._offsets(entry, begs[single])] | 0x20) == (first[single] | 0x20)
+        for i in np.flatnonzero(inside & (lengths > 1)):
+            ok[i] = self.fetch(chrom, begs[i], begs[i] + lengths[i]).upper() == ref_at(i).upper()
+        return ok
+
+    def check_refs(self, chrom, positions, refs):
+        """
+        Check REF alleles on one contig against the reference.
+
+        Args:
+            chrom (str): Contig name.
+            positions (array-like): 1-based positions.
+            refs (List[bytes]): REF alleles.
+
+        Returns:
+            np.ndarray: True where the REF matches (case-insensitively);
+                False also for unknown contigs and out-of-range positions.
+        """
+        begs = np.asarray(positions, dtype=np.int64) - 1
+        lengths = np.fromiter(map(len, refs), dtype=np.int64, count=len(refs))
+        first = np.fromiter((ref[0] if ref else 0 for ref in refs), dtype=np.uint8, count=len(refs))
+        return self._check(chrom, begs, lengths, first, refs.__getitem__)
+
+    def check_batch(self, batch):
+        """`check_refs` for every record of a `vcf_batch.VcfBatch`."""
+        runs, begs, _ = batch.spans()
+        ref = batch.column(REF)
+        if isinstance(ref, pa.ChunkedArray):
+            ref = ref.combine_chunks()
+        lengths = pc.binary_length(ref).to_numpy(zero_copy_only=False).astype(np.int64)
+        offsets = np.frombuffer(ref.buffers()[1], dtype=np.int32)[ref.offset:ref.offset + len(ref)]
+        data = np.frombuffer(ref.buffers()[2] or b"\0", dtype=np.uint8)
+        first = np.where(lengths > 0, data[np.minimum(offsets, len(data) - 1)], 0).astype(np.uint8)
+
+        ok = np.empty(len(batch), dtype=bool)
+        for chrom, start, end in runs:
+            ok[start:end] = self._check(
+                chrom.decode(), begs[start:end], lengths[start:end], first[start:end],
+                lambda i, start=start: ref[start + i].as_py(),
+            )
+        return ok
+
+    def close(self):
+        self._bytes = None
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
@@ -0,0 +1,311 @@
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import cohort
+from bgzf import is_bgzf
+from pipeline import run_pipeline
+from vcf_io import compress_vcf, index_vcf
+
+DEFAULT_PORT = 8765
+# Files a client can fetch from a finished job, relative to its directory.
+OUTPUTS = {
+    "vcf": "tagged.vcf.gz",
+    "genes": "prioritisation/ranked_genes.tsv",
+    "variants": "prioritisation/selected_variants.tsv",
+    "report": "run_report.json",
+}
+COPY_BUFFER = 1 << 20
+# Per-worker state set by `_init_worker`.
+_worker = {}
+
+
+class AnnotationService:
+    """
+    Run VCF jobs through the per-sample stages on a pool of warm workers.
+
+    The workers load the known-variant index and phenotype lookups once
+    (see `cohort._init_worker`) and keep the pipeline modules imported, so
+    a job only pays for its own stages. Each job runs in its own directory
+    under `jobs_dir`, as a cohort sample would.
+    """
+
+    def __init__(self, jobs_dir="service_jobs", workers=1, cpus_per_job=1,
+                 gene_map="gene_literature.tab"):
+        self.jobs_dir = Path(jobs_dir).resolve()
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self.cpus_per_job = cpus_per_job
+        self.started = time.time()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        context = multiprocessing.get_context()
+        # Workers report the jobs they start here, so a job shows as running.
+        self._started = context.SimpleQueue()
+        self._watcher = threading.Thread(target=self._watch_started, daemon=True)
+        self._watcher.start()
+        # Each initializer waits for all of them, so a warm-up task can only
+        # finish once every worker has loaded its resources.
+        barrier = context.Barrier(workers)
+        self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                         initargs=(cohort.shared_paths(gene_map), barrier, self._started))
+        # Load the resources now rather than on the first job.
+        for future in [self._pool.submit(os.getpid) for _ in range(workers)]:
+            future.result()
+
+    def submit(self, upload):
+        """Queue an uploaded VCF (plain, gzip or BGZF) and return its job id."""
+        job_id = uuid.uuid4().hex[:12]
+        job_dir = self.jobs_dir / job_id
+        job_dir.mkdir()
+        vcf = job_dir / "input.vcf.gz"
+        if is_bgzf(upload):
+            os.replace(upload, vcf)
+            index_vcf(vcf)
+        else:
+            compress_vcf(upload, vcf)
+            os.remove(upload)
+
+        record = {"job": job_id, "status": "queued", "submitted": time.time()}
+        with self._lock:
+            self._jobs[job_id] = record
+        future = self._pool.submit(_run_job, job_id, str(vcf), str(self.jobs_dir), self.cpus_per_job)
+        future.add_done_callback(lambda f: self._finish(job_id, f))
+        return job_id
+
+    def _watch_started(self):
+        while True:
+            item = self._started.get()
+            if item is None:
+                return
+            job_id, started = item
+            with self._lock:
+                record = self._jobs.get(job_id)
+                if record is not None and record["status"] == "queued":
+                    record["status"] = "running"
+                    record["started"] = started
+
+    def _finish(self, job_id, future):
+        try:
+            result = future.result()
+        except Exception as exc:  # the worker itself died
+            result = {"status": "failed", "error": repr(exc)}
+        with self._lock:
+            record = self._jobs[job_id]
+            record.update(result)
+            record["finished"] = time.time()
+            record["latency_seconds"] = round(record["finished"] - record["submitted"], 3)
+            if "started" in record:
+                record["queue_seconds"] = round(record["started"] - record["submitted"], 3)
+
+    def status(self, job_id):
+        with self._lock:
+            record = self._jobs.get(job_id)
+            return dict(record) if record is not None else None
+
+    def output_path(self, job_id, name):
+        record = self.status(job_id)
+        if record is None or name not in OUTPUTS:
+            return None, 404
+        if record["status"] != "done":
+            return None, 409
+        return self.jobs_dir / job_id / OUTPUTS[name], 200
+
+    def health(self):
+        with self._lock:
+            counts = {}
+            for record in self._jobs.values():
+                counts[record["status"]] = counts.get(record["status"], 0) + 1
+        return {"status": "ok", "uptime_seconds": round(time.time() - self.started, 1), "jobs": counts}
+
+    def close(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._started.put(None)
+        self._watcher.join()
+
+
+def _init_worker(paths, barrier, started):
+    """Load the shared resources, then wait until every other worker has too."""
+    cohort._init_worker(paths)
+    _worker["started"] = started
+    barrier.wait()
+
+
+def _run_job(job_id, vcf, jobs_dir, cpus):
+    started = time.time()
+    _worker["started"].put((job_id, started))
+    result = cohort.run_sample(job_id, vcf, jobs_dir, max_cpus=cpus)
+    result["started"] = started
+    state_path = Path(result.get("directory", "")) / "pipeline_state.json"
+    if state_path.is_file():
+        with open(state_path) as f:
+            result["stage_seconds"] = {
+                name: record.get("seconds") for name, record in json.load(f).items()
+            }
+    return result
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    POST /jobs                 upload a VCF, returns {"job": id}
+    GET  /jobs/<id>            job status, stage states and latency
+    GET  /jobs/<id>/<output>   stream an output of a finished job (see OUTPUTS)
+    GET  /health               liveness and job counts
+    """
+
+    service = None
+
+    def do_POST(self):
+        start = time.perf_counter()
+        if self.path.rstrip("/") != "/jobs":
+            return self._json(404, {"error": "unknown path"}, start)
+        length = int(self.headers.get("Content-Length", 0))
+        if length <= 0:
+            return self._json(400, {"error": "empty upload"}, start)
+        upload = self.service.jobs_dir / f"upload-{uuid.uuid4().hex}"
+        with open(upload, "wb") as out:
+            remaining = length
+            while remaining:
+                chunk = self.rfile.read(min(COPY_BUFFER, remaining))
+                if not chunk:
+                    break
+                out.write(chunk)
+                remaining -= len(chunk)
+        try:
+            job_id = self.service.submit(upload)
+        except Exception as exc:
+            upload.unlink(missing_ok=True)
+            return self._json(400, {"error": repr(exc)}, start)
+        self._json(202, {"job": job_id, "status": "queued"}, start)
+
+    def do_GET(self):
+        start = time.perf_counter()
+        parts = [p for p in self.path.split("?")[0].split("/") if p]
+        if parts == ["health"]:
+            return self._json(200, self.service.health(), start)
+        if len(parts) == 2 and parts[0] == "jobs":
+            record = self.service.status(parts[1])
+            if record is None:
+                return self._json(404, {"error": "unknown job"}, start)
+            return self._json(200, record, start)
+        if len(parts) == 3 and parts[0] == "jobs":
+            path, code = self.service.output_path(parts[1], parts[2])
+            if path is None or not path.is_file():
+                return self._json(code if path is None else 404, {"error": "output not available"}, start)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(path.stat().st_size))
+            self.end_headers()
+            with open(path, "rb") as f:
+                shutil.copyfileobj(f, self.wfile, COPY_BUFFER)
+            return self._log_latency(start)
+        self._json(404, {"error": "unknown path"}, start)
+
+    def _json(self, code, payload, start):
+        body = json.dumps(payload, indent=2).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self._log_latency(start)
+
+    def _log_latency(self, start):
+        print(f"[service] {self.command} {self.path} {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    def log_message(self, format, *args):
+        pass  # one latency line per request instead (see _log_latency)
+
+
+def serve(host="127.0.0.1", port=DEFAULT_PORT, jobs_dir="service_jobs", workers=1,
+          cpus_per_job=1, gene_map="gene_literature.tab"):
+    """
+    Prepare the shared resources (as `cohort.run_cohort` does), start the
+    warm workers and serve the job API on `host:port` until interrupted.
+    """
+    run_pipeline(cohort.shared_stages(), state_path=str(Path(jobs_dir) / cohort.COHORT_STATE_FILE))
+    service = AnnotationService(jobs_dir, workers=workers, cpus_per_job=cpus_per_job,
+                                gene_map=gene_map)
+    handler = type("Handler", (_Handler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"[service] listening on http://{host}:{port} with {workers} warm worker(s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+def submit(vcf, output, url=f"http://127.0.0.1:{DEFAULT_PORT}", fetch="vcf", poll_seconds=0.2):
+    """
+    Client side: upload `vcf`, wait for the job and stream output `fetch`
+    (see OUTPUTS) into `output`.
+
+    Returns:
+        dict: The final job record, with the client-side "round_trip_seconds".
+    """
+    start = time.perf_counter()
+    size = os.path.getsize(vcf)
+    with open(vcf, "rb") as f:
+        request = urllib.request.Request(f"{url}/jobs", data=f, method="POST",
+                                         headers={"Content-Length": str(size)})
+        with urllib.request.urlopen(request) as response:
+            job_id = json.load(response)["job"]
+
+    while True:
+        with urllib.request.urlopen(f"{url}/jobs/{job_id}") as response:
+            record = json.load(response)
+        if record["status"] not in ("queued", "running"):
+            break
+        time.sleep(poll_seconds)
+
+    if record["status"] == "done":
+        with urllib.request.urlopen(f"{url}/jobs/{job_id}/{fetch}") as response, open(output, "wb") as out:
+            shutil.copyfileobj(response, out, COPY_BUFFER)
+    record["round_trip_seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local annotation service and client.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Run the daemon")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument("--jobs-dir", default="service_jobs")
+    serve_parser.add_argument("--workers", type=int, default=1, help="Warm worker processes")
+    serve_parser.add_argument("--cpus-per-job", type=int, default=1)
+    serve_parser.add_argument("--gene-map", default="gene_literature.tab")
+
+    submit_parser = commands.add_parser("submit", help="Submit a VCF and fetch the result")
+    submit_parser.add_argument("vcf")
+    submit_parser.add_argument("-o", "--output", required=True)
+    submit_parser.add_argument("--url", default=f"http://127.0.0.1:{DEFAULT_PORT}")
+    submit_parser.add_argument("--fetch", default="vcf", choices=list(OUTPUTS))
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.host, args.port, args.jobs_dir, args.workers, args.cpus_per_job, args.gene_map)
+    else:
+        record = submit(args.vcf, args.output, args.url, args.fetch)
+        print(f"job {record['job']}: {record['status']}")
+        for key in ("queue_seconds", "latency_seconds", "round_trip_seconds"):
+            if key in record:
+                print(f"  {key}: {record[key]}")
+        for name, seconds in (record.get("stage_seconds") or {}).items():
+            print(f"  {name}: {seconds}s")
+        if record["status"] != "done":
+            print(record.get("error", ""), file=sys.stderr)
+            sys.exit(1)
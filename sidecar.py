@@ -0,0 +1,156 @@
+import os
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import profiling
+from vcf_batch import VcfBatchReader, write_batch
+from vcf_io import VcfWriter, index_path
+
+SIDECAR_SUFFIX = ".sidecar"
+HEADER_KEY = b"vcf_header"
+# Size and mtime of the base VCF a sidecar was written for.
+SOURCE_KEY = b"vcf_source"
+
+
+def sidecar_dir(vcf):
+    """Default sidecar directory of a VCF: `<vcf>.sidecar` next to it."""
+    return Path(f"{vcf}{SIDECAR_SUFFIX}")
+
+
+def source_fingerprint(vcf):
+    """Identify a base VCF by its size and mtime (bytes)."""
+    stat = os.stat(vcf)
+    return f"{stat.st_size}:{stat.st_mtime_ns}".encode()
+
+
+class SidecarWriter:
+    """
+    Write one stage's per-record INFO columns as `<directory>/<name>.parquet`
+    instead of rewriting the VCF they annotate.
+
+    Each column is named after its INFO key; a value becomes `KEY=value`
+    on materialisation, a boolean column a flag, and nulls are left out.
+    The rows are aligned to the records of `source`, the base VCF, in
+    order. The ##INFO definitions and the `source_fingerprint` of the base
+    VCF go into the file's metadata. The file is created
+    with `schema` up front, so a VCF without records still gets an empty
+    sidecar.
+
+    Example:
+        with SidecarWriter(directory, "FREQ", vcf, {"FREQ": pa.binary()}, [FREQ_HEADER]) as sidecar:
+            for batch in reader:
+                sidecar.write({"FREQ": values})
+    """
+
+    def __init__(self, directory, name, source, schema, header_lines=(), compression="zstd"):
+        self.path = Path(directory) / f"{name}.parquet"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.header_lines = [line.encode() if isinstance(line, str) else line for line in header_lines]
+        self.schema = pa.schema(schema).with_metadata({
+            HEADER_KEY: b"".join(self.header_lines),
+            SOURCE_KEY: source_fingerprint(source),
+        })
+        self._writer = pq.ParquetWriter(str(self.path), self.schema, compression=compression)
+        self.rows = 0
+
+    def write(self, columns):
+        """Append rows: {column name: Arrow array}, all of equal length."""
+        table = pa.table(columns, schema=self.schema)
+        self._writer.write_table(table)
+        self.rows += len(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _render(name, values):
+    """INFO entries of one column: `name=value`, `name` for a true flag, null if absent."""
+    if pa.types.is_boolean(values.type):
+        return pc.if_else(values, pa.scalar(name.encode()), pa.scalar(None, pa.binary()))
+    if not pa.types.is_binary(values.type):
+        values = pc.cast(pc.cast(values, pa.string()), pa.binary())
+    return pc.binary_join_element_wise(pa.scalar(name.encode() + b"="), values, b"")
+
+
+def materialise(vcf, output, directory=None, names=None, batch_size=65536):
+    """
+    Write `vcf` with sidecar columns appended to its INFO, in one pass.
+
+    The output is written next to `output` and only moved into place once
+    every sidecar turned out to have one row per record; sidecars written
+    for another VCF (or before `vcf` changed) are rejected up front.
+
+    Args:
+        vcf (str): The base VCF the sidecars annotate.
+        output (str): Output VCF ('.gz' is compressed and indexed).
+        directory (str): Sidecar directory (default: `sidecar_dir(vcf)`).
+        names (List[str]): Sidecars to merge (default: all of them, by name).
+
+    Returns:
+        str: `output`.
+    """
+    directory = Path(directory) if directory is not None else sidecar_dir(vcf)
+    names = names if names is not None else sorted(path.stem for path in directory.glob("*.parquet"))
+    fingerprint = source_fingerprint(vcf)
+    sidecars = []  # (sidecar name, rows, [(column name, array)]), rows in VCF order
+    header_lines = []
+    for name in names:
+        table = pq.read_table(directory / f"{name}.parquet")
+        metadata = table.schema.metadata or {}
+        if metadata.get(SOURCE_KEY) != fingerprint:
+            raise ValueError(f"Sidecar {name} in {directory} was not written for {vcf} as it is now")
+        header_lines += metadata.get(HEADER_KEY, b"").splitlines(keepends=True)
+        columns = [(column, table.column(column).combine_chunks()) for column in table.column_names]
+        sidecars.append((name, len(table), columns))
+
+    partial = Path(output).with_name(f".partial.{Path(output).name}")
+    try:
+        row = 0
+        with VcfBatchReader(vcf, batch_size=batch_size) as reader, VcfWriter(partial) as writer:
+            present = set(reader.header)
+            writer.write_header(reader.header, [line for line in header_lines if line not in present])
+            for batch in reader:
+                n = len(batch)
+                for name, rows, _ in sidecars:
+                    if rows < row + n:
+                        raise ValueError(f"Sidecar {name} has {rows} rows but {vcf} has more records")
+                entries = [
+                    _render(column, values.slice(row, n))
+                    for _, _, columns in sidecars for column, values in columns
+                ]
+                if entries:
+                    tags = pc.binary_join_element_wise(*entries, b";", null_handling="skip")
+                    tags = pc.if_else(pc.equal(pc.binary_length(tags), 0), pa.scalar(None, pa.binary()), tags)
+                    lines = batch.with_info(tags)
+                    # Records without any tag keep their INFO unchanged.
+                    lines = pc.if_else(pc.is_null(tags), pc.binary_join_element_wise(batch.lines, b"", b"\n"), lines)
+                else:
+                    lines = pc.binary_join_element_wise(batch.lines, b"", b"\n")
+                write_batch(writer, batch, lines)
+                profiling.add_records(n)
+                row += n
+
+        for name, rows, _ in sidecars:
+            if rows != row:
+                raise ValueError(f"Sidecar {name} has {rows} rows but {vcf} has {row} records")
+    except BaseException:
+        for path in (partial, index_path(partial, "tbi"), index_path(partial, "csi")):
+            Path(path).unlink(missing_ok=True)
+        raise
+
+    for index in ("tbi", "csi"):
+        if os.path.exists(index_path(partial, index)):
+            os.replace(index_path(partial, index), index_path(output, index))
+    os.replace(partial, output)
+    return output
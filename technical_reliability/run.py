@@ -1,37 +1,85 @@
 import os
+from plotting import AGGREGATES_FILE, render_figures, render_saved
 from technical_reliability.variant_qc import (
     load_variants,
     filter_reliable_snvs,
+    filter_reliable_snvs_parallel,
+    filter_reliable_snvs_bcftools,
     export_vcf,
-    plot_depth_and_ab,
-    stratify_by_impact,
-    plot_impact_qc
+    summarize_qc,
+    qc_plot_specs,
 )
 
-def run(annotated_variants_file,output):
+QC_DIR = "annotation_prio_qc"
+
+
+def qc_dirs(qc_dir=QC_DIR):
+    """The (raw, reliable) figure directories under `qc_dir`."""
+    return os.path.join(qc_dir, "raw"), os.path.join(qc_dir, "reliable")
+
+
+def render_plots(qc_dir=QC_DIR, n_workers=None):
+    """
+    Render the QC figures a "deferred" `run` saved under `qc_dir`, e.g. as
+    a stage of its own that nothing downstream waits for.
+    """
+    paths = []
+    for directory in qc_dirs(qc_dir):
+        if os.path.exists(os.path.join(directory, AGGREGATES_FILE)):
+            paths += render_saved(directory, n_workers=n_workers)
+    return paths
+
+
+def run(annotated_variants_file,output,n_workers=None,backend="python",plots="render",qc_dir=QC_DIR):
+    """
+    backend: "python" filters with cyvcf2 (on `n_workers` processes over
+    region chunks if more than one); "bcftools" compiles the rules into one
+    bcftools expression and only reads the VCFs again in Python to summarise
+    them for the plots, so with plots="none" it never does.
+
+    plots: "render" draws the QC figures in a process pool before returning,
+    "deferred" only saves their aggregates so a pipeline can render them off
+    its critical path (see render_plots), "none" skips them.
+
+    qc_dir: where the figures (or their aggregates) go, in raw/ and
+    reliable/; pass the same directory to render_plots.
+    """
+    if backend not in ("python", "bcftools"):
+        raise ValueError(f"backend must be 'python' or 'bcftools', got: {backend}")
+    if backend == "bcftools" and n_workers is not None and n_workers > 1:
+        raise ValueError("n_workers only applies to the python backend; bcftools runs as one process")
+
     # === Paths ===
-    raw_qc_dir = "annotation_prio_qc/raw"
-    reliable_qc_dir = "annotation_prio_qc/reliable"
+    raw_qc_dir, reliable_qc_dir = qc_dirs(qc_dir)
     os.makedirs(raw_qc_dir, exist_ok=True)
     os.makedirs(reliable_qc_dir, exist_ok=True)
 
-    # === Step 1: Load annotated VCF ===
-    vcf_raw = list(load_variants(annotated_variants_file))  # Cache in memory
-
-    # === Step 2: Filter reliable variants ===
-    reliable_snvs = filter_reliable_snvs(vcf_raw, min_dp=10, min_ab=0.2)
+    if backend == "bcftools":
+        # === Step 1-3: Filter and export in bcftools (compiled rules) ===
+        filter_reliable_snvs_bcftools(annotated_variants_file, output, min_dp=10, min_ab=0.2)
+        if plots == "none":
+            return output
+        raw_qc = summarize_qc(load_variants(annotated_variants_file))
+        reliable_qc = summarize_qc(load_variants(output))
+    elif n_workers is not None and n_workers > 1:
+        # === Step 1-3: Filter region chunks on a process pool (input must be indexed) ===
+        raw_qc, reliable_qc = filter_reliable_snvs_parallel(
+            annotated_variants_file, output, n_workers=n_workers, min_dp=10, min_ab=0.2
+        )
+    else:
+        # === Step 1: Load annotated VCF ===
+        vcf_raw = list(load_variants(annotated_variants_file))  # Cache in memory
 
-    # === Step 3: Export to new VCF ===
-    export_vcf(reliable_snvs, output, load_variants(annotated_variants_file))
+        # === Step 2: Filter reliable variants ===
+        reliable_snvs = filter_reliable_snvs(vcf_raw, min_dp=10, min_ab=0.2)
 
-    # === Step 4: Plot QC metrics for raw SNVs ===
-    plot_depth_and_ab(vcf_raw, raw_qc_dir)
-    impact_ab, impact_dp = stratify_by_impact(vcf_raw)
-    plot_impact_qc(impact_ab, impact_dp, raw_qc_dir)
+        # === Step 3: Export to new VCF ===
+        export_vcf(reliable_snvs, output, load_variants(annotated_variants_file))
+        raw_qc = summarize_qc(vcf_raw)
+        reliable_qc = summarize_qc(reliable_snvs)
 
-    # === Step 5: Plot QC metrics for reliable SNVs ===
-    plot_depth_and_ab(reliable_snvs, reliable_qc_dir)
-    impact_ab_rel, impact_dp_rel = stratify_by_impact(reliable_snvs)
-    plot_impact_qc(impact_ab_rel, impact_dp_rel, reliable_qc_dir)
+    # === Step 4-5: Render raw and reliable QC plots from the aggregates ===
+    render_figures(qc_plot_specs(raw_qc), raw_qc_dir, mode=plots)
+    render_figures(qc_plot_specs(reliable_qc), reliable_qc_dir, mode=plots)
 
-    return output
\ No newline at end of file
+    return output
@@ -0,0 +1,188 @@
+import math
+import random
+
+
+class _Compactor(list):
+    """One level of a KLL sketch; each retained item stands for 2**level values."""
+
+    def compact(self, rng):
+        """Sort, then keep every other item (random offset) for the next level."""
+        self.sort()
+        offset = rng.random() < 0.5
+        survivors = self[offset::2] if len(self) % 2 == 0 else self[offset:-1:2]
+        del self[: len(self) - len(self) % 2]
+        return survivors
+
+
+class KLLSketch:
+    """Mergeable streaming quantile sketch (Karnin, Lang & Liberty, 2016).
+
+    Memory is bounded by about k / (1 - c) retained items (~600 at the
+    defaults) regardless of how many values are added. Quantile estimates have a rank error of about 1.7/k of
+    the stream length with high probability (under 1% at the default k=200),
+    and the exact minimum and maximum are always kept. Sketches built on
+    separate shards can be combined with `merge` and round-tripped through
+    `to_dict` / `from_dict` (JSON compatible).
+
+    Parameters:
+        k (int): Accuracy parameter; capacity of the top compactor.
+        c (float): Capacity decay factor between levels.
+        seed (int): Seed for the compaction coin flips.
+    """
+
+    def __init__(self, k=200, c=2 / 3, seed=None):
+        self.k = k
+        self.c = c
+        self.n = 0
+        self.min = None
+        self.max = None
+        self._rng = random.Random(seed)
+        self._compactors = []
+        self._size = 0
+        self._grow()
+
+    def __len__(self):
+        return self.n
+
+    def _capacity(self, level):
+        depth = len(self._compactors) - level - 1
+        return int(math.ceil(self.k * self.c**depth)) + 1
+
+    def _grow(self):
+        self._compactors.append(_Compactor())
+        self._max_size = sum(
+            self._capacity(level) for level in range(len(self._compactors))
+        )
+
+    def _compress(self):
+        self._size = sum(len(compactor) for compactor in self._compactors)
+        while self._size >= self._max_size:
+            for level, compactor in enumerate(self._compactors):
+                if len(compactor) >= self._capacity(level):
+                    if level + 1 == len(self._compactors):
+                        self._grow()
+                    self._compactors[level + 1].extend(compactor.compact(self._rng))
+                    break
+            self._size = sum(len(compactor) for compactor in self._compactors)
+
+    def update(self, value):
+        """Add one value to the sketch."""
+        value = float(value)
+        self.n += 1
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self._compactors[0].append(value)
+        self._size += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def extend(self, values):
+        """Add every value of an iterable to the sketch."""
+        for value in values:
+            self.update(value)
+
+    def merge(self, other):
+        """Fold another sketch into this one in place and return self."""
+        if other.n == 0:
+            return self
+        while len(self._compactors) < len(other._compactors):
+            self._grow()
+        for level, compactor in enumerate(other._compactors):
+            self._compactors[level].extend(compactor)
+        self.n += other.n
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantiles(self, qs):
+        """Estimate the values at the given quantiles.
+
+        Parameters:
+            qs (list[float]): Quantiles in [0, 1].
+
+        Returns:
+            list[float]: One estimate per quantile (None for an empty sketch).
+        """
+        if self.n == 0:
+            return [None for _ in qs]
+
+        weighted = sorted(
+            (value, 2**level)
+            for level, compactor in enumerate(self._compactors)
+            for value in compactor
+        )
+        total = sum(weight for _, weight in weighted)
+
+        results = []
+        for q in qs:
+            if q <= 0:
+                results.append(self.min)
+                continue
+            if q >= 1:
+                results.append(self.max)
+                continue
+            target = q * total
+            cumulative = 0
+            for value, weight in weighted:
+                cumulative += weight
+                if cumulative >= target:
+                    results.append(value)
+                    break
+        return results
+
+    def quantile(self, q):
+        """Estimate the value at a single quantile."""
+        return self.quantiles([q])[0]
+
+    def to_dict(self):
+        """Return a JSON-serialisable representation of the sketch."""
+        return {
+            "k": self.k,
+            "c": self.c,
+            "n": self.n,
+            "min": self.min,
+            "max": self.max,
+            "compactors": [list(compactor) for compactor in self._compactors],
+        }
+
+    @classmethod
+    def from_dict(cls, data, seed=None):
+        """Rebuild a sketch serialised with `to_dict`."""
+        sketch = cls(k=data["k"], c=data["c"], seed=seed)
+        sketch.n = data["n"]
+        sketch.min = data["min"]
+        sketch.max = data["max"]
+        sketch._compactors = []
+        for items in data["compactors"]:
+            sketch._grow()
+            sketch._compactors[-1].extend(items)
+        sketch._compress()
+        return sketch
+
+
+def boxplot_stats(sketch, label=None, whis=1.5):
+    """Build matplotlib `bxp` statistics from a sketch's quartiles.
+
+    Whiskers extend to the estimated quartiles +/- `whis` * IQR, clipped to the
+    exact data range. Outliers are not retained by the sketch and are omitted.
+
+    Parameters:
+        sketch (KLLSketch): Non-empty sketch.
+        label (str): Box label.
+        whis (float): Whisker length as a multiple of the IQR.
+
+    Returns:
+        dict: Statistics accepted by `matplotlib.axes.Axes.bxp`.
+    """
+    q1, med, q3 = sketch.quantiles([0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    return {
+        "label": label,
+        "med": med,
+        "q1": q1,
+        "q3": q3,
+        "whislo": max(sketch.min, q1 - whis * iqr),
+        "whishi": min(sketch.max, q3 + whis * iqr),
+        "fliers": [],
+    }
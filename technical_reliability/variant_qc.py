@@ -1,9 +1,23 @@
 from cyvcf2 import VCF, Writer
 from collections import defaultdict, Counter
-import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor
+from bisect import bisect_right
+from plotting import hist_spec, box_spec, render_figure
+from technical_reliability.sketch import KLLSketch, boxplot_stats
+from profiling import run_command
+from vcf_io import VcfWriter
+import tempfile
+import shutil
 import os
 
 
+# Fixed histogram edges so per-chunk counts can be summed across workers.
+DP_BINS = list(range(0, 600, 20))
+AB_BINS = [i / 30 for i in range(31)]
+# Smallest region worth a task of its own, in base pairs.
+MIN_CHUNK_SIZE = 10_000
+
+
 def load_variants(vcf_path):
     """Load variants from a VCF file using cyvcf2.
 
@@ -108,6 +122,310 @@ def export_vcf(variants, output_path, template_vcf):
     writer.close()
 
 
+def split_regions(vcf_path, chunk_size=None, n_workers=None, tasks_per_worker=4):
+    """Split an indexed VCF into contiguous region chunks.
+
+    Parameters:
+        vcf_path (str): Path to a bgzipped and indexed VCF file.
+        chunk_size (int): Maximum length of each region in base pairs
+            (default: the total contig length over `tasks_per_worker`
+            tasks per worker, so every worker has work to balance).
+        n_workers (int): Number of workers the regions are for (default:
+            all cores).
+        tasks_per_worker (int): Regions per worker when `chunk_size` is
+            not given.
+
+    Returns:
+        list[tuple[str, int, int]]: (chrom, start, end) regions, 1-based and
+            inclusive, in contig order. Contigs without a header length are
+            returned as a single region.
+    """
+    vcf = VCF(vcf_path)
+    names = list(vcf.seqnames)
+    try:
+        lengths = vcf.seqlens
+    except AttributeError:
+        lengths = [None] * len(names)
+    vcf.close()
+
+    if chunk_size is None:
+        tasks = (n_workers or os.cpu_count() or 1) * tasks_per_worker
+        total = sum(length for length in lengths if length)
+        chunk_size = max(MIN_CHUNK_SIZE, -(-total // tasks))
+
+    regions = []
+    for chrom, length in zip(names, lengths):
+        if not length:
+            regions.append((chrom, 1, None))
+            continue
+        for start in range(1, length + 1, chunk_size):
+            regions.append((chrom, start, min(start + chunk_size - 1, length)))
+    return regions
+
+
+def _empty_qc():
+    return {
+        "n_variants": 0,
+        "dp_counts": [0] * (len(DP_BINS) - 1),
+        "ab_counts": [0] * (len(AB_BINS) - 1),
+        "impact_ab": defaultdict(KLLSketch),
+        "impact_dp": defaultdict(KLLSketch),
+    }
+
+
+def _accumulate_qc(qc, var):
+    qc["n_variants"] += 1
+    dp, ab = depth_and_balance(var)
+    i = None if dp is None else bin_index(dp, DP_BINS)
+    if i is not None:
+        qc["dp_counts"][i] += 1
+    i = None if ab is None else bin_index(ab, AB_BINS)
+    if i is not None:
+        qc["ab_counts"][i] += 1
+
+    stats = impact_depth_and_balance(var)
+    if stats is not None:
+        impact, dp, ab = stats
+        qc["impact_ab"][impact].update(ab)
+        qc["impact_dp"][impact].update(dp)
+
+
+def merge_qc(parts):
+    """Merge per-chunk QC accumulators into a single summary.
+
+    Parameters:
+        parts (list[dict]): Accumulators returned by the region workers.
+
+    Returns:
+        dict: Summed variant count and histograms, and merged per-impact
+            quantile sketches.
+    """
+    merged = _empty_qc()
+    for part in parts:
+        merged["n_variants"] += part["n_variants"]
+        for key in ("dp_counts", "ab_counts"):
+            merged[key] = [a + b for a, b in zip(merged[key], part[key])]
+        for key in ("impact_ab", "impact_dp"):
+            for impact, sketch in part[key].items():
+                merged[key][impact].merge(sketch)
+    return merged
+
+
+def _filter_region(task):
+    """Worker: filter one region and accumulate raw/reliable QC for it."""
+    vcf_path, region, chunk_path, thresholds = task
+    chrom, start, end = region
+    query = chrom if end is None else f"{chrom}:{start}-{end}"
+
+    vcf = VCF(vcf_path)
+    writer = Writer(chunk_path, vcf)
+    raw_qc = _empty_qc()
+    reliable_qc = _empty_qc()
+
+    for var in vcf(query):
+        # Region queries return overlapping records; keep those starting here
+        # so records spanning a chunk boundary are emitted exactly once.
+        if end is not None and not start <= var.POS <= end:
+            continue
+        _accumulate_qc(raw_qc, var)
+        if is_reliable(var, **thresholds):
+            _accumulate_qc(reliable_qc, var)
+            writer.write_record(var)
+
+    writer.close()
+    vcf.close()
+    return raw_qc, reliable_qc
+
+
+def filter_reliable_snvs_parallel(
+    vcf_path,
+    output_path,
+    n_workers=None,
+    chunk_size=None,
+    min_dp=10,
+    min_ab=0.2,
+    min_mq=40,
+    allowed_filters={"PASS", ".", None},
+):
+    """Filter an indexed VCF for reliable SNVs using a pool of region workers.
+
+    The input is split into region chunks (see `split_regions`); each worker
+    runs `is_reliable` and the QC accumulation over its chunk with a cyvcf2
+    region query. Per-chunk outputs are concatenated in region order so the
+    result matches `filter_reliable_snvs` followed by `export_vcf`.
+
+    Parameters:
+        vcf_path (str): Path to a bgzipped and indexed input VCF.
+        output_path (str): Path to the output VCF (.vcf or .vcf.gz).
+        n_workers (int): Number of worker processes (default: all cores).
+        chunk_size (int): Region length in base pairs per task (default:
+            sized from `n_workers`, see `split_regions`).
+        min_dp (int): Minimum read depth threshold.
+        min_ab (float): Minimum allele balance.
+        min_mq (int): Minimum mapping quality.
+        allowed_filters (set[str]): Acceptable FILTER field values.
+
+    Returns:
+        tuple:
+            - raw_qc (dict): Merged QC summary of all input variants.
+            - reliable_qc (dict): Merged QC summary of the reliable variants.
+    """
+    vcf_path = str(vcf_path)
+    output_path = str(output_path)
+    thresholds = {
+        "min_dp": min_dp,
+        "min_ab": min_ab,
+        "min_mq": min_mq,
+        "allowed_filters": allowed_filters,
+    }
+    regions = split_regions(vcf_path, chunk_size=chunk_size, n_workers=n_workers)
+    tmp_dir = tempfile.mkdtemp(prefix="reliable_chunks_")
+
+    try:
+        tasks = [
+            (vcf_path, region, os.path.join(tmp_dir, f"chunk_{i:06d}.vcf"), thresholds)
+            for i, region in enumerate(regions)
+        ]
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            results = list(pool.map(_filter_region, tasks, chunksize=1))
+
+        _concatenate_chunks(
+            VCF(vcf_path).raw_header, [task[2] for task in tasks], output_path
+        )
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    raw_qc = merge_qc([raw for raw, _ in results])
+    reliable_qc = merge_qc([reliable for _, reliable in results])
+    return raw_qc, reliable_qc
+
+
+def _concatenate_chunks(header, chunk_paths, output_path):
+    """
+    Write the header and the record bodies of each chunk, in order; '.gz'
+    output is BGZF-compressed and tabix-indexed as it is written.
+    """
+    with VcfWriter(output_path) as writer:
+        writer.write_header(header.encode().splitlines(keepends=True))
+        for chunk_path in chunk_paths:
+            with open(chunk_path, "rb") as chunk:
+                for line in chunk:
+                    if not line.startswith(b"#"):
+                        writer.write_line(line)
+
+
+def compile_reliability_expression(
+    min_dp=10, min_ab=0.2, min_mq=40, allowed_filters={"PASS", ".", None}
+):
+    """Compile the `is_reliable` thresholds into a `bcftools view -i` expression.
+
+    Each clause mirrors the Python rule it replaces, including its handling
+    of missing values: DP and AB are read from the first sample, a missing
+    MQ passes, strand bias needs both SAF and SAR, and is only checked on
+    biallelic records (cyvcf2 returns a tuple for multi-allelic SAF/SAR,
+    which never equals zero). cyvcf2 reports both PASS and "." as None, so
+    None in `allowed_filters` admits either.
+
+    Parameters:
+        min_dp (int): Minimum read depth threshold.
+        min_ab (float): Minimum allele balance.
+        min_mq (int): Minimum mapping quality.
+        allowed_filters (set[str]): Acceptable FILTER field values.
+
+    Returns:
+        str: bcftools filter expression selecting reliable records.
+    """
+    filters = set()
+    for value in allowed_filters:
+        if value is None:
+            filters.update({"PASS", "."})
+        elif value not in ("PASS", "."):
+            filters.add(value)
+    if not filters:
+        raise ValueError("allowed_filters admits no FILTER value")
+
+    clauses = [
+        f"FMT/DP[0]>={min_dp}",
+        f"FMT/AD[0:1]/SUM(FMT/AD[0:*])>={min_ab}",
+        "(" + " || ".join(f'FILTER="{value}"' for value in sorted(filters)) + ")",
+        '(N_ALT>1 || INFO/SAF="." || INFO/SAR="." || (INFO/SAF!=0 && INFO/SAR!=0))',
+        f'(INFO/MQ="." || INFO/MQ>={min_mq})',
+    ]
+    return " && ".join(clauses)
+
+
+def filter_reliable_snvs_bcftools(
+    vcf_path,
+    output_path,
+    threads=4,
+    min_dp=10,
+    min_ab=0.2,
+    min_mq=40,
+    allowed_filters={"PASS", ".", None},
+    extra_rules=None,
+):
+    """Filter a VCF for reliable SNVs with bcftools instead of Python.
+
+    The thresholds are compiled by `compile_reliability_expression` and
+    evaluated by `bcftools view` over the raw records, with `threads` extra
+    compression/decompression threads. Rules that cannot be expressed in
+    bcftools syntax are given as `extra_rules` and applied afterwards in a
+    cyvcf2 pass over the (already reduced) output.
+
+    Parameters:
+        vcf_path (str): Path to the input VCF/BCF.
+        output_path (str): Output path; .bcf, .vcf.gz or .vcf selects the format.
+        threads (int): Number of bcftools I/O threads.
+        min_dp (int): Minimum read depth threshold.
+        min_ab (float): Minimum allele balance.
+        min_mq (int): Minimum mapping quality.
+        allowed_filters (set[str]): Acceptable FILTER field values.
+        extra_rules (list[callable]): Predicates on cyvcf2.Variant that must
+            all return True for a record to be kept.
+
+    Returns:
+        str: Path to the filtered output.
+    """
+    vcf_path = str(vcf_path)
+    output_path = str(output_path)
+    expression = compile_reliability_expression(
+        min_dp=min_dp, min_ab=min_ab, min_mq=min_mq, allowed_filters=allowed_filters
+    )
+
+    if output_path.endswith(".bcf"):
+        output_type = "b"
+    elif output_path.endswith(".gz"):
+        output_type = "z"
+    else:
+        output_type = "v"
+
+    compiled_path = output_path
+    if extra_rules:
+        compiled_path = output_path + ".compiled.bcf"
+        output_type = "u"
+
+    run_command([
+        "bcftools", "view",
+        "-i", expression,
+        "--threads", str(threads),
+        f"-O{output_type}",
+        "-o", compiled_path,
+        vcf_path
+    ], check=True)
+
+    if extra_rules:
+        vcf = VCF(compiled_path, threads=threads)
+        writer = Writer(output_path, vcf)
+        for var in vcf:
+            if all(rule(var) for rule in extra_rules):
+                writer.write_record(var)
+        writer.close()
+        vcf.close()
+        os.remove(compiled_path)
+
+    return output_path
+
+
 def check_strand_bias(variant):
     """Detect strand bias using SAF and SAR INFO fields.
 
@@ -142,36 +460,157 @@ def stratify_by_impact(vcf):
     Parameters:
         vcf (cyvcf2.VCF): VCF object with functional annotations (ANN field).
 
+    Values are summarised in streaming quantile sketches (see
+    `technical_reliability.sketch.KLLSketch`), so memory stays bounded however
+    many variants are read.
+
     Returns:
         tuple:
-            - impact_ab (dict[str, list[float]]): Allele balance by impact.
-            - impact_dp (dict[str, list[int]]): Read depth by impact.
+            - impact_ab (dict[str, KLLSketch]): Allele balance by impact.
+            - impact_dp (dict[str, KLLSketch]): Read depth by impact.
     """
-    impact_ab = defaultdict(list)
-    impact_dp = defaultdict(list)
+    impact_ab = defaultdict(KLLSketch)
+    impact_dp = defaultdict(KLLSketch)
 
     for var in vcf:
-        ann_field = var.INFO.get("ANN")
-        if not ann_field:
+        stats = impact_depth_and_balance(var)
+        if stats is None:
             continue
-        annotations = ann_field.split(",")
-        impact = annotations[0].split("|")[2]  # IMPACT field
+        impact, dp, ab = stats
+        impact_ab[impact].update(ab)
+        impact_dp[impact].update(dp)
+
+    return impact_ab, impact_dp
 
-        # Safely flatten DP and AD arrays
-        dp_raw = var.format("DP")
-        ad_raw = var.format("AD")
 
-        if dp_raw is None or ad_raw is None:
-            continue
+def impact_depth_and_balance(var):
+    """Extract the impact class, read depth and allele balance of a variant.
 
-        dp = dp_raw[0] if isinstance(dp_raw[0], (int, float)) else dp_raw[0][0]
-        ad = ad_raw[0] if isinstance(ad_raw[0], (int, float)) else ad_raw[0]
+    Parameters:
+        var (cyvcf2.Variant): Variant record with an ANN field.
 
-        ab = calculate_ab(ad)
-        impact_ab[impact].append(ab)
-        impact_dp[impact].append(dp)
+    Returns:
+        tuple or None: (impact, dp, ab), or None if ANN, DP or AD is missing.
+    """
+    ann_field = var.INFO.get("ANN")
+    if not ann_field:
+        return None
+    annotations = ann_field.split(",")
+    impact = annotations[0].split("|")[2]  # IMPACT field
 
-    return impact_ab, impact_dp
+    # Safely flatten DP and AD arrays
+    dp_raw = var.format("DP")
+    ad_raw = var.format("AD")
+
+    if dp_raw is None or ad_raw is None:
+        return None
+
+    dp = dp_raw[0] if isinstance(dp_raw[0], (int, float)) else dp_raw[0][0]
+    ad = ad_raw[0] if isinstance(ad_raw[0], (int, float)) else ad_raw[0]
+
+    return impact, dp, calculate_ab(ad)
+
+
+def depth_and_balance(v):
+    """Extract read depth and allele balance of a variant for histograms.
+
+    Parameters:
+        v (cyvcf2.Variant): Variant record.
+
+    Returns:
+        tuple: (dp, ab); either value is None when the field is unavailable.
+    """
+    dp_array = v.format("DP")  # Usually shape (1, 1) or (1,)
+    ad_array = v.format("AD")  # Usually shape (1, 2) or more
+
+    dp = None
+    ab = None
+    if dp_array is not None and len(dp_array) > 0:
+        dp = dp_array[0]
+        if isinstance(dp, (list, tuple)):
+            dp = dp[0]
+        dp = int(dp[0]) if hasattr(dp, "__len__") else int(dp)
+
+    if ad_array is not None and len(ad_array[0]) >= 2:
+        ab = float(calculate_ab(ad_array[0]))
+
+    return dp, ab
+
+
+def histogram(values, edges):
+    """Count values into fixed bins, matching numpy/matplotlib edge rules.
+
+    Parameters:
+        values (iterable[float]): Values to count.
+        edges (list[float]): Monotonic bin edges; the last bin is closed.
+
+    Returns:
+        list[int]: One count per bin. Values outside the edges are ignored.
+    """
+    counts = [0] * (len(edges) - 1)
+    for value in values:
+        i = bin_index(value, edges)
+        if i is not None:
+            counts[i] += 1
+    return counts
+
+
+def bin_index(value, edges):
+    """Return the histogram bin of `value`, or None if it is out of range."""
+    if value < edges[0] or value > edges[-1]:
+        return None
+    return min(bisect_right(edges, value) - 1, len(edges) - 2)
+
+
+def summarize_qc(variants):
+    """Accumulate the QC histograms and per-impact sketches of some variants.
+
+    Parameters:
+        variants (cyvcf2.VCF or iterable): Variants to summarise.
+
+    Returns:
+        dict: Variant count, DP/AB counts over `DP_BINS`/`AB_BINS` and
+            per-impact DP/AB sketches (same layout as `merge_qc`).
+    """
+    qc = _empty_qc()
+    for var in variants:
+        _accumulate_qc(qc, var)
+    return qc
+
+
+def depth_and_ab_specs(dp_counts, ab_counts):
+    """Build the read depth and allele balance histogram plot aggregates."""
+    return [
+        hist_spec(
+            "read_depth_distribution.png", DP_BINS, dp_counts,
+            "Read Depth Distribution", "DP", color="gray", edgecolor="black",
+        ),
+        hist_spec(
+            "allele_balance_distribution.png", AB_BINS, ab_counts,
+            "Allele Balance Distribution", "AB", color="teal", edgecolor="black",
+        ),
+    ]
+
+
+def impact_qc_specs(impact_ab, impact_dp):
+    """Build the per-impact DP and AB boxplot aggregates from sketches.
+
+    Boxes come from sketch quartiles (rank error under 1% at the default
+    sketch size); whiskers are clipped to the exact range, outliers omitted.
+    """
+    dp_stats = [boxplot_stats(v, label=k) for k, v in sorted(impact_dp.items()) if v.n]
+    ab_stats = [boxplot_stats(v, label=k) for k, v in sorted(impact_ab.items()) if v.n]
+    return [
+        box_spec("impact_vs_depth.png", dp_stats, "Read Depth by Variant Impact", "DP"),
+        box_spec("impact_vs_ab.png", ab_stats, "Allele Balance by Variant Impact", "AB"),
+    ]
+
+
+def qc_plot_specs(qc):
+    """Build all four QC plot aggregates from a `summarize_qc` result."""
+    return depth_and_ab_specs(qc["dp_counts"], qc["ab_counts"]) + impact_qc_specs(
+        qc["impact_ab"], qc["impact_dp"]
+    )
 
 
 def plot_depth_and_ab(vcf, out_dir):
@@ -184,81 +623,35 @@ def plot_depth_and_ab(vcf, out_dir):
     Returns:
         None
     """
-    depths = []
-    balances = []
-
-    for v in vcf:
-        dp_array = v.format("DP")  # Usually shape (1, 1) or (1,)
-        ad_array = v.format("AD")  # Usually shape (1, 2) or more
-
-        if dp_array is not None and len(dp_array) > 0:
-            dp = dp_array[0]
-            if isinstance(dp, (list, tuple)):
-                dp = dp[0]
-            depths.append(dp)
-
-        if ad_array is not None and len(ad_array[0]) >= 2:
-            ad = ad_array[0]
-            ab = calculate_ab(ad)
-            balances.append(ab)
-
-    # Ensure depths and balances are flat scalars
-    depths = [int(d[0]) if isinstance(d, (list, tuple)) else int(d) for d in depths]
-    balances = [float(b) for b in balances]
-
-    # Plot Read Depth Histogram
-    plt.figure(figsize=(8, 4))
-    plt.hist(depths, bins=range(0, 600, 20), color="gray", edgecolor="black")
-    plt.title("Read Depth Distribution")
-    plt.xlabel("DP")
-    plt.ylabel("Count")
-    plt.tight_layout()
-    plt.savefig(os.path.join(out_dir, "read_depth_distribution.png"))
-    plt.close()
-
-    # Plot Allele Balance Histogram
-    plt.figure(figsize=(8, 4))
-    plt.hist(balances, bins=30, color="teal", edgecolor="black")
-    plt.title("Allele Balance Distribution")
-    plt.xlabel("AB")
-    plt.ylabel("Count")
-    plt.tight_layout()
-    plt.savefig(os.path.join(out_dir, "allele_balance_distribution.png"))
-    plt.close()
+    qc = summarize_qc(vcf)
+    plot_depth_and_ab_histograms(qc["dp_counts"], qc["ab_counts"], out_dir)
+
+
+def plot_depth_and_ab_histograms(dp_counts, ab_counts, out_dir):
+    """Plot read depth and allele balance histograms from pre-binned counts.
+
+    Parameters:
+        dp_counts (list[int]): Read depth counts over `DP_BINS`.
+        ab_counts (list[int]): Allele balance counts over `AB_BINS`.
+        out_dir (str): Directory to save histogram images.
+
+    Returns:
+        None
+    """
+    for spec in depth_and_ab_specs(dp_counts, ab_counts):
+        render_figure(spec, out_dir)
 
 
 def plot_impact_qc(impact_ab, impact_dp, out_dir):
     """Generate boxplots of read depth and allele balance grouped by impact class.
 
     Parameters:
-        impact_ab (dict[str, list[float]]): AB values stratified by impact.
-        impact_dp (dict[str, list[int]]): DP values stratified by impact.
+        impact_ab (dict[str, KLLSketch]): AB sketches stratified by impact.
+        impact_dp (dict[str, KLLSketch]): DP sketches stratified by impact.
         out_dir (str): Directory to save the plots.
 
     Returns:
         None
     """
-    # Filter non-empty impact groups for depth
-    dp_items = sorted((k, v) for k, v in impact_dp.items() if v)
-    ab_items = sorted((k, v) for k, v in impact_ab.items() if v)
-    # Unzip
-    dp_labels, dp_data = zip(*dp_items)
-    ab_labels, ab_data = zip(*ab_items)
-
-    # Plot Read Depth
-    plt.figure(figsize=(6, 4))
-    plt.boxplot(dp_data, labels=dp_labels, patch_artist=True)
-    plt.title("Read Depth by Variant Impact")
-    plt.ylabel("DP")
-    plt.tight_layout()
-    plt.savefig(os.path.join(out_dir, "impact_vs_depth.png"))
-    plt.close()
-
-    # Plot Allele Balance
-    plt.figure(figsize=(6, 4))
-    plt.boxplot(ab_data, labels=ab_labels, patch_artist=True)
-    plt.title("Allele Balance by Variant Impact")
-    plt.ylabel("AB")
-    plt.tight_layout()
-    plt.savefig(os.path.join(out_dir, "impact_vs_ab.png"))
-    plt.close()
+    for spec in impact_qc_specs(impact_ab, impact_dp):
+        render_figure(spec, out_dir)
@@ -0,0 +1,61 @@
+import sqlite3
+
+import pytest
+
+import annotation.ann_cache as ann_cache
+from annotation.ann_cache import AnnCache
+from annotation.annotate import annotate_vcf_with_snpeff
+
+HEADER = (
+    "##fileformat=VCFv4.2\n"
+    "##contig=<ID=I,length=10000>\n"
+    "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+)
+SITES = [(b"I", pos, b"A", b"C") for pos in range(100, 160)]
+
+
+def _last_used(path):
+    with sqlite3.connect(path) as db:
+        return dict(db.execute("SELECT pos, last_used FROM ann").fetchall())
+
+
+def test_hits_are_marked_used_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(ann_cache, "USED_FLUSH_ROWS", 10)
+    path = str(tmp_path / "ann.sqlite")
+    with AnnCache(path, "fp") as cache:
+        cache.put_many((*site, b"ANN=C|x") for site in SITES)
+
+    with AnnCache(path, "fp") as cache:
+        for site in SITES[:25]:
+            assert cache.get(*site) == b"ANN=C|x"
+        # Marked before close, so another process's eviction sees this run.
+        used = _last_used(path)
+        assert [used[pos] for _, pos, _, _ in SITES[:20]] == [cache.run] * 20
+        assert len(cache._used) == 5
+    assert [pos for pos, run in _last_used(path).items() if run == 2] == [pos for _, pos, _, _ in SITES[:25]]
+
+
+def test_vanished_hit_fails_instead_of_dropping_ann(tmp_path, monkeypatch):
+    vcf = tmp_path / "in.vcf"
+    vcf.write_text(HEADER + "".join(f"I\t{pos}\t.\tA\tC\t50\tPASS\t.\n" for _, pos, _, _ in SITES))
+    cache_path = str(tmp_path / "ann.sqlite")
+    fingerprint = ann_cache.snpeff_fingerprint("G", tmp_path / "snpeff.config", tmp_path)
+    with AnnCache(cache_path, fingerprint) as cache:
+        cache.put_many((*site, b"ANN=C|x") for site in SITES)
+        cache.set_header([b'##INFO=<ID=ANN,Number=.,Type=String,Description="ann">\n'])
+
+    # Every site is a hit in the first pass; one is evicted before the output pass.
+    get = AnnCache.get
+    calls = {"n": 0}
+
+    def evicting_get(self, *site):
+        calls["n"] += 1
+        return None if calls["n"] == len(SITES) + 7 else get(self, *site)
+
+    monkeypatch.setattr(AnnCache, "get", evicting_get)
+    output = tmp_path / "out.vcf.gz"
+    with pytest.raises(RuntimeError, match="disappeared"):
+        annotate_vcf_with_snpeff(vcf, str(output), genome_key="G", config_path=tmp_path / "snpeff.config",
+                                 data_dir=tmp_path, verbose=False, cache=cache_path)
+    assert not output.exists()
+    assert not (tmp_path / "out.vcf.gz.tbi").exists()
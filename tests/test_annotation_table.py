@@ -0,0 +1,50 @@
+import random
+
+import pandas.testing as pdt
+
+from annotation_prioritisation.cache import load_annotation_table
+from annotation_prioritisation.interpreter import parse_annotated_vcf_table
+from annotation_prioritisation.parallel import parse_annotated_vcf_table_parallel, plan_chunks
+from vcf_io import VcfWriter
+
+HEADER = [
+    b"##fileformat=VCFv4.2\n",
+    b"##contig=<ID=I,length=1000000>\n",
+    b'##INFO=<ID=ANN,Number=.,Type=String,Description="Functional annotations">\n',
+    b"#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n",
+]
+
+
+def _annotated_vcf(path, n_records=4000):
+    """A BGZF VCF spanning many blocks, with and without ANN, one or more entries per record."""
+    rng = random.Random(5)
+    with VcfWriter(path, index=None) as writer:
+        writer.write_header(HEADER)
+        for pos in range(1, n_records + 1):
+            entries = [
+                f"C|{rng.choice(['missense_variant', 'synonymous_variant', 'stop_gained'])}|"
+                f"{rng.choice(['HIGH', 'MODERATE', 'LOW'])}|G{rng.randrange(50)}|Y{rng.randrange(50)}|"
+                f"transcript|T{i}|protein_coding|1/1|c.{pos}A>C|p.K{pos}N|{pos}|{pos}|{pos}||"
+                for i in range(rng.randint(1, 4))
+            ]
+            info = "." if rng.random() < 0.1 else "ANN=" + ",".join(entries)
+            writer.write_line(f"I\t{pos * 10}\t.\tA\tC\t50\tPASS\t{info}\n".encode())
+    return path
+
+
+def test_parallel_table_matches_serial(tmp_path):
+    vcf = _annotated_vcf(tmp_path / "ann.vcf.gz")
+    assert len(plan_chunks(str(vcf), chunk_bytes=4096)) > 3
+
+    expected = parse_annotated_vcf_table(str(vcf))
+    annotations, sites = parse_annotated_vcf_table_parallel(vcf, n_workers=2, chunk_bytes=4096)
+    pdt.assert_frame_equal(annotations, expected[0])
+    pdt.assert_frame_equal(sites, expected[1])
+
+
+def test_load_annotation_table_parses_in_parallel(tmp_path):
+    vcf = _annotated_vcf(tmp_path / "ann.vcf.gz")
+    expected = parse_annotated_vcf_table(str(vcf))
+    annotations, sites = load_annotation_table(vcf, n_workers=2)
+    pdt.assert_frame_equal(annotations, expected[0])
+    pdt.assert_frame_equal(sites, expected[1])
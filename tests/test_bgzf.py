@@ -0,0 +1,163 @@
+import gzip
+import random
+
+import pytest
+
+from bgzf import BLOCK_DATA_SIZE, EOF_BLOCK, BgzfWriter, iter_block_offsets, iter_blocks
+from vcf_io import VcfReader, VcfWriter, index_path, index_vcf, rewrite_vcf_header
+
+pysam = pytest.importorskip("pysam")
+
+CONTIGS = {"I": 230_218, "II": 813_184, "III": 316_620}
+
+
+def _vcf_lines(n=6000, seed=7):
+    """A sorted VCF with indels, a symbolic deletion per contig and records spanning many blocks."""
+    rng = random.Random(seed)
+    lines = [b"##fileformat=VCFv4.2\n"]
+    lines += [f"##contig=<ID={name},length={length}>\n".encode() for name, length in CONTIGS.items()]
+    lines += [
+        b'##INFO=<ID=END,Number=1,Type=Integer,Description="End">\n',
+        b'##INFO=<ID=ANN,Number=.,Type=String,Description="Annotation">\n',
+        b"#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n",
+    ]
+    per_contig = n // len(CONTIGS)
+    for name, length in CONTIGS.items():
+        positions = sorted(rng.randrange(1, length - 200) for _ in range(per_contig))
+        for i, pos in enumerate(positions):
+            if i == per_contig // 2:
+                ref, alt, info = "A", "<DEL>", f"END={min(length, pos + 40_000)}"
+            else:
+                ref = "".join(rng.choice("ACGT") for _ in range(rng.choice((1, 1, 1, 3, 60))))
+                alt = rng.choice("ACGT")
+                info = "ANN=" + "x" * rng.randrange(0, 300)
+            lines.append(f"{name}\t{pos}\t.\t{ref}\t{alt}\t50\tPASS\t{info}\n".encode())
+    return lines
+
+
+@pytest.fixture(scope="module")
+def vcf_lines():
+    return _vcf_lines()
+
+
+def _write_vcf(path, lines, index="tbi"):
+    header = [line for line in lines if line.startswith(b"#")]
+    with VcfWriter(path, index=index, threads=3) as writer:
+        writer.write_header(header)
+        for line in lines[len(header):]:
+            writer.write_line(line)
+    return path
+
+
+def _fetch_all(path, index, regions):
+    with pysam.TabixFile(str(path), index=str(index)) as tabix:
+        return [list(tabix.fetch(*region)) for region in regions]
+
+
+def _regions(seed=11, n=200):
+    rng = random.Random(seed)
+    regions = [(name,) for name in CONTIGS]
+    for _ in range(n):
+        name, length = rng.choice(list(CONTIGS.items()))
+        start = rng.randrange(0, length)
+        regions.append((name, start, min(length, start + rng.choice((1, 100, 5_000, 100_000)))))
+    return regions
+
+
+@pytest.mark.parametrize("size", [0, 1, BLOCK_DATA_SIZE - 1, BLOCK_DATA_SIZE, 3 * BLOCK_DATA_SIZE + 17])
+def test_writer_round_trip(tmp_path, size):
+    data = random.Random(size).randbytes(size // 2) + b"ACGT\n" * (size - size // 2)
+    path = tmp_path / "data.gz"
+    with BgzfWriter(path, threads=3) as writer:
+        # Uneven writes, so blocks are assembled across calls.
+        view = memoryview(data)
+        while view:
+            step = random.Random(len(view)).randrange(1, 100_000)
+            writer.write(bytes(view[:step]))
+            view = view[step:]
+
+    raw = path.read_bytes()
+    assert raw.endswith(EOF_BLOCK)
+    assert gzip.decompress(raw) == data
+    blocks = [block for _, block in iter_blocks(path)]
+    assert b"".join(blocks) == data
+    assert all(len(block) == BLOCK_DATA_SIZE for block in blocks[:-2])
+    assert all(size <= 1 << 16 for _, size in iter_block_offsets(path))
+
+
+def test_writer_virtual_offsets(tmp_path):
+    path = tmp_path / "data.gz"
+    chunks = [random.Random(i).randbytes(random.Random(i).randrange(1, 30_000)) for i in range(40)]
+    positions = []
+    with BgzfWriter(path, threads=2) as writer:
+        for chunk in chunks:
+            positions.append(writer.tell())
+            writer.write(chunk)
+        writer.flush_block()
+    offsets = [writer.virtual_offset(position) for position in positions]
+
+    with pysam.BGZFile(str(path), "rb") as reader:
+        for chunk, offset in zip(chunks, offsets):
+            reader.seek(offset)
+            assert reader.read(len(chunk)) == chunk
+
+
+@pytest.mark.parametrize("index", ["tbi", "csi"])
+def test_vcf_writer_round_trip_and_index(tmp_path, vcf_lines, index):
+    path = _write_vcf(tmp_path / "out.vcf.gz", vcf_lines, index)
+    assert gzip.decompress(path.read_bytes()) == b"".join(vcf_lines)
+
+    fresh = tmp_path / "fresh.vcf.gz"
+    fresh.write_bytes(path.read_bytes())
+    pysam.tabix_index(str(fresh), preset="vcf", csi=index == "csi", force=True)
+
+    regions = _regions()
+    assert _fetch_all(path, index_path(path, index), regions) == _fetch_all(fresh, index_path(fresh, index), regions)
+    with pysam.TabixFile(str(path), index=index_path(path, index)) as tabix:
+        assert set(tabix.contigs) == set(CONTIGS)
+
+
+@pytest.mark.parametrize("index", ["tbi", "csi"])
+def test_index_vcf_matches_writer_index(tmp_path, vcf_lines, index):
+    path = _write_vcf(tmp_path / "out.vcf.gz", vcf_lines, index)
+    written = gzip.decompress(open(index_path(path, index), "rb").read())
+    index_vcf(path, index)
+    assert gzip.decompress(open(index_path(path, index), "rb").read()) == written
+
+
+def test_index_vcf_on_htslib_output(tmp_path, vcf_lines):
+    plain = tmp_path / "plain.vcf"
+    plain.write_bytes(b"".join(vcf_lines))
+    path = tmp_path / "htslib.vcf.gz"
+    pysam.tabix_compress(str(plain), str(path))
+    index_vcf(path)
+
+    fresh = tmp_path / "fresh.vcf.gz"
+    fresh.write_bytes(path.read_bytes())
+    pysam.tabix_index(str(fresh), preset="vcf", force=True)
+    regions = _regions(seed=3)
+    assert _fetch_all(path, index_path(path), regions) == _fetch_all(fresh, index_path(fresh), regions)
+
+
+@pytest.mark.parametrize("index", ["tbi", "csi"])
+def test_rewrite_header_keeps_body_and_index(tmp_path, vcf_lines, index):
+    path = _write_vcf(tmp_path / "out.vcf.gz", vcf_lines, index)
+    extra = b'##INFO=<ID=NEW,Number=1,Type=String,Description="' + b"y" * 70_000 + b'">\n'
+    body_blocks = [block for _, block in iter_blocks(path)][1:]
+
+    rewrite_vcf_header(path, lambda header: header[:-1] + [extra] + header[-1:])
+
+    with VcfReader(path) as reader:
+        assert extra in reader.header
+    text = gzip.decompress(path.read_bytes())
+    assert text.split(b"#CHROM", 1)[1].split(b"\n", 1)[1] == b"".join(
+        line for line in vcf_lines if not line.startswith(b"#")
+    )
+    # The body is copied, not recompressed.
+    assert [block for _, block in iter_blocks(path)][-len(body_blocks):] == body_blocks
+
+    fresh = tmp_path / "fresh.vcf.gz"
+    fresh.write_bytes(path.read_bytes())
+    pysam.tabix_index(str(fresh), preset="vcf", csi=index == "csi", force=True)
+    regions = _regions(seed=5)
+    assert _fetch_all(path, index_path(path, index), regions) == _fetch_all(fresh, index_path(fresh, index), regions)
@@ -0,0 +1,19 @@
+from annotation_prioritisation.prioritise import score_variant, top_k_genes
+from vcf_io import VcfRecord
+
+
+def test_top_k_genes_breaks_ties_by_name():
+    stats = {name: {"Score": 1.0, "N_Variants": 1} for name in ["ABC", "B", "AB"]}
+    stats["C"] = {"Score": 1.0, "N_Variants": 2}
+    assert [name for name, _ in top_k_genes(stats, 3)] == ["C", "AB", "ABC"]
+
+
+def test_score_variant_reads_info_tags():
+    record = VcfRecord(
+        b"I\t100\t.\tA\tC\t.\t.\tFREQ=NOVEL;SIFT4G=0.01;PHENO_HIT;"
+        b"ANN=C|missense_variant|MODERATE|EFB1|YAL003W|transcript|T1|protein_coding|1/1|c.1A>C|p.K1N\n"
+    )
+    variant = score_variant(record)
+    assert variant["Gene_Name"] == "EFB1"
+    assert variant["Score"] == 2.0 + 2.0 + 1.0
+    assert (variant["SIFT4G"], variant["FREQ"], variant["PHENO_HIT"]) == (0.01, "NOVEL", "")
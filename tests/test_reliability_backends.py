@@ -0,0 +1,107 @@
+import shutil
+
+import pytest
+from cyvcf2 import VCF
+
+from technical_reliability.variant_qc import filter_reliable_snvs, filter_reliable_snvs_bcftools
+
+HEADER = """\
+##fileformat=VCFv4.2
+##FILTER=<ID=PASS,Description="All filters passed">
+##FILTER=<ID=LowQ,Description="Low quality">
+##contig=<ID=I,length=230218>
+##INFO=<ID=MQ,Number=1,Type=Integer,Description="Mapping quality">
+##INFO=<ID=SAF,Number=A,Type=Integer,Description="Forward ALT reads">
+##INFO=<ID=SAR,Number=A,Type=Integer,Description="Reverse ALT reads">
+##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">
+##FORMAT=<ID=DP,Number=1,Type=Integer,Description="Read depth">
+##FORMAT=<ID=AD,Number=R,Type=Integer,Description="Allele depths">
+#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tS1
+"""
+
+# (POS, ALT, FILTER, INFO, DP, AD); the comment is the expected outcome.
+RECORDS = [
+    (100, "C", "PASS", "MQ=60;SAF=5;SAR=5", 30, "10,20"),  # kept
+    (200, "C", "PASS", "SAF=5;SAR=5", 30, "10,20"),  # kept: missing MQ passes
+    (300, "C", "PASS", "MQ=20;SAF=5;SAR=5", 30, "10,20"),  # low MQ
+    (400, "C", "LowQ", "MQ=60;SAF=5;SAR=5", 30, "10,20"),  # non-PASS FILTER
+    (500, "C", ".", "MQ=60;SAF=5;SAR=5", 30, "10,20"),  # kept: missing FILTER
+    (600, "C", "PASS", "MQ=60;SAF=0;SAR=7", 30, "10,20"),  # strand bias
+    (700, "C", "PASS", "MQ=60", 30, "10,20"),  # kept: no SAF/SAR
+    (800, "C", "PASS", "MQ=60;SAF=5;SAR=5", 5, "1,4"),  # low DP
+    (900, "C,G", "PASS", "MQ=60;SAF=0,3;SAR=4,0", 30, "10,15,5"),  # kept: no strand bias on multi-allelic
+    (1000, "C,G", "PASS", "MQ=60;SAF=2,3;SAR=4,2", 40, "30,2,8"),  # low AB of the first ALT
+    (1100, "C,G", "LowQ", "MQ=60;SAF=2,3;SAR=4,2", 30, "10,15,5"),  # non-PASS multi-allelic
+    (1200, "C,G", "PASS", "SAF=2,3;SAR=4,2", 30, "10,15,5"),  # kept: multi-allelic, missing MQ
+]
+EXPECTED = {100, 200, 500, 700, 900, 1200}
+
+
+@pytest.fixture
+def fixture_vcf(tmp_path):
+    path = tmp_path / "fixture.vcf"
+    with open(path, "w") as out:
+        out.write(HEADER)
+        for pos, alt, filt, info, dp, ad in RECORDS:
+            out.write(f"I\t{pos}\t.\tA\t{alt}\t50\t{filt}\t{info}\tGT:DP:AD\t0/1:{dp}:{ad}\n")
+    return path
+
+
+def _keys(variants):
+    return {(v.CHROM, v.POS, v.REF, ",".join(v.ALT)) for v in variants}
+
+
+def test_python_backend_expected_records(fixture_vcf):
+    kept = filter_reliable_snvs(VCF(str(fixture_vcf)))
+    assert {v.POS for v in kept} == EXPECTED
+
+
+@pytest.mark.skipif(shutil.which("bcftools") is None, reason="bcftools is not installed")
+@pytest.mark.parametrize("suffix", [".vcf", ".vcf.gz"])
+def test_bcftools_backend_matches_python(fixture_vcf, tmp_path, suffix):
+    python_keys = _keys(filter_reliable_snvs(VCF(str(fixture_vcf))))
+    output = filter_reliable_snvs_bcftools(fixture_vcf, tmp_path / f"compiled{suffix}", threads=1)
+    assert _keys(VCF(output)) == python_keys
+
+
+@pytest.mark.skipif(shutil.which("bcftools") is None, reason="bcftools is not installed")
+def test_bcftools_backend_extra_rules(fixture_vcf, tmp_path):
+    output = filter_reliable_snvs_bcftools(
+        fixture_vcf, tmp_path / "compiled.vcf", threads=1,
+        extra_rules=[lambda v: len(v.ALT) == 1],
+    )
+    assert {v.POS for v in VCF(output)} == EXPECTED - {900, 1200}
+
+
+@pytest.mark.skipif(shutil.which("bcftools") is None, reason="bcftools is not installed")
+def test_bcftools_stage_without_plots_reads_nothing_in_python(fixture_vcf, tmp_path, monkeypatch):
+    import technical_reliability.run as tech
+
+    def fail(path):
+        raise AssertionError(f"{path} was read in Python")
+
+    monkeypatch.setattr(tech, "load_variants", fail)
+    output = tech.run(str(fixture_vcf), str(tmp_path / "reliable.vcf"), backend="bcftools", plots="none",
+                      qc_dir=str(tmp_path / "qc"))
+    assert {v.POS for v in VCF(output)} == EXPECTED
+
+
+def test_bcftools_stage_rejects_workers(fixture_vcf, tmp_path):
+    import technical_reliability.run as tech
+
+    with pytest.raises(ValueError, match="n_workers"):
+        tech.run(str(fixture_vcf), str(tmp_path / "reliable.vcf"), n_workers=4, backend="bcftools")
+
+
+def test_deferred_plots_use_the_given_qc_dir(fixture_vcf, tmp_path, monkeypatch):
+    import technical_reliability.run as tech
+
+    monkeypatch.chdir(tmp_path)
+    qc_dir = tmp_path / "sample" / "qc"
+    tech.run(str(fixture_vcf), str(tmp_path / "reliable.vcf"), plots="deferred", qc_dir=str(qc_dir))
+    assert not (tmp_path / tech.QC_DIR).exists()
+
+    rendered = []
+    monkeypatch.setattr(tech, "render_saved", lambda directory, n_workers=None: rendered.append(directory) or [])
+    tech.render_plots(str(qc_dir))
+    assert rendered == list(tech.qc_dirs(str(qc_dir)))
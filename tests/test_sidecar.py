@@ -0,0 +1,76 @@
+import gzip
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from annotation_frequency.run import tag_vcf
+from sidecar import SidecarWriter, materialise, sidecar_dir
+
+HEADER = (
+    "##fileformat=VCFv4.2\n"
+    "##contig=<ID=I,length=10000>\n"
+    '##INFO=<ID=ANN,Number=.,Type=String,Description="Functional annotations">\n'
+    "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+)
+RECORDS = [
+    "I\t100\t.\tA\tC\t50\tPASS\tANN=C|missense_variant|MODERATE|YAL001C|YAL001C",
+    "I\t200\t.\tG\tT\t50\tPASS\t.",
+    "I\t300\t.\tT\tA\t50\tPASS\tANN=A|synonymous_variant|LOW|YAL002W|YAL002W",
+    "I\t400\t.\tC\tG\t50\tPASS\tDP=3;ANN=G|stop_gained|HIGH|YAL003W|YAL003W",
+]
+KNOWN = {"I:100:A:C", "I:400:C:G"}
+GENES = {"EFB1"}
+GENE_MAP = {"YAL003W": "EFB1"}
+
+
+def _query(tmp_path, records):
+    path = tmp_path / "query.vcf"
+    path.write_text(HEADER + "".join(record + "\n" for record in records))
+    return path
+
+
+def _read(path):
+    return gzip.decompress(path.read_bytes()) if path.suffix == ".gz" else path.read_bytes()
+
+
+@pytest.mark.parametrize("records", [RECORDS, []], ids=["records", "empty"])
+def test_sidecar_tags_match_two_pass(tmp_path, records):
+    two_pass = tmp_path / "two_pass"
+    one_pass = tmp_path / "one_pass"
+    two_pass.mkdir()
+    one_pass.mkdir()
+
+    expected = tag_vcf(_query(two_pass, records), KNOWN, GENES, GENE_MAP)
+    query = _query(one_pass, records)
+    written = tag_vcf(query, KNOWN, GENES, GENE_MAP, sidecar=sidecar_dir(query))
+
+    assert _read(written) == _read(expected)
+    for name in ("FREQ", "PHENO_HIT"):
+        assert pq.read_table(sidecar_dir(query) / f"{name}.parquet").num_rows == len(records)
+
+
+def _sidecar(tmp_path, vcf, rows):
+    directory = tmp_path / "sidecars"
+    with SidecarWriter(directory, "FREQ", vcf, {"FREQ": pa.binary()}) as sidecar:
+        sidecar.write({"FREQ": pa.array([b"SEEN"] * rows, pa.binary())})
+    return directory
+
+
+@pytest.mark.parametrize("rows", [len(RECORDS) - 1, len(RECORDS) + 1])
+def test_materialise_rejects_misaligned_sidecar(tmp_path, rows):
+    query = _query(tmp_path, RECORDS)
+    directory = _sidecar(tmp_path, query, rows)
+    output = tmp_path / "tagged.vcf.gz"
+    with pytest.raises(ValueError, match="rows"):
+        materialise(query, output, directory)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["query.vcf", "sidecars"]
+
+
+def test_materialise_rejects_sidecar_of_another_vcf(tmp_path):
+    other = _query(tmp_path, RECORDS[:2])
+    directory = _sidecar(tmp_path, other, 2)
+    query = tmp_path / "other_query.vcf"
+    query.write_text(HEADER + "".join(record + "\n" for record in RECORDS))
+    with pytest.raises(ValueError, match="not written for"):
+        materialise(query, tmp_path / "tagged.vcf.gz", directory)
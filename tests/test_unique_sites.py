@@ -0,0 +1,40 @@
+import pytest
+
+from unique_sites import write_unique_sites
+
+HEADER = (
+    "##fileformat=VCFv4.2\n"
+    "##contig=<ID=I,length=10000>\n"
+    "##contig=<ID=II,length=10000>\n"
+    "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+)
+
+
+def _vcf(path, sites):
+    path.write_text(HEADER + "".join(f"{chrom}\t{pos}\t.\t{ref}\t{alt}\t.\t.\t.\n" for chrom, pos, ref, alt in sites))
+    return path
+
+
+def _sites(path):
+    return [tuple(line.split("\t")[:5]) for line in path.read_text().splitlines() if not line.startswith("#")]
+
+
+@pytest.mark.parametrize("output", ["sites.vcf", "sites.vcf.gz"])
+def test_unique_sites_merges_and_deduplicates(tmp_path, output):
+    a = _vcf(tmp_path / "a.vcf", [("I", 100, "A", "T"), ("I", 100, "A", "C"), ("II", 5, "G", "A")])
+    b = _vcf(tmp_path / "b.vcf", [("I", 100, "A", "C"), ("I", 100, "A", "T"), ("I", 300, "C", "G")])
+    output = tmp_path / output
+    assert write_unique_sites([a, b], output) == (6, 4)
+    if output.suffix != ".gz":
+        sites = _sites(output)
+        assert sorted(sites[:2]) == [("I", "100", ".", "A", "C"), ("I", "100", ".", "A", "T")]
+        assert sites[2:] == [("I", "300", ".", "C", "G"), ("II", "5", ".", "G", "A")]
+
+
+@pytest.mark.parametrize("output", ["sites.vcf", "sites.vcf.gz"])
+def test_unique_sites_rejects_unsorted_input(tmp_path, output):
+    a = _vcf(tmp_path / "a.vcf", [("I", 100, "A", "T"), ("II", 5, "G", "A")])
+    b = _vcf(tmp_path / "b.vcf", [("II", 7, "C", "G"), ("I", 300, "C", "G")])
+    with pytest.raises(ValueError, match="not sorted"):
+        write_unique_sites([a, b], tmp_path / output)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["a.vcf", "b.vcf"]
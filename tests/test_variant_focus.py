@@ -0,0 +1,103 @@
+import random
+import shutil
+import subprocess
+
+import pytest
+
+from variant_focus.annotate import remove_vcf_fields
+from variant_focus.normalise import RefAlleleCheck, validate_ref_alleles
+from vcf_batch import VcfBatchReader
+
+pysam = pytest.importorskip("pysam")
+
+HEADER = [
+    "##fileformat=VCFv4.2",
+    "##contig=<ID=I,length=5000>",
+    '##INFO=<ID=DP,Number=1,Type=Integer,Description="Depth">',
+    '##INFO=<ID=OLD_VARIANT,Number=.,Type=String,Description="Before norm">',
+    '##INFO=<ID=F,Number=0,Type=Flag,Description="Flag">',
+    '##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">',
+    '##FORMAT=<ID=DP4,Number=4,Type=Integer,Description="Strand depths">',
+    '##FORMAT=<ID=PL,Number=G,Type=Integer,Description="Likelihoods">',
+    "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tS1\tS2",
+]
+VALUES = {"GT": "0/1", "DP4": "1,2,3,4", "PL": "0,3,9"}
+
+
+@pytest.fixture(scope="module")
+def reference(tmp_path_factory):
+    rng = random.Random(1)
+    sequence = "".join(rng.choice("ACGT") for _ in range(5000))
+    path = tmp_path_factory.mktemp("ref") / "ref.fa"
+    path.write_text(">I\n" + "\n".join(sequence[i:i + 60] for i in range(0, len(sequence), 60)) + "\n")
+    return path, sequence
+
+
+def _write_vcf(path, sequence, indels=True, wrong_refs=0, seed=2):
+    """Records with INFO/OLD_VARIANT and FORMAT/DP4 in varying places, truncated samples and `wrong_refs` bad REFs."""
+    rng = random.Random(seed)
+    lines = []
+    for i, pos in enumerate(sorted(rng.sample(range(10, 4900), 300))):
+        ref = sequence[pos - 1]
+        if i < wrong_refs:
+            ref = next(base for base in "ACGT" if base != ref)
+        alt = rng.choice([base for base in "ACGT" if base != ref])
+        if indels and rng.random() < 0.1:
+            alt = ref + "T"
+        info = rng.choice(["DP=5", "OLD_VARIANT=I:1:A/C;DP=3", "OLD_VARIANT=x", ".", "F;OLD_VARIANT=y;DP=1"])
+        fmt = rng.choice(["GT:DP4:PL", "GT:PL", "GT:PL:DP4"])
+        samples = []
+        for _ in range(2):
+            values = [VALUES[key] for key in fmt.split(":")]
+            if rng.random() < 0.2:
+                values = values[:rng.randrange(1, len(values))]
+            samples.append(":".join(values))
+        lines.append("\t".join(["I", str(pos), ".", ref, alt, "30", "PASS", info, fmt, *samples]))
+    plain = path.with_suffix("")
+    plain.write_text("\n".join(HEADER + lines) + "\n")
+    pysam.tabix_compress(str(plain), str(path), force=True)
+    return path
+
+
+def _records(path):
+    with pysam.VariantFile(str(path)) as vcf:
+        records = [
+            (r.pos, r.ref, r.alts, dict(r.info), list(r.format), [dict(s) for s in r.samples.values()])
+            for r in vcf
+        ]
+        return records, list(vcf.header.info), list(vcf.header.formats)
+
+
+@pytest.mark.skipif(shutil.which("bcftools") is None, reason="bcftools not installed")
+def test_remove_fields_matches_bcftools(tmp_path, reference):
+    vcf = _write_vcf(tmp_path / "in.vcf.gz", reference[1])
+    ours = remove_vcf_fields(vcf, "INFO/OLD_VARIANT,FORMAT/DP4", tmp_path / "ours.vcf.gz")
+    theirs = tmp_path / "bcftools.vcf"
+    subprocess.run(["bcftools", "annotate", "--remove", "INFO/OLD_VARIANT,FORMAT/DP4",
+                    "-Ov", "-o", str(theirs), str(vcf)], check=True)
+    assert _records(ours) == _records(theirs)
+
+
+def test_ref_check_runs_inline(tmp_path, reference):
+    fasta, sequence = reference
+    vcf = _write_vcf(tmp_path / "in.vcf.gz", sequence, wrong_refs=7)
+    with RefAlleleCheck(fasta) as check:
+        remove_vcf_fields(vcf, "INFO/OLD_VARIANT", tmp_path / "out.vcf.gz", on_batch=check)
+
+    with VcfBatchReader(vcf) as reader:
+        alts = [record.split(b"\t")[3:5] for batch in reader for record in batch.lines.to_pylist()]
+    assert check.records == 300
+    assert check.mismatches == 7
+    assert check.indels == sum(len(ref) != len(alt) for ref, alt in alts) > 0
+    assert check.needs_norm
+
+
+def test_validate_skips_norm_only_without_mismatches_and_indels(tmp_path, reference):
+    fasta, sequence = reference
+    clean = _write_vcf(tmp_path / "clean.vcf.gz", sequence, indels=False)
+    assert validate_ref_alleles(clean, fasta) == clean
+
+    with RefAlleleCheck(fasta) as check:
+        remove_vcf_fields(clean, "FORMAT/DP4", tmp_path / "tidy.vcf.gz", on_batch=check)
+    assert not check.needs_norm
+    assert validate_ref_alleles(tmp_path / "tidy.vcf.gz", fasta, check=check) == tmp_path / "tidy.vcf.gz"
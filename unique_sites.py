@@ -0,0 +1,186 @@
+import heapq
+from pathlib import Path
+
+from bgzf import read_index_names
+from vcf_io import INFO, VcfReader, VcfWriter, index_path
+
+SITES_HEADER = b"#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+
+
+def _contig_id(line):
+    """ID of a ##contig header line (bytes), or None for other lines."""
+    if not line.startswith(b"##contig=<"):
+        return None
+    for part in line[10:].rstrip(b">\r\n").split(b","):
+        if part.startswith(b"ID="):
+            return part[3:]
+    return None
+
+
+def _sites_header(headers):
+    """
+    Meta lines of the first header (without FORMAT and INFO definitions),
+    plus any ##contig lines only the other headers have, and an 8-column
+    #CHROM line.
+    """
+    lines = [
+        line for line in headers[0]
+        if line.startswith(b"##") and not line.startswith((b"##FORMAT=", b"##INFO="))
+    ]
+    contigs = {_contig_id(line) for line in lines} - {None}
+    for header in headers[1:]:
+        for line in header:
+            contig = _contig_id(line)
+            if contig is not None and contig not in contigs:
+                contigs.add(contig)
+                lines.append(line)
+    return lines + [SITES_HEADER]
+
+
+def _keyed_sites(reader, ranks):
+    for record in reader:
+        chrom, pos, ref, alt = record.site()
+        rank = ranks.setdefault(chrom, len(ranks))
+        yield rank, int(pos), ref, alt, chrom, pos
+
+
+def write_unique_sites(vcfs, output, index="tbi"):
+    """
+    Write the union of the sites (CHROM, POS, REF, ALT) of sorted VCFs as
+    one sorted, indexed sites-only VCF, so site-level annotation runs once
+    per distinct site rather than once per sample.
+
+    The inputs are merged as streams; only one record per input is held at
+    a time. They must all be sorted in the same contig order (that of their
+    ##contig lines, then order of appearance); otherwise ValueError is
+    raised at the first site out of order and no output is left.
+
+    Returns:
+        Tuple[int, int]: (records read, unique sites written).
+    """
+    readers = [VcfReader(vcf) for vcf in vcfs]
+    try:
+        ranks = {}
+        for reader in readers:
+            for line in reader.header:
+                contig = _contig_id(line)
+                if contig is not None:
+                    ranks.setdefault(contig, len(ranks))
+
+        records = unique = 0
+        last = None  # (contig rank, position) of the previous record
+        seen = set()  # (REF, ALT) already written at `last`
+        with VcfWriter(output, index=index) as writer:
+            writer.write_header(_sites_header([reader.header for reader in readers]))
+            for rank, pos, ref, alt, chrom, raw_pos in heapq.merge(
+                *(_keyed_sites(reader, ranks) for reader in readers)
+            ):
+                records += 1
+                if (rank, pos) != last:
+                    if last is not None and (rank, pos) < last:
+                        raise ValueError(
+                            f"Sample VCFs are not sorted in the same contig order: {list(map(str, vcfs))} "
+                            f"({chrom.decode()}:{raw_pos.decode()} is out of order)"
+                        )
+                    last = (rank, pos)
+                    seen.clear()
+                if (ref, alt) in seen:
+                    continue
+                seen.add((ref, alt))
+                unique += 1
+                writer.write_line(b"\t".join((chrom, raw_pos, b".", ref, alt, b".", b".", b".")) + b"\n")
+    except ValueError:
+        for path in (output, index_path(output, "tbi"), index_path(output, "csi")):
+            Path(path).unlink(missing_ok=True)
+        raise
+    finally:
+        for reader in readers:
+            reader.close()
+
+    print(f"[sites] {records} records across {len(vcfs)} VCFs -> {unique} unique sites")
+    return records, unique
+
+
+def _info_keys(info):
+    return {entry.split(b"=", 1)[0] for entry in info.split(b";")} if info not in (b".", b"") else set()
+
+
+def _new_header_lines(header, site_header):
+    """Meta lines of `site_header` that `header` lacks (##INFO by ID, the rest verbatim)."""
+    present = set(header)
+    info_ids = {line.split(b",", 1)[0] for line in header if line.startswith(b"##INFO=")}
+    extra = []
+    for line in site_header:
+        if not line.startswith(b"##") or line in present or _contig_id(line) is not None:
+            continue
+        if line.startswith(b"##INFO=") and line.split(b",", 1)[0] in info_ids:
+            continue
+        extra.append(line)
+    return extra
+
+
+def join_site_info(vcf, sites_vcf, output, contigs, keep_unmatched=True):
+    """
+    Copy the INFO entries of annotated sites onto the matching records of a
+    sample VCF, by a merge join of the two sorted streams.
+
+    Site INFO entries whose key the record already has are left out, so
+    the record keeps its own values. ##INFO and other meta lines the
+    sample header lacks are taken from the sites header.
+
+    Args:
+        vcf (str): Sample VCF, sorted.
+        sites_vcf (str): Sites VCF in the same order (e.g. annotated from
+            `write_unique_sites` output); may hold only a subset of the sites.
+        output (str): Output VCF ('.gz' is compressed and indexed).
+        contigs (List[str]): Contig order of both files, e.g.
+            `read_index_names` of the unique-sites index.
+        keep_unmatched (bool): Write records without a matching site
+            unchanged; otherwise drop them (as the stage that produced
+            `sites_vcf` would have).
+
+    Returns:
+        Tuple[int, int]: (records written, records annotated).
+    """
+    ranks = {contig.encode(): i for i, contig in enumerate(contigs)}
+    written = matched = 0
+    with VcfReader(vcf) as reader, VcfReader(sites_vcf) as sites, VcfWriter(output) as writer:
+        writer.write_header(reader.header, extra_lines=_new_header_lines(reader.header, sites.header))
+        site_iter = iter(sites)
+        site = site_key = None
+
+        def advance():
+            record = next(site_iter, None)
+            if record is None:
+                return None, None
+            chrom, pos, ref, alt = record.site()
+            return record, (ranks.get(chrom, len(ranks)), int(pos), ref, alt)
+
+        site, site_key = advance()
+        for record in reader:
+            chrom, pos, ref, alt = record.site()
+            key = (ranks[chrom], int(pos), ref, alt) if chrom in ranks else None
+            while key is not None and site is not None and site_key < key:
+                site, site_key = advance()
+
+            if key is not None and site_key == key:
+                have = _info_keys(record.info)
+                entries = [
+                    entry for entry in site.column(INFO).split(b";")
+                    if entry not in (b".", b"") and entry.split(b"=", 1)[0] not in have
+                ]
+                line = record.with_info(b";".join(entries)) if entries else record.line
+                matched += 1
+            elif keep_unmatched:
+                line = record.line
+            else:
+                continue
+            writer.write_line(line if line.endswith(b"\n") else line + b"\n")
+            written += 1
+    return written, matched
+
+
+def join_sites(vcf, sites_vcf, output, unique_sites, keep_unmatched=True):
+    """`join_site_info` in the contig order of the `unique_sites` VCF's index."""
+    return join_site_info(vcf, sites_vcf, output, read_index_names(index_path(unique_sites)),
+                          keep_unmatched=keep_unmatched)
@@ -1,4 +1,4 @@
-import subprocess
+from profiling import run_command
 from pathlib import Path
 
 def decompress_gzip(filepath: Path) -> Path:
@@ -15,6 +15,6 @@ def decompress_gzip(filepath: Path) -> Path:
         return decompressed_path
 
     print(f"Decompressing: {filepath}")
-    subprocess.run(["gunzip", str(filepath)], check=True)
+    run_command(["gunzip", str(filepath)], check=True)
 
     return decompressed_path
@@ -1,16 +1,27 @@
-import subprocess
 from pathlib import Path
 
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from vcf_batch import VcfBatchReader, write_batch
+from vcf_io import FORMAT, INFO, VcfWriter
+
+
 def remove_vcf_fields(
-    vcf_in: Path, fields_to_remove: str, vcf_out: Path = None
+    vcf_in: Path, fields_to_remove: str, vcf_out: Path = None, on_batch=None
 ) -> Path:
     """
-    Remove unwanted INFO/FORMAT fields from a VCF using bcftools annotate.
+    Remove unwanted INFO/FORMAT fields from a VCF, a batch of records at a
+    time (as `bcftools annotate --remove`, for INFO/KEY and FORMAT/KEY).
 
     Parameters:
-        vcf_in (Path): Input VCF file (.vcf.gz)
+        vcf_in (Path): Input VCF file (.vcf or .vcf.gz)
         fields_to_remove (str): Comma-separated list of fields to remove (e.g. "INFO/OLD_VARIANT,FORMAT/DP4")
         vcf_out (Path, optional): Output path. If None, auto-generates based on input name.
+        on_batch (callable, optional): Called with every `vcf_batch.VcfBatch`
+            of the input, so a check (e.g. `normalise.RefAlleleCheck`) can
+            run in the same pass.
 
     Returns:
         Path: Path to the tidied VCF (.vcf.gz)
@@ -19,18 +30,86 @@ def remove_vcf_fields(
         base = vcf_in.name.replace(".vcf.gz", "").replace(".vcf", "")
         vcf_out = vcf_in.parent / f"{base}_tidy.vcf.gz"
 
-    subprocess.run(
-        [
-            "bcftools",
-            "annotate",
-            "--remove",
-            fields_to_remove,
-            "-Oz",
-            "-o",
-            str(vcf_out),
-            str(vcf_in),
-        ],
-        check=True,
+    remove = {"INFO": set(), "FORMAT": set()}
+    for field in fields_to_remove.split(","):
+        kind, _, key = field.strip().partition("/")
+        if kind not in remove or not key:
+            raise ValueError(f"Expected INFO/KEY or FORMAT/KEY, got {field!r}")
+        remove[kind].add(key.encode())
+    drop_info = pa.array(sorted(remove["INFO"]), pa.binary())
+    drop_format = pa.array(sorted(remove["FORMAT"]), pa.binary())
+    definitions = tuple(
+        f"##{kind}=<ID={key.decode()},".encode() for kind, keys in remove.items() for key in keys
     )
 
-    return vcf_out
\ No newline at end of file
+    with VcfBatchReader(vcf_in) as reader, VcfWriter(vcf_out) as writer:
+        writer.write_header([line for line in reader.header if not line.startswith(definitions)])
+        for batch in reader:
+            if on_batch is not None:
+                on_batch(batch)
+            write_batch(writer, batch, _without_fields(batch, drop_info, drop_format))
+
+    return vcf_out
+
+
+def _without_fields(batch, drop_info, drop_format):
+    """The lines of `batch`, newline-terminated, without the given INFO and FORMAT keys."""
+    entries = pc.split_pattern(batch.column(INFO), b";")
+    keys = pc.list_element(pc.split_pattern(entries.flatten(), b"=", max_splits=1), 0)
+    info = pc.binary_join(_keep_items(entries, ~_is_in(keys, drop_info)), b";")
+    columns = [batch.column(i) for i in range(INFO)] + [_missing_if_empty(info)]
+
+    n_fields = pc.list_value_length(batch.fields).to_numpy(zero_copy_only=False)
+    if len(batch) and n_fields.min() > FORMAT:
+        # `fields` stops splitting at FORMAT: the last item holds it and the samples.
+        rest = pc.split_pattern(pc.list_element(batch.fields, FORMAT), b"\t")
+        keys = pc.split_pattern(pc.list_element(rest, 0), b":")
+        dropped = _is_in(keys.flatten(), drop_format)
+        columns.append(_missing_if_empty(pc.binary_join(_keep_items(keys, ~dropped), b":")))
+
+        samples = pc.list_slice(rest, 1)
+        values = pc.split_pattern(samples.flatten(), b":")
+        # (record, position) of every sample value, to match against the dropped keys.
+        width = int(pc.max(pc.list_value_length(keys)).as_py() or 1) + 1
+        sample_record = pc.list_parent_indices(samples).to_numpy()
+        value_record = sample_record[pc.list_parent_indices(values).to_numpy()]
+        key_codes = pc.list_parent_indices(keys).to_numpy() * width + _positions(keys)
+        value_codes = value_record * width + _positions(values)
+        keep = ~np.isin(value_codes, key_codes[dropped])
+        samples = pa.ListArray.from_arrays(
+            _offsets(samples), _missing_if_empty(pc.binary_join(_keep_items(values, keep), b":"))
+        )
+        columns.append(pc.binary_join(samples, b"\t"))
+    elif len(batch) and n_fields.max() > FORMAT:
+        raise ValueError("Records with and without FORMAT columns in one VCF")
+
+    return pc.binary_join_element_wise(pc.binary_join_element_wise(*columns, b"\t"), b"", b"\n")
+
+
+def _missing_if_empty(values):
+    return pc.if_else(pc.equal(pc.binary_length(values), 0), pa.scalar(b"."), values)
+
+
+def _is_in(values, value_set):
+    return pc.fill_null(pc.is_in(values, value_set=value_set), False).to_numpy(zero_copy_only=False)
+
+
+def _offsets(lists):
+    """Offsets of a list array's values, starting at 0."""
+    lengths = pc.list_value_length(lists).to_numpy(zero_copy_only=False)
+    return pa.array(np.concatenate([[0], np.cumsum(lengths)]).astype(np.int32))
+
+
+def _positions(lists):
+    """Position of every flattened value within its list."""
+    lengths = pc.list_value_length(lists).to_numpy(zero_copy_only=False)
+    starts = np.cumsum(lengths) - lengths
+    return np.arange(lengths.sum()) - np.repeat(starts, lengths)
+
+
+def _keep_items(lists, keep):
+    """`lists` with only the flattened values where `keep` is true."""
+    parents = pc.list_parent_indices(lists).to_numpy()
+    counts = np.bincount(parents[keep], minlength=len(lists))
+    offsets = pa.array(np.concatenate([[0], np.cumsum(counts)]).astype(np.int32))
+    return pa.ListArray.from_arrays(offsets, lists.flatten().filter(pa.array(keep)))
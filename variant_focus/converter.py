@@ -1,4 +1,5 @@
 import subprocess
+from profiling import popen, run_command, wait_process
 from pathlib import Path
 
 
@@ -28,16 +29,20 @@ def gtf_to_bed(
     awk_cmd = f"""awk '$3 == "{feature_type}" {{ print $1 "\\t" $4-1 "\\t" $5 }}'"""
 
     with bed_output.open("w") as out:
-        gffread = subprocess.Popen(
+        gffread = popen(
             ["gffread", str(gtf_path), "-T", "-o-"], stdout=subprocess.PIPE
         )
-        awk = subprocess.Popen(
+        awk = popen(
             ["bash", "-c", awk_cmd], stdin=gffread.stdout, stdout=subprocess.PIPE
         )
-        sort = subprocess.Popen(
+        sort = popen(
             ["sort", "-k1,1", "-k2,2n"], stdin=awk.stdout, stdout=out
         )
-        sort.communicate()
+        # The children hold the pipe ends now; close ours so EOF propagates.
+        gffread.stdout.close()
+        awk.stdout.close()
+        for proc in (gffread, awk, sort):
+            wait_process(proc)
 
     return bed_output
 
@@ -65,7 +70,7 @@ def filter_bed_to_vcf(vcf_input: Path, bed_file: Path, vcf_output: Path = None)
     vcf_output.parent.mkdir(parents=True, exist_ok=True)
 
     # Run bcftools filtering
-    subprocess.run(
+    run_command(
         [
             "bcftools",
             "view",
@@ -80,6 +85,6 @@ def filter_bed_to_vcf(vcf_input: Path, bed_file: Path, vcf_output: Path = None)
     )
 
     # Index the output VCF
-    subprocess.run(["tabix", "-p", "vcf", str(vcf_output)], check=True)
+    run_command(["tabix", "-p", "vcf", str(vcf_output)], check=True)
 
     return vcf_output
@@ -1,4 +1,4 @@
-import subprocess
+from profiling import run_command
 from pathlib import Path
 
 def index_vcf(vcf_file: Path) -> Path:
@@ -11,5 +11,5 @@ def index_vcf(vcf_file: Path) -> Path:
     Returns:
         Path: Path to the created index file (.tbi)
     """
-    subprocess.run(["tabix", "-p", "vcf", str(vcf_file)], check=True)
+    run_command(["tabix", "-p", "vcf", str(vcf_file)], check=True)
     return vcf_file.with_suffix(vcf_file.suffix + ".tbi")
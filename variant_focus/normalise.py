@@ -1,23 +1,103 @@
-import subprocess
+from profiling import run_command
 from pathlib import Path
 
-def validate_ref_alleles(vcf_in: Path, fasta_ref: Path, vcf_out: Path = None) -> Path:
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from reference import ReferenceStore
+from vcf_batch import VcfBatchReader
+from vcf_io import ALT, REF
+
+
+class RefAlleleCheck:
+    """
+    Count the records whose REF differs from the reference and the indel
+    records, batch by batch, so the check can run inside a stage that
+    already streams the VCF (see `annotate.remove_vcf_fields`).
+
+    Example:
+        with RefAlleleCheck(fasta_ref) as check:
+            remove_vcf_fields(vcf, fields, on_batch=check)
+        validate_ref_alleles(vcf, fasta_ref, check=check)
+    """
+
+    def __init__(self, fasta_ref):
+        self.fasta_ref = fasta_ref
+        self.records = 0
+        self.mismatches = 0
+        self.indels = 0
+        self._reference = ReferenceStore(fasta_ref)
+
+    def __call__(self, batch):
+        self.records += len(batch)
+        self.mismatches += int(len(batch) - self._reference.check_batch(batch).sum())
+        self.indels += int(_indels(batch).sum())
+
+    @property
+    def needs_norm(self):
+        return bool(self.mismatches or self.indels)
+
+    def close(self):
+        if self._reference is not None:
+            self._reference.close()
+            self._reference = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _indels(batch):
+    """True for records with an ALT allele (not symbolic, * or .) of another length than REF."""
+    alts = pc.split_pattern(batch.column(ALT), b",")
+    alleles = alts.flatten()
+    records = pc.list_parent_indices(alts).to_numpy()
+    ref_lengths = pc.binary_length(batch.column(REF)).to_numpy(zero_copy_only=False)
+    symbolic = pc.or_(pc.starts_with(alleles, "<"), pc.is_in(alleles, value_set=pa.array([b"*", b"."])))
+    differs = pc.binary_length(alleles).to_numpy(zero_copy_only=False) != ref_lengths[records]
+    differs &= ~symbolic.to_numpy(zero_copy_only=False)
+    return np.bincount(records[differs], minlength=len(batch)) > 0
+
+
+def validate_ref_alleles(vcf_in: Path, fasta_ref: Path, vcf_out: Path = None, check=None) -> Path:
     """
-    Validate that REF alleles in a VCF match the reference genome.
+    Validate that REF alleles in a VCF match the reference genome, and
+    left-align and normalise its indels.
+
+    The REF alleles are checked in-process against the memory-mapped
+    reference (see `reference.ReferenceStore`). `bcftools norm -c s` only
+    writes a fixed copy if some differ or the VCF has indels, which it
+    left-aligns; otherwise there is nothing for it to change.
 
     Parameters:
         vcf_in (Path): Input VCF file (.vcf or .vcf.gz)
         fasta_ref (Path): Reference genome FASTA file
         vcf_out (Path, optional): Output VCF path. If None, auto-generates based on input name.
+        check (RefAlleleCheck, optional): The counts of a check that already
+            ran over `vcf_in` while another stage streamed it; without one,
+            `vcf_in` is read once to count.
 
     Returns:
-        Path: Path to the validated VCF (.vcf.gz)
+        Path: Path to the validated VCF (.vcf.gz); `vcf_in` itself if all
+            REF alleles already match and there are no indels.
     """
+    if check is None:
+        with RefAlleleCheck(fasta_ref) as check, VcfBatchReader(vcf_in) as reader:
+            for batch in reader:
+                check(batch)
+    if not check.needs_norm:
+        return Path(vcf_in)
+    print(f"{vcf_in}: {check.mismatches} REF alleles differ from {fasta_ref} and "
+          f"{check.indels} records are indels; normalising with bcftools norm")
+
     if vcf_out is None:
         base = vcf_in.name.replace(".vcf.gz", "").replace(".vcf", "")
         vcf_out = vcf_in.parent / f"{base}_validated.vcf.gz"
 
-    subprocess.run([
+    run_command([
         "bcftools", "norm",
         "-f", str(fasta_ref),
         "-c", "s",
@@ -1,4 +1,4 @@
-import subprocess
+from profiling import run_command
 from pathlib import Path
 
 def sort_vcf(vcf_in: Path, vcf_out: Path = None) -> Path:
@@ -16,7 +16,7 @@ def sort_vcf(vcf_in: Path, vcf_out: Path = None) -> Path:
         base = vcf_in.name.replace(".vcf.gz", "").replace(".vcf", "")
         vcf_out = vcf_in.parent / f"{base}_sorted.vcf.gz"
 
-    subprocess.run([
+    run_command([
         "bcftools", "sort",
         "-Oz",
         "-o", str(vcf_out),
@@ -0,0 +1,172 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from vcf_io import ALT, CHROM, FORMAT, INFO, POS, REF, find_info, open_binary
+
+NEWLINE = ord("\n")
+
+
+class VcfBatch:
+    """
+    Up to `batch_size` VCF body lines as an Arrow binary array, split once
+    (up to INFO, as `vcf_io.VcfRecord`) into Arrow columns.
+    """
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.fields = pc.split_pattern(lines, pattern=b"\t", max_splits=FORMAT)
+        self._columns = {}
+
+    def __len__(self):
+        return len(self.lines)
+
+    def column(self, index):
+        """Column `index` (0 = CHROM ... 7 = INFO) as a binary array."""
+        if index not in self._columns:
+            self._columns[index] = pc.list_element(self.fields, index)
+        return self._columns[index]
+
+    def site_keys(self, sep=b":"):
+        """'chrom:pos:ref:alt' keys of every record (binary array)."""
+        return pc.binary_join_element_wise(
+            self.column(CHROM), self.column(POS), self.column(REF), self.column(ALT), sep
+        )
+
+    def info_values(self, key):
+        """
+        Value of INFO `key` for every record (binary array, null where the
+        key is absent or a flag).
+        """
+        pattern = f"(?:^|;){key}=(?P<value>[^;]*)"
+        return pc.struct_field(pc.extract_regex(self.column(INFO), pattern), [0])
+
+    def with_info(self, tags):
+        """
+        Return the lines, newline-terminated, with `tags` (a binary array or
+        scalar) appended to INFO; "." and empty INFO are replaced.
+        """
+        info = self.column(INFO)
+        info = pc.if_else(
+            pc.is_in(info, value_set=pa.array([b".", b""])),
+            tags,
+            pc.binary_join_element_wise(info, tags, b";"),
+        )
+        head = pc.binary_join_element_wise(
+            *(self.column(i) for i in range(INFO)), info, b"\t"
+        )
+        rest = pc.binary_join(pc.list_slice(self.fields, FORMAT), b"\t")
+        lines = pc.if_else(
+            pc.greater(pc.list_value_length(self.fields), FORMAT),
+            pc.binary_join_element_wise(head, rest, b"\t"),
+            head,
+        )
+        return pc.binary_join_element_wise(lines, b"", b"\n")
+
+    def spans(self):
+        """
+        Return (runs, begs, ends) for `vcf_io.VcfWriter.write_lines`: the
+        runs of consecutive records on one contig and the 0-based half-open
+        span of every record (to INFO/END for symbolic alleles).
+        """
+        chrom = self.column(CHROM)
+        begs = pc.subtract(pc.cast(self.column(POS), pa.int64()), 1).to_numpy()
+        ends = begs + pc.binary_length(self.column(REF)).to_numpy()
+        symbolic = pc.starts_with(self.column(ALT), "<")
+        for row in np.flatnonzero(symbolic.to_numpy(zero_copy_only=False)):
+            value = find_info(self.column(INFO)[row].as_py(), b"END")
+            if value:
+                ends[row] = max(ends[row], int(value))
+
+        breaks = np.flatnonzero(pc.not_equal(chrom[1:], chrom[:-1]).to_numpy(zero_copy_only=False)) + 1
+        bounds = [0, *breaks.tolist(), len(chrom)]
+        runs = [(chrom[a].as_py(), a, b) for a, b in zip(bounds, bounds[1:])]
+        return runs, begs, ends
+
+
+def write_batch(writer, batch, lines):
+    """
+    Write `lines` (newline-terminated, one per record of `batch`, e.g. from
+    `VcfBatch.with_info`) to a `vcf_io.VcfWriter` in one call.
+    """
+    lines = lines.combine_chunks() if isinstance(lines, pa.ChunkedArray) else lines
+    offsets = np.frombuffer(lines.buffers()[1], dtype=np.int32)[lines.offset:lines.offset + len(lines) + 1]
+    data = memoryview(lines.buffers()[2])[offsets[0]:offsets[-1]]
+    writer.write_lines(data, offsets.astype(np.int64) - offsets[0], *batch.spans())
+
+
+class VcfBatchReader:
+    """
+    Stream a VCF as `VcfBatch`es of at most `batch_size` records.
+
+    The input is read in buffers of `chunk_bytes` and cut into lines with
+    NumPy; no Python object is created per record. The header is kept in
+    `header` as in `vcf_io.VcfReader`.
+
+    Example:
+        with VcfBatchReader(path) as reader:
+            for batch in reader:
+                ...
+    """
+
+    def __init__(self, path, batch_size=65536, chunk_bytes=8 << 20, threads=2):
+        self.path = str(path)
+        self.batch_size = batch_size
+        self.chunk_bytes = chunk_bytes
+        self._file = open_binary(self.path, threads=threads)
+        self.header = []
+        self._carry = b""
+        for line in self._file:
+            if line.startswith(b"#"):
+                self.header.append(line)
+            else:
+                self._carry = line
+                break
+
+    def __iter__(self):
+        while True:
+            chunk = self._file.read(self.chunk_bytes)
+            data = self._carry + chunk
+            if not chunk:
+                if data and not data.endswith(b"\n"):
+                    data += b"\n"
+                self._carry = b""
+            else:
+                cut = data.rfind(b"\n") + 1
+                data, self._carry = data[:cut], data[cut:]
+            yield from self._batches(data)
+            if not chunk:
+                return
+
+    def _batches(self, data):
+        if not data:
+            return
+        ends = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == NEWLINE)
+        offsets = np.empty(len(ends) + 1, dtype=np.int32)
+        offsets[0] = 0
+        offsets[1:] = ends + 1
+        buffer = pa.py_buffer(data)
+        for first in range(0, len(ends), self.batch_size):
+            last = min(first + self.batch_size, len(ends))
+            lines = pa.Array.from_buffers(
+                pa.binary(), last - first, [None, pa.py_buffer(offsets[first:last + 1]), buffer]
+            )
+            # Drop the newlines (and any '\r') and blank lines.
+            lines = pc.binary_slice(lines, 0, -1)
+            carriage = pc.equal(pc.binary_slice(lines, -1), b"\r")
+            if pc.any(carriage).as_py():
+                lines = pc.if_else(carriage, pc.binary_slice(lines, 0, -1), lines)
+            if not pc.all(pc.greater(pc.binary_length(lines), 0)).as_py():
+                lines = lines.filter(pc.greater(pc.binary_length(lines), 0))
+                if not len(lines):
+                    continue
+            yield VcfBatch(lines)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,453 @@
+import gzip
+import io
+import os
+import shutil
+from pathlib import Path
+
+from bgzf import (
+    BLOCK_DATA_SIZE, EOF_BLOCK, BgzfReader, BgzfWriter, IndexBuilder, compress_block, decompress_block,
+    is_bgzf, iter_block_offsets, remap_index,
+)
+
+CHROM, POS, ID, REF, ALT, QUAL, FILTER, INFO, FORMAT = range(9)
+
+
+def open_binary(path, threads=2):
+    """
+    Open a VCF for reading as bytes. BGZF input is decompressed ahead of
+    the reader on `threads` threads; plain gzip (detected from the magic
+    bytes) falls back to `gzip.open`.
+    """
+    path = str(path)
+    if is_bgzf(path):
+        return io.BufferedReader(BgzfReader(path, threads=threads), buffer_size=1 << 20)
+    with open(path, "rb") as f:
+        gzipped = f.read(2) == b"\x1f\x8b"
+    return gzip.open(path, "rb") if gzipped else open(path, "rb")
+
+
+def find_info(info, key):
+    """
+    Return the value of INFO `key` (bytes) without splitting the whole INFO
+    column: b"" for a flag, None if absent.
+    """
+    token = key + b"="
+    start = 0
+    while True:
+        i = info.find(key, start)
+        if i < 0:
+            return None
+        end = i + len(key)
+        if i == 0 or info[i - 1] == 0x3B:  # ';'
+            if info.startswith(token, i):
+                stop = info.find(b";", end)
+                return info[end + 1:] if stop < 0 else info[end + 1:stop]
+            if end == len(info) or info[end] == 0x3B:
+                return b""
+        start = end
+
+
+class VcfRecord:
+    """
+    One VCF body line, kept as the original bytes.
+
+    The line is split once, on first access, and only up to INFO; FORMAT
+    and the sample columns stay joined. INFO keys are looked up with
+    `info_value` without splitting INFO. Untouched records are written back
+    out as the original line.
+    """
+
+    __slots__ = ("line", "_fields")
+
+    def __init__(self, line):
+        self.line = line
+        self._fields = None
+
+    def _split(self):
+        fields = self.line.split(b"\t", FORMAT)
+        fields[-1] = fields[-1].rstrip(b"\r\n")
+        self._fields = fields
+        return fields
+
+    def column(self, index):
+        """Return column `index` (0 = CHROM ... 7 = INFO) as bytes."""
+        return (self._fields or self._split())[index]
+
+    @property
+    def chrom(self):
+        return (self._fields or self._split())[CHROM]
+
+    @property
+    def pos(self):
+        return (self._fields or self._split())[POS]
+
+    @property
+    def ref(self):
+        return (self._fields or self._split())[REF]
+
+    @property
+    def alt(self):
+        return (self._fields or self._split())[ALT]
+
+    @property
+    def info(self):
+        return (self._fields or self._split())[INFO]
+
+    def site(self):
+        """(chrom, pos, ref, alt) as bytes."""
+        fields = self._fields or self._split()
+        return fields[CHROM], fields[POS], fields[REF], fields[ALT]
+
+    def info_value(self, key):
+        """Value of INFO `key` (bytes), b"" for a flag, None if absent."""
+        return find_info((self._fields or self._split())[INFO], key)
+
+    def with_info(self, tag):
+        """
+        Return the line with `tag` (e.g. b"FREQ=SEEN") appended to INFO.
+        Only the INFO column is rebuilt; the rest of the line is sliced.
+        """
+        line = self.line
+        fields = self._fields or self._split()
+        start = sum(map(len, fields[:INFO])) + INFO
+        end = start + len(fields[INFO])
+        if fields[INFO] in (b".", b""):
+            return line[:start] + tag + line[end:]
+        return line[:end] + b";" + tag + line[end:]
+
+    def replace_info(self, info):
+        """Return the line with INFO replaced by `info` (b"." if empty)."""
+        fields = self._fields or self._split()
+        start = sum(map(len, fields[:INFO])) + INFO
+        return self.line[:start] + (info or b".") + self.line[start + len(fields[INFO]):]
+
+
+class VcfReader:
+    """
+    Stream a plain, gzipped or BGZF VCF as `VcfRecord`s; BGZF blocks are
+    decompressed on `threads` background threads (see `open_binary`).
+
+    The meta-information and #CHROM lines are read on open and kept in
+    `header` (bytes, with newlines).
+
+    Example:
+        with VcfReader(path) as reader:
+            for record in reader:
+                ...
+    """
+
+    def __init__(self, path, threads=2):
+        self.path = str(path)
+        self._file = open_binary(self.path, threads=threads)
+        self.header = []
+        self._first = None
+        for line in self._file:
+            if line.startswith(b"#"):
+                self.header.append(line)
+            else:
+                self._first = line
+                break
+
+    def __iter__(self):
+        if self._first is not None:
+            line, self._first = self._first, None
+            if line.strip():
+                yield VcfRecord(line)
+        for line in self._file:
+            if line.strip():
+                yield VcfRecord(line)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def record_span(line):
+    """
+    Return (chrom, beg, end) for a VCF body line (bytes): the 0-based
+    half-open interval it covers, as tabix computes it (POS to POS + len(REF),
+    or to INFO/END for symbolic alleles).
+    """
+    return _span(line.split(b"\t", INFO + 1))
+
+
+def _span(fields):
+    beg = int(fields[POS]) - 1
+    end = beg + len(fields[REF])
+    if fields[ALT].startswith(b"<"):
+        value = find_info(fields[INFO].rstrip(b"\r\n"), b"END")
+        if value:
+            end = max(end, int(value))
+    return fields[CHROM], beg, end
+
+
+def index_path(path, index="tbi"):
+    """Path of the .tbi or .csi index next to `path`."""
+    return f"{path}.{index}"
+
+
+def index_vcf(path, index="tbi"):
+    """
+    Build a tabix (.tbi) or CSI index for an existing BGZF-compressed VCF
+    by walking its blocks, in place of `tabix -p vcf`.
+
+    Returns:
+        str: Path of the index, or None if the VCF is not sorted.
+    """
+    path = str(path)
+    builder = IndexBuilder(index)
+    carry = b""
+    carry_start = 0
+    with open(path, "rb") as f:
+        for offset, size in iter_block_offsets(path):
+            f.seek(offset)
+            data = decompress_block(f.read(size))
+            start = 0
+            while True:
+                newline = data.find(b"\n", start)
+                if newline < 0:
+                    if start < len(data):
+                        if not carry:
+                            carry_start = offset << 16 | start
+                        carry += data[start:]
+                    break
+                if carry:
+                    line, line_start, carry = carry + data[start:newline + 1], carry_start, b""
+                else:
+                    line, line_start = data[start:newline + 1], offset << 16 | start
+                start = newline + 1
+                if line.startswith(b"#") or not line.strip():
+                    continue
+                # A record ending its block ends where the next block starts,
+                # as BgzfWriter positions do.
+                stop = offset << 16 | start if start < len(data) else (offset + size) << 16
+                builder.add(*record_span(line), line_start, stop)
+    if not builder.sorted:
+        print(f"Warning: {path} is not sorted; no index written.")
+        return None
+    return builder.write(index_path(path, index))
+
+
+def compress_vcf(vcf_path, gz_path, index="tbi"):
+    """
+    BGZF-compress a VCF and index it in one pass, in place of
+    `bgzip -c` followed by `tabix -p vcf`.
+    """
+    with VcfReader(vcf_path) as reader, VcfWriter(gz_path, index=index) as writer:
+        writer.write_header(reader.header)
+        for record in reader:
+            writer.write(record)
+    return gz_path
+
+
+def _header_end(data):
+    """Offset of the first body line in `data`, or None if the header may go on."""
+    pos = 0
+    while pos < len(data):
+        if data[pos] != 0x23:  # '#'
+            return pos
+        newline = data.find(b"\n", pos)
+        if newline < 0:
+            return None
+        pos = newline + 1
+    return None
+
+
+def rewrite_vcf_header(path, edit, output=None):
+    """
+    Replace the header of a VCF with `edit(header_lines)` (lists of bytes,
+    newline-terminated, the #CHROM line included).
+
+    For BGZF files only the blocks holding the header are decompressed and
+    recompressed; every later block is copied byte for byte and the .tbi
+    or .csi index is rewritten with its offsets shifted, so the cost does
+    not depend on the size of the body. Other files are streamed.
+
+    Args:
+        path (str): The VCF.
+        edit (callable): Takes and returns the list of header lines.
+        output (str): Where to write (default: replace `path`).
+
+    Returns:
+        str: The path written.
+    """
+    path = str(path)
+    output = str(output or path)
+    tmp = f"{output}.tmp"
+    if not is_bgzf(path):
+        with open_binary(path) as src:
+            header = []
+            first = b""
+            for line in src:
+                if not line.startswith(b"#"):
+                    first = line
+                    break
+                header.append(line)
+            opener = gzip.open if output.endswith(".gz") else open
+            with opener(tmp, "wb") as out:
+                out.writelines(edit(header))
+                out.write(first)
+                shutil.copyfileobj(src, out, 1 << 20)
+        os.replace(tmp, output)
+        return output
+
+    # Decompress blocks until the first body line (or the end of the file).
+    blocks = []
+    data = bytearray()
+    end = None
+    with open(path, "rb") as f:
+        for offset, size in iter_block_offsets(path):
+            f.seek(offset)
+            block = decompress_block(f.read(size))
+            blocks.append((offset, size, len(data)))
+            data += block
+            end = _header_end(data)
+            if end is not None:
+                break
+    offset, size, start = blocks[-1]
+    body_block, remainder = None, b""
+    if end is None:
+        # Header only: nothing to copy but the EOF marker.
+        end, copy_from = len(data), None
+    elif end == start:
+        # The body starts on a block boundary: copy from that block on.
+        copy_from = offset
+    else:
+        # Recompress the body part of the last header block on its own.
+        body_block, remainder, copy_from = offset, bytes(data[end:]), offset + size
+    in_block = end - start
+
+    header = bytes(data[:end]).splitlines(keepends=True)
+    new_header = b"".join(edit(header))
+    with open(tmp, "wb") as out:
+        for i in range(0, len(new_header), BLOCK_DATA_SIZE):
+            out.write(compress_block(new_header[i:i + BLOCK_DATA_SIZE]))
+        remainder_at = out.tell()
+        if remainder:
+            out.write(compress_block(remainder))
+        if copy_from is None:
+            out.write(EOF_BLOCK)
+            copy_from = shift = 0
+        else:
+            shift = out.tell() - copy_from
+            with open(path, "rb") as src:
+                src.seek(copy_from)
+                shutil.copyfileobj(src, out, 1 << 20)
+
+    def remap(virtual_offset):
+        if not virtual_offset:
+            return 0
+        coffset, uoffset = virtual_offset >> 16, virtual_offset & 0xFFFF
+        if coffset >= copy_from:
+            return (coffset + shift) << 16 | uoffset
+        if coffset == body_block and uoffset >= in_block:
+            return remainder_at << 16 | (uoffset - in_block)
+        return (remainder_at if remainder else copy_from + shift) << 16
+
+    indexes = [fmt for fmt in ("tbi", "csi") if os.path.exists(index_path(path, fmt))]
+    for fmt in indexes:
+        remap_index(index_path(path, fmt), index_path(tmp, fmt), remap)
+    os.replace(tmp, output)
+    for fmt in indexes:
+        os.replace(index_path(tmp, fmt), index_path(output, fmt))
+    return output
+
+
+class VcfWriter:
+    """
+    Write VCF lines as bytes.
+
+    '.gz' paths are BGZF-compressed on `threads` threads and, when `index`
+    is "tbi" or "csi", indexed as the records are written; the index goes
+    next to the output on `close`. Unsorted output is left unindexed.
+    """
+
+    def __init__(self, path, index="tbi", threads=4):
+        self.path = str(path)
+        self._index = None
+        if self.path.endswith(".gz"):
+            self._file = BgzfWriter(self.path, threads=threads)
+            if index:
+                self._index = IndexBuilder(index)
+        else:
+            self._file = open(self.path, "wb", buffering=1 << 20)
+
+    def write_header(self, header, extra_lines=()):
+        """
+        Write header lines, inserting `extra_lines` (e.g. new ##INFO
+        definitions) just before the #CHROM line.
+        """
+        extra = [line.encode() if isinstance(line, str) else line for line in extra_lines]
+        for line in header:
+            if line.startswith(b"#CHROM"):
+                self._file.writelines(extra)
+                extra = []
+            self._file.write(line)
+        self._file.writelines(extra)
+        if self._index is not None:
+            # Records start in a fresh block, as with bgzip.
+            self._file.flush_block()
+
+    def write(self, record):
+        """Write a `VcfRecord` unchanged."""
+        if self._index is None:
+            self._file.write(record.line)
+            return
+        start = self._file.tell()
+        self._file.write(record.line)
+        self._index.add(*_span(record._fields or record._split()), start, self._file.tell())
+
+    def write_line(self, line):
+        """Write one already-formatted body line (bytes, newline-terminated)."""
+        if self._index is None:
+            self._file.write(line)
+            return
+        start = self._file.tell()
+        self._file.write(line)
+        self._index.add(*record_span(line), start, self._file.tell())
+
+    def write_lines(self, data, offsets, runs, begs, ends):
+        """
+        Write a batch of body lines held in one buffer, indexing them
+        without touching each line.
+
+        Args:
+            data (bytes-like): The lines, newline-terminated, back to back.
+            offsets (np.ndarray): Line boundaries in `data` (n + 1 int64s,
+                starting at 0).
+            runs (List[tuple]): (chrom, first_row, end_row) for each run of
+                consecutive rows on one contig.
+            begs, ends (np.ndarray): 0-based half-open span of each row.
+        """
+        if self._index is None:
+            self._file.write(data)
+            return
+        positions = self._file.tell_after(offsets)
+        self._file.write(data)
+        for chrom, first, end in runs:
+            self._index.add_batch(
+                chrom, begs[first:end], ends[first:end],
+                positions[first:end], positions[first + 1:end + 1],
+            )
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.close()
+        if self._index is not None:
+            if self._index.sorted:
+                self._index.write(index_path(self.path, self._index.fmt), self._file.virtual_offset)
+            else:
+                print(f"Warning: {self.path} is not sorted; no index written.")
+                Path(index_path(self.path, self._index.fmt)).unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()